@@ -1,38 +1,35 @@
 import os
-from flask import Flask, jsonify, request
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from flask import Flask, Response, jsonify, request
 import uuid
 from flask_cors import CORS, cross_origin
-from dotenv import load_dotenv
-import psycopg2
 from psycopg2 import errors as pg_errors
-from psycopg2.extras import RealDictCursor
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Database configuration from environment
-DB_HOST = os.getenv("PG_HOST", "cfls9h51f4i86c.cluster-czrs8kj4isg7.us-east-1.rds.amazonaws.com")
-DB_NAME = os.getenv("PG_DATABASE", "dfc2jmocqkio6k")
-DB_USER = os.getenv("PG_USER", "uf6s7k0lvso94d")
-DB_PASSWORD = os.getenv("PG_PASSWORD", "p26334802041005114bc98db3c5f0766326cca1abea7a6899ef860a12e79b95e8")
-DB_PORT = os.getenv("PG_PORT", "5432")
-
-def get_db_connection():
-    """
-    Establishes a new database connection using psycopg2.
-    Returns a connection object.
-    """
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        port=DB_PORT
-    )
-    return conn
+from psycopg2.extras import RealDictCursor, execute_values
+from db import get_db_connection, pool_stats
+from catalog_cache import catalog_route
+from floor_stream import RETRY_AFTER_SECONDS, floor_event_stream, floor_hub, parse_last_event_id
+from migrate import check_schema_version
+from read_queries import (
+    CLOSE_ORDERS_SQL, ELEMENTS_SQL, MENU_SQL, MOVE_ORDER_ITEMS_SQL, OPEN_ORDER_FOR_TABLE_SQL, ORDER_BY_ID_SQL,
+    ORDER_ITEMS_SQL, PAY_LINKED_GROUP_SQL, TABLE_BY_ID_SQL, TABLE_LINK_SQL, TABLES_SQL, break_history_query,
+    create_order_sql, orders_page, orders_page_headers, orders_page_query,
+)
+import reports
+import exports
+import json_provider
+import compression
+import metrics
+import profiler
+import idempotency
 
 # Initialize Flask app
 app = Flask(__name__)
+json_provider.init_app(app)
+compression.init_app(app)
+metrics.init_app(app)
+profiler.init_app(app)
+idempotency.init_app(app)
 # Configure CORS to allow requests from the frontend
 CORS(app, origins="*", supports_credentials=True)
 @app.after_request
@@ -42,112 +39,14 @@ def apply_cors_headers(response):
     """
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Credentials"] = "true"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization,Idempotency-Key"
     response.headers["Access-Control-Allow-Methods"] = "GET,PUT,POST,DELETE,OPTIONS"
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor,Link"
     return response
-# Ensure 'shape', 'rotation', and 'color' columns exist in 'tables'
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Add shape column if missing
-    cur.execute("ALTER TABLE tables ADD COLUMN IF NOT EXISTS shape TEXT;")
-    # Add rotation and color columns for table orientation and coloring
-    cur.execute("ALTER TABLE tables ADD COLUMN IF NOT EXISTS rotation INT NOT NULL DEFAULT 0;")
-    cur.execute("ALTER TABLE tables ADD COLUMN IF NOT EXISTS color TEXT;")
-    conn.commit()
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'shape' column: {e}")
-
-# Ensure map_elements table exists for custom map objects
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Create the map_elements table if it does not exist (with color column support)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS map_elements (
-        id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-        type TEXT NOT NULL,
-        position_x INT NOT NULL,
-        position_y INT NOT NULL,
-        width INT NOT NULL DEFAULT 0,
-        height INT NOT NULL DEFAULT 0,
-        rotation INT NOT NULL DEFAULT 0,
-        content TEXT,
-        color TEXT,
-        created_at TIMESTAMPTZ DEFAULT NOW(),
-        updated_at TIMESTAMPTZ DEFAULT NOW()
-    );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'map_elements' table: {e}")
-
-"""
-Ensure 'color' and 'section_id' columns exist in 'map_elements', and 'access_code' column in 'employees'.
-"""
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Add color column if missing
-    cur.execute("ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS color TEXT;")
-    # Add section_id column to link elements to a restaurant section
-    cur.execute("ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS section_id UUID;")
-    # Add font_size and font_style columns for text elements
-    cur.execute("ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS font_size INT;")
-    cur.execute("ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS font_style TEXT;")
-    conn.commit()
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'color' or 'section_id' columns: {e}")
-
-# Ensure 'access_code' column exists in 'employees'
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("ALTER TABLE employees ADD COLUMN IF NOT EXISTS access_code TEXT;")
-    conn.commit()
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'access_code' column in 'employees': {e}")
-
-# -------------------------------------------------------------
-# Menu Categories Table (for Menu Management)
-# -------------------------------------------------------------
-
-# Ensure menu_categories table exists
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS menu_categories (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            name TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMPTZ DEFAULT NOW(),
-            updated_at TIMESTAMPTZ DEFAULT NOW()
-        );
-        """
-    )
-    conn.commit()
 
-    # Seed default categories if empty
-    cur.execute("SELECT COUNT(*) FROM menu_categories;")
-    if cur.fetchone()[0] == 0:
-        default_cats = ["Breakfast", "Lunch", "Dinner"]
-        for cat in default_cats:
-            cur.execute("INSERT INTO menu_categories (name) VALUES (%s) ON CONFLICT DO NOTHING;", (cat,))
-        conn.commit()
-
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'menu_categories' table: {e}")
+# Schema changes live in ./migrations and are applied once with `python migrate.py`;
+# startup only verifies that the database is at the latest version.
+check_schema_version()
 
 # -------------------------------------------------------------
 # Menu Categories API
@@ -155,6 +54,7 @@ except Exception as e:
 
 @app.route('/api/menu-categories', methods=['GET', 'POST', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def menu_categories_collection():
     if request.method == 'GET':
         conn = get_db_connection()
@@ -201,6 +101,7 @@ def menu_categories_collection():
 
 @app.route('/api/menu-categories/<string:cat_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def menu_category_item(cat_id):
     if request.method == 'PUT':
         data = request.get_json() or {}
@@ -255,34 +156,12 @@ def menu_category_item(cat_id):
     return jsonify({'error': 'Category not found'}), 404
 
 # -------------------------------------------------------------
-# Menu Sub-categories table and API
+# Menu Sub-categories API
 # -------------------------------------------------------------
 
-# Ensure menu_subcategories exists
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS menu_subcategories (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            category_id UUID REFERENCES menu_categories(id) ON DELETE CASCADE,
-            name TEXT NOT NULL,
-            created_at TIMESTAMPTZ DEFAULT NOW(),
-            updated_at TIMESTAMPTZ DEFAULT NOW(),
-            UNIQUE (category_id, name)
-        );
-        """
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'menu_subcategories' table: {e}")
-
-
 @app.route('/api/subcategories', methods=['GET', 'POST', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def subcategories_collection():
     if request.method == 'GET':
         cat_id = request.args.get('category_id')
@@ -333,6 +212,7 @@ def subcategories_collection():
 
 @app.route('/api/subcategories/<string:sub_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def subcategory_item(sub_id):
     if request.method == 'PUT':
         data = request.get_json() or {}
@@ -377,106 +257,64 @@ def subcategory_item(sub_id):
     return jsonify({'error': 'Subcategory not found'}), 404
 
 # -------------------------------------------------------------
-# Customization tables (groups, options, and menu item relations)
+# Customization API (groups, options, and menu item relations)
 # -------------------------------------------------------------
 
-# Ensure customization tables exist
-try:
+def menu_items_customizations(item_ids):
+    """
+    Customization groups attached to each menu item, with every option of
+    the group flagged `allowed` for that item. One query for any number of
+    items; returns {menu_item_id: [group, ...]}.
+    """
     conn = get_db_connection()
-    cur = conn.cursor()
-    # Ensure UUID extension for uuid_generate_v4()
-    cur.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp";')
-    # Create customization tables if missing
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS customization_groups (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            name TEXT UNIQUE NOT NULL,
-            is_required BOOLEAN DEFAULT FALSE,
-            max_select INT,
-            created_at TIMESTAMPTZ DEFAULT NOW(),
-            updated_at TIMESTAMPTZ DEFAULT NOW()
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS customization_options (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            group_id UUID REFERENCES customization_groups(id) ON DELETE CASCADE,
-            name TEXT NOT NULL,
-            extra_price NUMERIC DEFAULT 0,
-            created_at TIMESTAMPTZ DEFAULT NOW(),
-            updated_at TIMESTAMPTZ DEFAULT NOW()
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS menu_item_customizations (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            menu_item_id UUID REFERENCES menu_items(id) ON DELETE CASCADE,
-            group_id UUID REFERENCES customization_groups(id) ON DELETE CASCADE
-        );
-        """
-    )
+    cur = conn.cursor(cursor_factory=RealDictCursor)
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS menu_item_customization_options (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            item_id UUID REFERENCES menu_items(id) ON DELETE CASCADE,
-            option_id UUID REFERENCES customization_options(id) ON DELETE CASCADE
-        );
-        """
-    )
-    # Commit initial table creation
-    conn.commit()
-    # Ensure columns exist in menu_item_customizations
-    cur.execute(
-        "ALTER TABLE menu_item_customizations ADD COLUMN IF NOT EXISTS menu_item_id UUID REFERENCES menu_items(id) ON DELETE CASCADE;"
-    )
-    cur.execute(
-        "ALTER TABLE menu_item_customizations ADD COLUMN IF NOT EXISTS group_id UUID REFERENCES customization_groups(id) ON DELETE CASCADE;"
+        SELECT mic.menu_item_id, mic.id as mic_id, g.id, g.name, g.is_required, g.max_select,
+               json_agg(json_build_object(
+                    'id', o.id,
+                    'name', o.name,
+                    'extra_price', o.extra_price,
+                    'allowed', mico.id IS NOT NULL
+               ) ORDER BY o.name) AS options
+        FROM menu_item_customizations mic
+        JOIN customization_groups g ON g.id = mic.group_id
+        JOIN customization_options o ON o.group_id = g.id
+        LEFT JOIN menu_item_customization_options mico
+            ON mico.item_id = mic.menu_item_id
+            AND mico.option_id = o.id
+        WHERE mic.menu_item_id = ANY(%s::uuid[])
+        GROUP BY mic.id, g.id
+        ORDER BY g.name;
+        """,
+        (list(item_ids),)
     )
-    conn.commit()
+    rows = cur.fetchall()
     cur.close()
     conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure customization tables: {e}")
+    by_item = {item_id.lower(): [] for item_id in item_ids}
+    for row in rows:
+        by_item.setdefault(str(row.pop('menu_item_id')), []).append(row)
+    return by_item
 
-# Ensure linked table group tables exist
-try:
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS linked_table_groups (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            created_at TIMESTAMPTZ DEFAULT NOW()
-        );
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS linked_table_members (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            group_id UUID REFERENCES linked_table_groups(id) ON DELETE CASCADE,
-            table_number TEXT NOT NULL,
-            is_leader BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMPTZ DEFAULT NOW()
-        );
-        """
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-except Exception as e:
-    print(f"Warning: could not ensure 'linked_table_groups' tables: {e}")
 
 @app.route('/api/customization-groups', methods=['GET', 'POST', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def customization_groups_collection():
     if request.method == 'GET':
+        # ?menu_item_ids=a,b (or repeated menu_item_id=) returns the groups
+        # attached to each of those items in one call, keyed by item id
+        item_ids = request.args.getlist('menu_item_id')
+        for chunk in request.args.getlist('menu_item_ids'):
+            item_ids.extend(i for i in chunk.split(',') if i)
+        if item_ids:
+            try:
+                item_ids = [str(uuid.UUID(i.strip())) for i in item_ids]
+            except ValueError:
+                return jsonify({'error': 'Invalid menu item id format'}), 400
+            return jsonify(menu_items_customizations(item_ids))
+
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
         cur.execute("SELECT * FROM customization_groups ORDER BY name;")
@@ -485,8 +323,12 @@ def customization_groups_collection():
         options = cur.fetchall()
         cur.close()
         conn.close()
+        # Bucket options by group in a single pass
+        options_by_group = {}
+        for o in options:
+            options_by_group.setdefault(o['group_id'], []).append(o)
         for g in groups:
-            g['options'] = [o for o in options if o['group_id'] == g['id']]
+            g['options'] = options_by_group.get(g['id'], [])
         return jsonify(groups)
 
     data = request.get_json() or {}
@@ -524,6 +366,7 @@ def customization_groups_collection():
 
 @app.route('/api/customization-groups/<string:gid>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def customization_group_item(gid):
     if request.method == 'PUT':
         data = request.get_json() or {}
@@ -561,6 +404,7 @@ def customization_group_item(gid):
 
 @app.route('/api/customization-options', methods=['GET', 'POST', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def customization_options_collection():
     if request.method == 'GET':
         gid = request.args.get('group_id')
@@ -598,6 +442,7 @@ def customization_options_collection():
 
 @app.route('/api/customization-options/<string:oid>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def customization_option_item(oid):
     if request.method == 'PUT':
         data = request.get_json() or {}
@@ -635,62 +480,163 @@ def customization_option_item(oid):
 
 @app.route('/api/menu-items/<string:item_id>/customizations', methods=['GET', 'PUT', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def menu_item_customizations_endpoint(item_id):
     if request.method == 'GET':
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute(
-            """
-            SELECT mic.id as mic_id, g.id, g.name, g.is_required, g.max_select,
-                   json_agg(json_build_object(
-                        'id', o.id,
-                        'name', o.name,
-                        'extra_price', o.extra_price,
-                        'allowed', mico.id IS NOT NULL
-                   ) ORDER BY o.name) AS options
-            FROM menu_item_customizations mic
-            JOIN customization_groups g ON g.id = mic.group_id
-            JOIN customization_options o ON o.group_id = g.id
-            LEFT JOIN menu_item_customization_options mico
-                ON mico.item_id = mic.menu_item_id
-                AND mico.option_id = o.id
-            WHERE mic.menu_item_id = %s
-            GROUP BY mic.id, g.id
-            ORDER BY g.name;
-            """,
-            (item_id,)
-        )
-        rows = cur.fetchall()
+        try:
+            item_id = str(uuid.UUID(item_id))
+        except ValueError:
+            return jsonify({'error': 'Invalid menu item id format'}), 400
+        return jsonify(menu_items_customizations([item_id]).get(item_id, []))
+
+    data = request.get_json() or {}
+    try:
+        desired = parse_customization_payload({item_id: data.get('groups', [])})
+    except (ValueError, TypeError, AttributeError):
+        return jsonify({'error': 'Invalid group_id or option_ids'}), 400
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        changes = apply_customizations(cur, desired)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
         cur.close()
         conn.close()
-        return jsonify(rows)
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+    return jsonify({'status': 'ok', **changes})
+
 
+@app.route('/api/menu-items/customizations', methods=['PUT', 'OPTIONS'])
+@cross_origin()
+@catalog_route
+def menu_items_customizations_bulk():
+    """
+    Set customizations for many menu items in one request and transaction.
+    Body: {"items": [{"menu_item_id": ..., "groups": [{"group_id", "option_ids"}]}]}
+    Items not listed are left untouched; listing an item twice is a 400.
+    """
     data = request.get_json() or {}
-    groups = data.get('groups', [])
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    try:
+        ids = [str(uuid.UUID(str(item['menu_item_id']))) for item in items]
+        desired = parse_customization_payload(
+            {item_id: item.get('groups', []) for item_id, item in zip(ids, items)}
+        )
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return jsonify({'error': 'Each item needs a valid menu_item_id, group_id and option_ids'}), 400
+    if len(desired) != len(ids):
+        duplicates = sorted({i for i in ids if ids.count(i) > 1})
+        return jsonify({'error': 'Duplicate menu_item_id in items', 'menu_item_ids': duplicates}), 400
     conn = get_db_connection()
-    cur = conn.cursor()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        changes = apply_customizations(cur, desired)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+    return jsonify({'status': 'ok', 'items': len(desired), **changes})
+
+
+def parse_customization_payload(groups_by_item):
+    """
+    Normalise {menu_item_id: [{"group_id", "option_ids"}]} into
+    {menu_item_id: (set(group_ids), set(option_ids))}; raises ValueError on bad ids.
+    """
+    desired = {}
+    for item_id, groups in groups_by_item.items():
+        group_ids, option_ids = set(), set()
+        for grp in groups or []:
+            group_ids.add(str(uuid.UUID(str(grp.get('group_id')))))
+            for oid in grp.get('option_ids') or []:
+                option_ids.add(str(uuid.UUID(str(oid))))
+        desired[str(uuid.UUID(str(item_id)))] = (group_ids, option_ids)
+    return desired
+
+
+def apply_customizations(cur, desired):
+    """
+    Bring menu_item_customizations / menu_item_customization_options in line
+    with `desired` by deleting and inserting only the differing rows.
+    Two statements regardless of how many items, groups or options change.
+    """
+    item_ids = list(desired)
+    group_pairs = [(i, g) for i, (groups, _) in desired.items() for g in groups]
+    option_pairs = [(i, o) for i, (_, options) in desired.items() for o in options]
+
     cur.execute(
-        "DELETE FROM menu_item_customization_options WHERE item_id = %s;",
-        (item_id,),
-    )
-    cur.execute("DELETE FROM menu_item_customizations WHERE menu_item_id = %s;", (item_id,))
-    for grp in groups:
-        gid = grp.get('group_id')
-        option_ids = grp.get('option_ids', [])
-        cur.execute(
-            "INSERT INTO menu_item_customizations (menu_item_id, group_id) VALUES (%s, %s) RETURNING id;",
-            (item_id, gid),
+        """
+        WITH desired AS (
+            SELECT DISTINCT * FROM unnest(%s::uuid[], %s::uuid[]) AS d (menu_item_id, group_id)
+        ),
+        removed AS (
+            DELETE FROM menu_item_customizations mic
+            WHERE mic.menu_item_id = ANY(%s::uuid[])
+              AND NOT EXISTS (
+                  SELECT 1 FROM desired d
+                  WHERE d.menu_item_id = mic.menu_item_id AND d.group_id = mic.group_id
+              )
+            RETURNING 1
+        ),
+        added AS (
+            INSERT INTO menu_item_customizations (menu_item_id, group_id)
+            SELECT d.menu_item_id, d.group_id FROM desired d
+            WHERE NOT EXISTS (
+                SELECT 1 FROM menu_item_customizations mic
+                WHERE mic.menu_item_id = d.menu_item_id AND mic.group_id = d.group_id
+            )
+            RETURNING 1
         )
-        mic_id = cur.fetchone()[0]
-        for oid in option_ids:
-            cur.execute(
-                "INSERT INTO menu_item_customization_options (item_id, option_id) VALUES (%s, %s);",
-                (item_id, oid),
+        SELECT (SELECT COUNT(*) FROM removed) AS removed, (SELECT COUNT(*) FROM added) AS added;
+        """,
+        ([p[0] for p in group_pairs], [p[1] for p in group_pairs], item_ids)
+    )
+    groups_changed = cur.fetchone()
+
+    cur.execute(
+        """
+        WITH desired AS (
+            SELECT DISTINCT * FROM unnest(%s::uuid[], %s::uuid[]) AS d (item_id, option_id)
+        ),
+        removed AS (
+            DELETE FROM menu_item_customization_options mico
+            WHERE mico.item_id = ANY(%s::uuid[])
+              AND NOT EXISTS (
+                  SELECT 1 FROM desired d
+                  WHERE d.item_id = mico.item_id AND d.option_id = mico.option_id
+              )
+            RETURNING 1
+        ),
+        added AS (
+            INSERT INTO menu_item_customization_options (item_id, option_id)
+            SELECT d.item_id, d.option_id FROM desired d
+            WHERE NOT EXISTS (
+                SELECT 1 FROM menu_item_customization_options mico
+                WHERE mico.item_id = d.item_id AND mico.option_id = d.option_id
             )
-    conn.commit()
-    cur.close()
-    conn.close()
-    return jsonify({'status': 'ok'})
+            RETURNING 1
+        )
+        SELECT (SELECT COUNT(*) FROM removed) AS removed, (SELECT COUNT(*) FROM added) AS added;
+        """,
+        ([p[0] for p in option_pairs], [p[1] for p in option_pairs], item_ids)
+    )
+    options_changed = cur.fetchone()
+
+    return {
+        'groups_added': groups_changed['added'],
+        'groups_removed': groups_changed['removed'],
+        'options_added': options_changed['added'],
+        'options_removed': options_changed['removed'],
+    }
 
 ### Map Elements Endpoints ###
 @app.route('/api/elements', methods=['GET'])
@@ -698,7 +644,7 @@ def menu_item_customizations_endpoint(item_id):
 def get_elements():
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM map_elements;")
+    cur.execute(ELEMENTS_SQL)
     elems = cur.fetchall()
     cur.close()
     conn.close()
@@ -779,36 +725,56 @@ def ping():
 def healthcheck():
     """Return simple status used for readiness probes."""
     return jsonify({"status": "ok"})
+
+@app.route('/api/health/pool', methods=['GET'])
+@cross_origin()
+def pool_healthcheck():
+    """Return this worker's connection pool occupancy and wait-time stats."""
+    return jsonify(pool_stats())
     
 @app.route('/api/tables', methods=['GET'])
 def get_tables():
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        """
-        SELECT t.*, l.group_id
-        FROM tables t
-        LEFT JOIN linked_table_members l ON t.number = l.table_number;
-        """
-    )
+    cur.execute(TABLES_SQL)
     tables = cur.fetchall()
     cur.close()
     conn.close()
     return jsonify(tables)
 
+@app.route('/api/stream/floor', methods=['GET'])
+@cross_origin()
+def stream_floor():
+    """
+    Server-Sent Events stream of table, order-status and table-link changes.
+    Resume with the Last-Event-ID header (or ?last_event_id=); a resumed
+    stream may repeat events, so skip ids already applied. A `reset` event
+    means the client should reload GET /api/tables.
+    """
+    try:
+        last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    except ValueError:
+        return jsonify({'error': 'Invalid last_event_id'}), 400
+    # Each stream holds this worker thread; past the cap, send the client elsewhere
+    q = floor_hub.subscribe()
+    if q is None:
+        response = jsonify({'error': 'Too many open streams on this worker, retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response
+    response = Response(
+        floor_event_stream(q, last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    response.call_on_close(lambda: floor_hub.unsubscribe(q))
+    return response
+
 @app.route('/api/tables/<string:table_id>', methods=['GET'])
 def get_table(table_id):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        """
-        SELECT t.*, l.group_id
-        FROM tables t
-        LEFT JOIN linked_table_members l ON t.number = l.table_number
-        WHERE t.id = %s;
-        """,
-        (table_id,)
-    )
+    cur.execute(TABLE_BY_ID_SQL, (table_id,))
     table = cur.fetchone()
     cur.close()
     conn.close()
@@ -883,18 +849,12 @@ def delete_table(table_id):
 
 @app.route('/api/menu', methods=['GET'])
 @cross_origin()
+@catalog_route
 def get_menu():
     """Return all menu items along with their category relation."""
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        """
-        SELECT mi.*, mc.name AS category_name
-        FROM menu_items mi
-        JOIN menu_categories mc ON mc.id = mi.category_id
-        ORDER BY mc.name, mi.name;
-        """
-    )
+    cur.execute(MENU_SQL)
     items = cur.fetchall()
     cur.close()
     conn.close()
@@ -902,6 +862,7 @@ def get_menu():
     
 @app.route('/api/menu', methods=['POST', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def create_menu_item():
     data = request.get_json()
     columns, values, placeholders = [], [], []
@@ -924,6 +885,7 @@ def create_menu_item():
 
 @app.route('/api/menu/<string:item_id>', methods=['PUT', 'PATCH', 'DELETE', 'OPTIONS'])
 @cross_origin()
+@catalog_route
 def modify_menu_item(item_id):
     if request.method == 'PUT' or request.method == 'PATCH':
         data = request.get_json() or {}
@@ -962,59 +924,75 @@ def modify_menu_item(item_id):
 
 @app.route('/api/orders', methods=['POST'])
 def create_order():
+    """
+    Open an order, or return the table's open order if it already has one
+    (201 vs 200). A single statement: the unique index on open orders per
+    table (migration 0012) settles concurrent requests for the same table.
+    """
     data = request.get_json()
-    table_number = data.get('table_number')
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    # If a table number is provided, check for an existing open order
-    if table_number:
-        cur.execute(
-            "SELECT * FROM orders WHERE table_number = %s AND status != 'paid' ORDER BY created_at DESC LIMIT 1;",
-            (table_number,)
-        )
-        existing = cur.fetchone()
-        if existing:
-            cur.close()
-            conn.close()
-            return jsonify(existing)
-
     columns = []
     values = []
-    placeholders = []
-    for key in ['table_number', 'server', 'status', 'subtotal', 'tax', 'tip', 'total', 'discount_type', 'discount_value', 'payment_method', 'paid', 'client_count']:
+    # subtotal/discount/tax/total are derived server-side (migration 0008)
+    for key in ['table_number', 'server', 'status', 'tip', 'discount_type', 'discount_value', 'tax_rate', 'payment_method', 'paid', 'client_count']:
         if key in data:
             columns.append(key)
             values.append(data[key])
-            placeholders.append('%s')
     if not columns:
         return jsonify({"error": "No order data provided"}), 400
-    sql = f"INSERT INTO orders ({', '.join(columns)}) VALUES ({', '.join(placeholders)}) RETURNING *;"
-    cur.execute(sql, tuple(values))
-    new_order = cur.fetchone()
+    # A NULL status would escape the open-order index (migration 0014)
+    if 'status' not in columns:
+        columns.append('status')
+        values.append('pending')
+    elif not data['status']:
+        values[columns.index('status')] = 'pending'
+    # One upsert: returns the table's existing open order instead of a second one
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(create_order_sql(columns), tuple(values))
+    order = cur.fetchone()
     conn.commit()
     cur.close()
     conn.close()
-    return jsonify(new_order), 201
+    created = order.pop('created')
+    return jsonify(order), 201 if created else 200
     
 @app.route('/api/orders', methods=['GET'])
 def list_orders():
     """
-    Retrieve all orders.
+    List orders newest first; every matching order unless paged.
+
+    Query params (all optional):
+      status        comma-separated statuses, e.g. status=pending,served
+      open          true -> only orders whose status is not 'paid'
+      table_number, server
+      paid          true/false
+      created_from  ISO timestamp, inclusive (no offset: REPORTS_TIMEZONE)
+      created_to    ISO timestamp, exclusive (no offset: REPORTS_TIMEZONE)
+      limit         page size (max 500); pages the list
+      cursor        X-Next-Cursor of the previous page (page size 100 without limit)
+
+    Returns a JSON array of orders. When paged and more orders follow, the
+    X-Next-Cursor and Link: <...>; rel="next" headers point at the next page.
     """
+    try:
+        sql, params, limit = orders_page_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM orders;")
+    cur.execute(sql, tuple(params))
     orders = cur.fetchall()
     cur.close()
     conn.close()
-    return jsonify(orders)
+    orders, next_cursor = orders_page(orders, limit)
+    return jsonify(orders), orders_page_headers(request.path, request.args.to_dict(), next_cursor)
 
 @app.route('/api/orders/<string:order_id>', methods=['GET'])
 def get_order(order_id):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM orders WHERE id = %s;", (order_id,))
+    cur.execute(ORDER_BY_ID_SQL, (order_id,))
     order = cur.fetchone()
     cur.close()
     conn.close()
@@ -1023,23 +1001,100 @@ def get_order(order_id):
     else:
         return jsonify({"error": "Order not found"}), 404
 
+@app.route('/api/orders/<string:order_id>/full', methods=['GET'])
+def get_order_full(order_id):
+    """
+    Return an order with its items, each item's chosen options, and its
+    splits as one nested document, built by a single query.
+    """
+    try:
+        uuid.UUID(order_id)
+    except Exception:
+        return jsonify({'error': 'Invalid order id format'}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT to_jsonb(o) || jsonb_build_object(
+            'items', COALESCE((
+                SELECT jsonb_agg(
+                    to_jsonb(oi) || jsonb_build_object(
+                        'menu_item_name', mi.name,
+                        'modifiers', COALESCE((
+                            SELECT jsonb_agg(jsonb_build_object(
+                                'id', m.id,
+                                'customization_option_id', m.customization_option_id,
+                                'name', co.name,
+                                'group_id', co.group_id,
+                                'group_name', cg.name,
+                                'extra_price', m.extra_price
+                            ) ORDER BY cg.name, co.name)
+                            FROM order_item_modifiers m
+                            LEFT JOIN customization_options co ON co.id = m.customization_option_id
+                            LEFT JOIN customization_groups cg ON cg.id = co.group_id
+                            WHERE m.order_item_id = oi.id
+                        ), '[]'::jsonb)
+                    ) ORDER BY oi.client_number NULLS FIRST, oi.created_at, oi.id
+                )
+                FROM order_items oi
+                LEFT JOIN menu_items mi ON mi.id = oi.menu_item_id
+                WHERE oi.order_id = o.id
+            ), '[]'::jsonb),
+            'splits', COALESCE((
+                SELECT jsonb_agg(
+                    to_jsonb(s) || jsonb_build_object(
+                        'order_item_ids', COALESCE((
+                            SELECT jsonb_agg(si.order_item_id ORDER BY si.created_at)
+                            FROM split_items si
+                            WHERE si.split_id = s.id
+                        ), '[]'::jsonb)
+                    ) ORDER BY s.created_at, s.id
+                )
+                FROM order_splits s
+                WHERE s.order_id = o.id
+            ), '[]'::jsonb)
+        ) AS doc
+        FROM orders o
+        WHERE o.id = %s;
+        """,
+        (order_id,)
+    )
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    if row:
+        return jsonify(row[0])
+    else:
+        return jsonify({"error": "Order not found"}), 404
+
 @app.route('/api/orders/<string:order_id>', methods=['PUT'])
 def update_order(order_id):
     data = request.get_json()
     fields = []
     values = []
-    for key in ['status', 'payment_method', 'paid', 'subtotal', 'tax', 'tip', 'total', 'discount_type', 'discount_value', 'client_count']:
+    # subtotal/discount/tax/total are derived server-side (migration 0008)
+    for key in ['status', 'payment_method', 'paid', 'tip', 'discount_type', 'discount_value', 'tax_rate', 'client_count']:
         if key in data:
             fields.append(f"{key} = %s")
             values.append(data[key])
     if not fields:
         return jsonify({"error": "No valid fields provided"}), 400
+    if 'status' in data and not data['status']:
+        return jsonify({"error": "status cannot be empty"}), 400
     fields.append("updated_at = NOW()")
     sql = f"UPDATE orders SET {', '.join(fields)} WHERE id = %s RETURNING *;"
     values.append(order_id)
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(sql, tuple(values))
+    try:
+        cur.execute(sql, tuple(values))
+    except pg_errors.UniqueViolation:
+        # Reopening a paid order on a table that has a new open order
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({"error": "The order's table already has an active order"}), 409
     updated = cur.fetchone()
     conn.commit()
     cur.close()
@@ -1067,9 +1122,9 @@ def merge_orders_endpoint():
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
-        cur.execute("SELECT * FROM orders WHERE id = %s;", (source_id,))
+        cur.execute(ORDER_BY_ID_SQL, (source_id,))
         source_order = cur.fetchone()
-        cur.execute("SELECT * FROM orders WHERE id = %s;", (target_id,))
+        cur.execute(ORDER_BY_ID_SQL, (target_id,))
         target_order = cur.fetchone()
         if not source_order:
             cur.close()
@@ -1086,21 +1141,17 @@ def merge_orders_endpoint():
 
         offset = target_order.get('client_count') or 0
 
-        cur.execute(
-            """UPDATE order_items SET order_id = %s, client_number = COALESCE(client_number,1) + %s WHERE order_id = %s RETURNING id""",
-            (target_id, offset, source_id)
-        )
+        cur.execute(MOVE_ORDER_ITEMS_SQL, (target_id, offset, source_id))
         cur.fetchall()  # ensure execution
 
         new_client_count = (target_order.get('client_count') or 0) + (source_order.get('client_count') or 0)
-        new_subtotal = (target_order.get('subtotal') or 0) + (source_order.get('subtotal') or 0)
-        new_tax = (target_order.get('tax') or 0) + (source_order.get('tax') or 0)
         new_tip = (target_order.get('tip') or 0) + (source_order.get('tip') or 0)
-        new_total = (target_order.get('total') or 0) + (source_order.get('total') or 0)
 
+        # Moving the items already moved their amounts into the target's
+        # subtotal; discount, tax and total are re-derived from it
         cur.execute(
-            "UPDATE orders SET client_count = %s, subtotal = %s, tax = %s, tip = %s, total = %s, updated_at = NOW() WHERE id = %s RETURNING *;",
-            (new_client_count, new_subtotal, new_tax, new_tip, new_total, target_id)
+            "UPDATE orders SET client_count = %s, tip = %s, updated_at = NOW() WHERE id = %s RETURNING *;",
+            (new_client_count, new_tip, target_id)
         )
         updated_target = cur.fetchone()
 
@@ -1139,7 +1190,7 @@ def change_order_table_endpoint():
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
         # Validate order exists
-        cur.execute("SELECT * FROM orders WHERE id = %s;", (order_id,))
+        cur.execute(ORDER_BY_ID_SQL, (order_id,))
         order = cur.fetchone()
         if not order:
             cur.close()
@@ -1155,10 +1206,7 @@ def change_order_table_endpoint():
             return jsonify({'error': f'Table {new_table} not found'}), 404
 
         # Ensure no active order already assigned to target table
-        cur.execute(
-            "SELECT id FROM orders WHERE table_number = %s AND status != 'paid';",
-            (new_table,),
-        )
+        cur.execute(OPEN_ORDER_FOR_TABLE_SQL, (new_table,))
         existing = cur.fetchone()
         if existing and existing['id'] != order_id:
             cur.close()
@@ -1185,17 +1233,74 @@ def change_order_table_endpoint():
         cur.close()
         conn.close()
         return jsonify(updated_order)
+    except pg_errors.UniqueViolation:
+        # Another order was opened on the target table after the check above
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': f'Table {new_table} already has an active order'}), 400
     except Exception as e:
         conn.rollback()
         cur.close()
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+# ----------- Order Totals -----------
+
+def order_totals(cur, order_id):
+    """
+    Authoritative amounts of an order. They are kept current by the pricing
+    triggers (migration 0008) on every item and option write, so this is a
+    primary-key read, never a re-sum of the items.
+    """
+    cur.execute(
+        "SELECT id, subtotal, discount, tax_rate, tax, tip, total FROM orders WHERE id = %s;",
+        (order_id,)
+    )
+    return cur.fetchone()
+
+@app.route('/api/pricing-settings', methods=['GET', 'PUT'])
+def pricing_settings():
+    """
+    Default tax rate for new orders, as a fraction (0.0825 = 8.25%).
+    Existing orders keep the rate they were created with.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    if request.method == 'PUT':
+        data = request.get_json() or {}
+        # Parsed from its text so a JSON 0.0825 is stored as exactly 0.0825
+        raw = data.get('tax_rate')
+        try:
+            if isinstance(raw, bool) or not isinstance(raw, (int, float, str)):
+                raise InvalidOperation
+            tax_rate = Decimal(str(raw).strip())
+        except InvalidOperation:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'tax_rate must be a number'}), 400
+        if not tax_rate.is_finite() or not 0 <= tax_rate < 1:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'tax_rate must be a fraction between 0 and 1'}), 400
+        cur.execute(
+            "UPDATE pricing_settings SET tax_rate = %s, updated_at = NOW() WHERE id = 1 RETURNING tax_rate, updated_at;",
+            (tax_rate,)
+        )
+        settings = cur.fetchone()
+        conn.commit()
+    else:
+        cur.execute("SELECT tax_rate, updated_at FROM pricing_settings WHERE id = 1;")
+        settings = cur.fetchone()
+    cur.close()
+    conn.close()
+    return jsonify(settings)
+
 @app.route('/api/order-items/<string:order_id>', methods=['GET'])
 def get_order_items(order_id):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM order_items WHERE order_id = %s;", (order_id,))
+    cur.execute(ORDER_ITEMS_SQL, (order_id,))
     items = cur.fetchall()
     cur.close()
     conn.close()
@@ -1219,11 +1324,189 @@ def create_order_item():
     cur = conn.cursor(cursor_factory=RealDictCursor)
     cur.execute(sql, tuple(values))
     new_item = cur.fetchone()
+    if new_item.get('order_id'):
+        new_item['order_totals'] = order_totals(cur, new_item['order_id'])
     conn.commit()
     cur.close()
     conn.close()
     return jsonify(new_item), 201
 
+@app.route('/api/order-items/<string:item_id>', methods=['PUT', 'DELETE'])
+def order_item_detail(item_id):
+    """Change or remove one item; the response carries the order's new totals."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        if request.method == 'PUT':
+            data = request.get_json() or {}
+            fields = []
+            values = []
+            for key in ['quantity', 'price', 'notes', 'client_number']:
+                if key in data:
+                    fields.append(f"{key} = %s")
+                    values.append(data[key])
+            if not fields:
+                cur.close()
+                conn.close()
+                return jsonify({"error": "No valid fields provided"}), 400
+            values.append(item_id)
+            cur.execute(f"UPDATE order_items SET {', '.join(fields)} WHERE id = %s RETURNING *;", tuple(values))
+        else:
+            cur.execute("DELETE FROM order_items WHERE id = %s RETURNING *;", (item_id,))
+        item = cur.fetchone()
+        if not item:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({"error": "Order item not found"}), 404
+        if item.get('order_id'):
+            item['order_totals'] = order_totals(cur, item['order_id'])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+    return jsonify(item)
+
+# Upper bound on items accepted by one batch request
+ORDER_ITEMS_BATCH_MAX = 200
+
+@app.route('/api/orders/<string:order_id>/items:batch', methods=['POST'])
+def create_order_items_batch(order_id):
+    """
+    Add many items, with their customization options, to an order at once.
+
+    Body: {"items": [{"menu_item_id", "quantity", "price", "notes",
+                      "client_number", "option_ids": [...]}, ...]}
+    Each option must be allowed for its item's menu item
+    (menu_item_customization_options); otherwise nothing is added and the
+    400 lists the rejected options. Everything is inserted in one transaction with multi-row statements
+    (order check, items, options), so round trips do not grow with the
+    number of items. Returns {"items": [...], "order_totals": {...}}: the
+    created items, each with its "modifiers", and the order's new totals.
+    """
+    data = request.get_json() or {}
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > ORDER_ITEMS_BATCH_MAX:
+        return jsonify({'error': f'At most {ORDER_ITEMS_BATCH_MAX} items per batch'}), 400
+
+    try:
+        uuid.UUID(order_id)
+        # Item ids are generated here so options can reference them without a lookup
+        item_rows, option_rows = [], []
+        for idx, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('menu_item_id'):
+                return jsonify({'error': f'items[{idx}].menu_item_id required'}), 400
+            item_id = str(uuid.uuid4())
+            menu_item_id = str(uuid.UUID(str(item['menu_item_id'])))
+            item_rows.append((
+                item_id, order_id, menu_item_id,
+                item.get('quantity', 1), item.get('price'), item.get('notes'), item.get('client_number'),
+            ))
+            for oid in item.get('option_ids') or []:
+                option_rows.append((item_id, menu_item_id, str(uuid.UUID(str(oid)))))
+    except (ValueError, TypeError, AttributeError):
+        return jsonify({'error': 'Invalid id format'}), 400
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("SELECT status FROM orders WHERE id = %s FOR UPDATE;", (order_id,))
+        order = cur.fetchone()
+        if not order:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': f'Order {order_id} not found'}), 404
+        if order['status'] == 'paid':
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Cannot add items to a paid order'}), 400
+
+        created = execute_values(
+            cur,
+            """
+            INSERT INTO order_items (id, order_id, menu_item_id, quantity, price, notes, client_number)
+            VALUES %s
+            RETURNING *;
+            """,
+            item_rows,
+            template="(%s::uuid, %s::uuid, %s::uuid, %s, %s, %s, %s)",
+            page_size=len(item_rows),
+            fetch=True,
+        )
+
+        modifiers = []
+        if option_rows:
+            # Snapshot each option's current price alongside the selection.
+            # Only options allowed for the item's menu item join, so any
+            # missing row is an unknown or disallowed option.
+            modifiers = execute_values(
+                cur,
+                """
+                INSERT INTO order_item_modifiers (order_item_id, customization_option_id, extra_price)
+                SELECT v.order_item_id::uuid, o.id, COALESCE(o.extra_price, 0)
+                FROM (VALUES %s) AS v (order_item_id, menu_item_id, option_id)
+                JOIN menu_item_customization_options mico
+                    ON mico.item_id = v.menu_item_id::uuid
+                    AND mico.option_id = v.option_id::uuid
+                JOIN customization_options o ON o.id = mico.option_id
+                RETURNING id, order_item_id, customization_option_id, extra_price;
+                """,
+                option_rows,
+                page_size=len(option_rows),
+                fetch=True,
+            )
+            if len(modifiers) != len(option_rows):
+                conn.rollback()
+                cur.close()
+                conn.close()
+                inserted = {(str(m['order_item_id']), str(m['customization_option_id'])) for m in modifiers}
+                index_of = {row[0]: idx for idx, row in enumerate(item_rows)}
+                rejected = [
+                    {'item': index_of[item_id], 'option_id': oid}
+                    for item_id, _, oid in option_rows
+                    if (item_id, oid) not in inserted
+                ]
+                return jsonify({
+                    'error': 'One or more option_ids are not allowed for their menu item',
+                    'options': rejected,
+                }), 400
+
+            # Line totals moved when the options went in
+            cur.execute(
+                "SELECT id, modifiers_total, line_total FROM order_items WHERE id = ANY(%s::uuid[]);",
+                ([row[0] for row in item_rows],)
+            )
+            line_totals = {row['id']: row for row in cur.fetchall()}
+            for row in created:
+                row.update(line_totals[row['id']])
+
+        totals = order_totals(cur, order_id)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+
+    cur.close()
+    conn.close()
+    by_item = {}
+    for m in modifiers:
+        by_item.setdefault(m['order_item_id'], []).append(m)
+    order_of = {row[0]: idx for idx, row in enumerate(item_rows)}
+    created.sort(key=lambda r: order_of[str(r['id'])])
+    for row in created:
+        row['modifiers'] = by_item.get(row['id'], [])
+    return jsonify({'items': created, 'order_totals': totals}), 201
+
 # ----------- Linked Tables Endpoints -----------
 
 @app.route('/api/table-links', methods=['GET', 'POST'])
@@ -1278,17 +1561,7 @@ def table_links_collection():
 def get_table_link(table_number):
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        """
-        SELECT g.id as group_id,
-               json_agg(json_build_object('table_number',m.table_number,'is_leader',m.is_leader)) AS tables
-        FROM linked_table_groups g
-        JOIN linked_table_members m ON m.group_id = g.id
-        WHERE m.table_number = %s
-        GROUP BY g.id;
-        """,
-        (table_number,)
-    )
+    cur.execute(TABLE_LINK_SQL, (table_number,))
     group = cur.fetchone()
     cur.close()
     conn.close()
@@ -1313,35 +1586,199 @@ def delete_table_link(group_id):
 
 @app.route('/api/pay-linked/<string:table_number>', methods=['POST'])
 def pay_linked_group(table_number):
+    """
+    Mark every open order of the table's linked group as paid, free those
+    tables and dissolve the group, in one set-based statement.
+    """
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     try:
-        cur.execute("SELECT group_id FROM linked_table_members WHERE table_number = %s;", (table_number,))
-        row = cur.fetchone()
-        if not row:
+        cur.execute(PAY_LINKED_GROUP_SQL, (table_number,))
+        result = cur.fetchone()
+        if not result['group_id']:
+            conn.rollback()
             cur.close()
             conn.close()
             return jsonify({'error': 'Table not linked'}), 404
-        gid = row['group_id']
-        cur.execute("SELECT table_number FROM linked_table_members WHERE group_id = %s;", (gid,))
-        tables = [r['table_number'] for r in cur.fetchall()]
-        cur.execute("SELECT * FROM orders WHERE table_number = ANY(%s) AND status != 'paid';", (tables,))
-        orders = cur.fetchall()
-        for o in orders:
-            cur.execute("UPDATE orders SET status = 'paid', updated_at = NOW() WHERE id = %s;", (o['id'],))
-            if o['table_number']:
-                cur.execute("UPDATE tables SET status = 'available' WHERE number = %s;", (o['table_number'],))
-        cur.execute("DELETE FROM linked_table_groups WHERE id = %s;", (gid,))
         conn.commit()
         cur.close()
         conn.close()
-        return jsonify({'paid_orders': [o['id'] for o in orders]})
+        return jsonify({'paid_orders': result['paid_orders']})
     except Exception as e:
         conn.rollback()
         cur.close()
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+
+@app.route('/api/orders:close', methods=['POST'])
+def close_orders_endpoint():
+    """
+    Close (mark paid) a list of orders and free their tables atomically.
+
+    Body: {"order_ids": [...], "payment_method": optional}
+    Unknown ids fail the whole request; orders already paid are skipped.
+    A table is freed, and unlinked from any group, only once no other open
+    order remains on it. The other tables stay linked; a group left with
+    fewer than two tables is dissolved. Two statements regardless of the
+    number of orders.
+    """
+    data = request.get_json() or {}
+    order_ids = data.get('order_ids')
+    if not isinstance(order_ids, list) or not order_ids:
+        return jsonify({'error': 'order_ids must be a non-empty list'}), 400
+    try:
+        order_ids = list({str(uuid.UUID(str(oid))) for oid in order_ids})
+    except ValueError:
+        return jsonify({'error': 'Invalid order id format'}), 400
+    payment_method = data.get('payment_method')
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # Lock the orders and find any unknown ids
+        cur.execute(
+            """
+            SELECT COALESCE(array_agg(req.id::text) FILTER (WHERE o.id IS NULL), '{}') AS missing
+            FROM unnest(%s::uuid[]) AS req (id)
+            LEFT JOIN (SELECT id FROM orders WHERE id = ANY(%s::uuid[]) FOR UPDATE) o ON o.id = req.id;
+            """,
+            (order_ids, order_ids)
+        )
+        missing = cur.fetchone()['missing']
+        if missing:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Orders not found', 'missing': missing}), 404
+
+        cur.execute(CLOSE_ORDERS_SQL, (payment_method, order_ids, order_ids))
+        result = cur.fetchone()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+    return jsonify(result)
+
+# ----------- Exports -----------
+
+@app.route('/api/export/orders', methods=['GET'], defaults={'kind': 'orders'})
+@app.route('/api/export/order-items', methods=['GET'], defaults={'kind': 'order-items'})
+def export_endpoint(kind):
+    """
+    Stream order history as CSV (default) or NDJSON.
+
+    Query params: format (csv|ndjson), from (inclusive) / to (exclusive) as
+    ISO dates or timestamps on the order's created_at, status (comma list).
+    Rows come from a server-side cursor in batches, so memory stays flat.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        where, params = exports.parse_export_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        conn, cur, columns = exports.open_export(kind, where, params)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    filename = f"{kind}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    response = Response(exports.stream_export(conn, cur, columns, fmt), mimetype=exports.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ----------- Reports -----------
+
+def run_report(build):
+    """Refresh the sales rollups, then build a report from them with `build(cur)`."""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        reports.refresh_rollups(cur)
+        conn.commit()
+        result = build(cur)
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+    return jsonify(result)
+
+@app.route('/api/reports/sales', methods=['GET'])
+def sales_report_endpoint():
+    """
+    Sales per hour/day/week/month over business days [from, to].
+
+    Query params: from, to (YYYY-MM-DD), granularity (hour|day|week|month,
+    default day), tz, cutoff. Returns {"buckets": [...], "totals": {...}}
+    with orders, covers, gross/net sales, discounts, tax, tips, total,
+    avg_ticket and avg_per_cover.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in reports.GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(reports.GRANULARITIES)}"}), 400
+    try:
+        params = reports.parse_report_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return run_report(lambda cur: reports.sales_report(cur, params, granularity))
+
+@app.route('/api/reports/items', methods=['GET'])
+def items_report_endpoint():
+    """Best sellers over [from, to]; group=item (default) or group=category, limit (default 50)."""
+    group = request.args.get('group', 'item')
+    if group not in ('item', 'category'):
+        return jsonify({'error': 'group must be item or category'}), 400
+    try:
+        limit = int(request.args.get('limit', reports.ITEMS_REPORT_LIMIT))
+        params = reports.parse_report_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    return run_report(lambda cur: reports.items_report(cur, params, group, limit))
+
+@app.route('/api/reports/servers', methods=['GET'])
+def servers_report_endpoint():
+    """Orders, covers, net sales and tips by server over [from, to]."""
+    try:
+        params = reports.parse_report_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return run_report(lambda cur: reports.servers_report(cur, params))
+
+@app.route('/api/reports/labor', methods=['GET'])
+def labor_report_endpoint():
+    """
+    Hours worked, paid/unpaid break time, weekly overtime and labor cost per
+    employee over business days [from, to] (same params as the sales report).
+    """
+    try:
+        params = reports.parse_report_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        report = reports.labor_report(cur, params)
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+    return jsonify(report)
+
 # Employee collection endpoints
 @app.route('/api/employees', methods=['GET', 'POST', 'OPTIONS'])
 @cross_origin()
@@ -1690,16 +2127,11 @@ def table_item(table_id):
 @app.route('/api/break-history', methods=['GET', 'POST'])
 def break_history_collection():
     if request.method == 'GET':
-        employee_id = request.args.get('employee_id')
+        # Optional filters: employee_id, from/to (ISO timestamps on break_start)
+        sql, params = break_history_query(request.args)
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        if employee_id:
-            cur.execute(
-                "SELECT * FROM break_history WHERE employee_id = %s ORDER BY break_start DESC;",
-                (employee_id,)
-            )
-        else:
-            cur.execute("SELECT * FROM break_history ORDER BY break_start DESC;")
+        cur.execute(sql, tuple(params))
         records = cur.fetchall()
         cur.close()
         conn.close()
@@ -1707,7 +2139,7 @@ def break_history_collection():
     else:
         data = request.get_json()
         cols, vals, ph = [], [], []
-        for key in ['employee_id','break_start','break_end','date']:
+        for key in ['employee_id','break_start','break_end','date','paid']:
             if key in data:
                 cols.append(key)
                 vals.append(data[key])
@@ -1728,7 +2160,7 @@ def break_history_collection():
 def break_history_item(record_id):
     data = request.get_json()
     fields, vals = [], []
-    for key in ['employee_id','break_start','break_end','date']:
+    for key in ['employee_id','break_start','break_end','date','paid']:
         if key in data:
             fields.append(f"{key} = %s")
             vals.append(data[key])
@@ -1748,58 +2180,70 @@ def break_history_item(record_id):
     else:
         return jsonify({'error':'Record not found'}),404
 
-# Seed mock data for menu_items and inventory_items if tables are empty
-try:
+# Shift history (recorded from employee clock-in/out, see migration 0010)
+@app.route('/api/shifts', methods=['GET'])
+def shifts_collection():
+    """List shifts newest first; optional employee_id and from/to (ISO timestamps on clock_in)."""
+    where, params = [], []
+    if request.args.get('employee_id'):
+        where.append("employee_id = %s")
+        params.append(request.args['employee_id'])
+    if request.args.get('from'):
+        where.append("clock_in >= %s")
+        params.append(request.args['from'])
+    if request.args.get('to'):
+        where.append("clock_in < %s")
+        params.append(request.args['to'])
+    sql = "SELECT * FROM shifts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
     conn = get_db_connection()
-    cur = conn.cursor()
-    # Menu items
-    cur.execute("SELECT COUNT(*) FROM menu_items;")
-    if cur.fetchone()[0] == 0:
-        # Seed some mock menu items across Breakfast, Lunch, Dinner
-        mock_menu = [
-            ('Pancakes', 5.99, 'Breakfast', 'pancakes.png'),
-            ('Omelette', 6.49, 'Breakfast', 'omelette.png'),
-            ('Coffee', 2.50, 'Breakfast', 'coffee.png'),
-            ('BLT Sandwich', 7.50, 'Lunch', 'blt_sandwich.png'),
-            ('Caesar Salad', 8.00, 'Lunch', 'caesar_salad.png'),
-            ('Burger', 9.25, 'Lunch', 'burger.png'),
-            ('Steak Dinner', 15.00, 'Dinner', 'steak_dinner.png'),
-            ('Grilled Salmon', 14.50, 'Dinner', 'grilled_salmon.png'),
-            ('Ice Cream', 4.00, 'Dessert', 'ice_cream.png')
-        ]
-        for name, price, category, image in mock_menu:
-            cur.execute(
-                "INSERT INTO menu_items (name, price, category, image) VALUES (%s, %s, %s, %s);",
-                (name, price, category, image)
-            )
-    # Inventory items
-    cur.execute("SELECT COUNT(*) FROM inventory_items;")
-    if cur.fetchone()[0] == 0:
-        mock_inv = [
-            ('Coffee Beans', 20, 'kg', 15.0, 'Local Supplier', None),
-            ('Milk', 10, 'liters', 1.2, 'Dairy Co', None),
-            ('Bread Loaf', 30, 'pcs', 0.5, 'Bakery Inc', None),
-            ('Lettuce', 25, 'heads', 0.8, 'Green Farms', None)
-        ]
-        for name, quantity, unit, cost, supplier, image in mock_inv:
-            cur.execute(
-                "INSERT INTO inventory_items (name, quantity, unit, cost, supplier, image) VALUES (%s, %s, %s, %s, %s, %s);",
-                (name, quantity, unit, cost, supplier, image)
-            )
-    # Seed owner employee if none exist
-    cur.execute("SELECT COUNT(*) FROM employees;")
-    if cur.fetchone()[0] == 0:
-        cur.execute(
-            "INSERT INTO employees (name, position, status, hourly_rate, access_code) VALUES (%s, %s, %s, %s, %s);",
-            ("Carlos Flores", "owner", "active", 0, "1020304")
-        )
-    conn.commit()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(sql + " ORDER BY clock_in DESC;", tuple(params))
+        records = cur.fetchall()
+    except pg_errors.DataError as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    cur.close()
+    conn.close()
+    return jsonify(records)
+
+@app.route('/api/shifts/<string:shift_id>', methods=['PUT'])
+def shift_item(shift_id):
+    """Correct a shift, e.g. a missed clock-out."""
+    data = request.get_json() or {}
+    fields, vals = [], []
+    for key in ['clock_in', 'clock_out', 'hourly_rate']:
+        if key in data:
+            fields.append(f"{key} = %s")
+            vals.append(data[key])
+    if not fields:
+        return jsonify({'error': 'No data provided'}), 400
+    fields.append('updated_at = NOW()')
+    vals.append(shift_id)
+    sql = f"UPDATE shifts SET {', '.join(fields)} WHERE id = %s RETURNING *;"
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(sql, tuple(vals))
+        updated = cur.fetchone()
+        conn.commit()
+    except (pg_errors.CheckViolation, pg_errors.UniqueViolation, pg_errors.DataError) as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 400
     cur.close()
     conn.close()
-except Exception as e:
-    print(f"Warning: could not seed mock data: {e}")
+    if updated:
+        return jsonify(updated)
+    return jsonify({'error': 'Shift not found'}), 404
 
 if __name__ == '__main__':
+    # Local development only; production runs `gunicorn app:app` (see gunicorn.conf.py)
     import os
     import time
 
@@ -1809,7 +2253,7 @@ if __name__ == '__main__':
         attempts = 0
         while attempts < 3:
             try:
-                app.run(host='0.0.0.0', port=port, debug=True)
+                app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG', '1') == '1')
                 break
             except OSError as e:
                 if e.errno == 57:
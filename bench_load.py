@@ -0,0 +1,580 @@
+"""
+Dinner-rush load test: replay a service mix against the app and report
+latency percentiles and throughput per route.
+
+    python bench_load.py                          # disposable DB, gunicorn, 30 s at 16 clients
+    python bench_load.py -c 32 -d 60 --server dev
+    python bench_load.py --url http://127.0.0.1:5050   # an already running app, no DB setup
+    python bench_load.py --compare bench-results/load-20250501-190000.json
+
+Unless --url is given, a database named --db (default pos_bench_<pid>) is
+created on the server of --admin-dsn (default $BENCH_ADMIN_DSN, else
+postgresql://postgres@localhost:5432/postgres; never the db.py defaults,
+and the production cluster is refused), loaded with crate_table.sql, brought
+up to date by migrate.py and seeded with --tables tables, --menu-items menu
+items and --history paid orders. The app is then booted against it, on
+gunicorn (gunicorn.conf.py) or the Werkzeug dev server, and the database is
+dropped afterwards unless --keep-db is given.
+
+Each client is a keep-alive HTTP connection that loops over weighted
+scenarios, like a floor of servers and host stands during service:
+
+    poll_tables     GET  /api/tables
+    fetch_menu      GET  /api/menu
+    open_order      POST /api/orders                    seat a free table
+    add_item        POST /api/order-items
+    add_items_batch POST /api/orders/<id>/items:batch
+    change_table    POST /api/orders/change-table       move a party to a free table
+    merge_orders    POST /api/orders/merge
+    pay_order       POST /api/orders:close
+    pay_linked      POST /api/table-links + POST /api/pay-linked/<table>
+
+Clients share a model of the floor (free tables, open orders) and reserve
+what they touch, so scenarios rarely collide; the conflicts that remain are
+counted as 4xx, not errors. Errors are 5xx responses and failed requests.
+
+Results are written as JSON to --output (default
+bench-results/load-<timestamp>.json): per route count, errors, statuses,
+req/s, mean, p50/p95/p99 and max in milliseconds, plus the run's settings
+and git commit. --compare prints each route's change against a saved run.
+
+Measured locally (1 vCPU shared by the clients, gunicorn and PostgreSQL 16,
+so mostly useful relative to other runs), `-c 8 -d 10 --history 5000`:
+
+    route                                    count   req/s      p50      p95      p99
+    GET /api/tables                            850    85.0     39.7     62.7     78.1
+    POST /api/orders                           338    33.8     31.5     55.6     71.7
+    POST /api/order-items                      315    31.5     32.0     55.5     79.0
+    POST /api/orders/merge                      41     4.1     43.0     80.3    102.0
+    TOTAL                                     2159   215.9     35.0     60.3     79.0
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+import psycopg2
+from psycopg2 import extensions as pg_extensions
+
+import db
+from migrate import migrate
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(ROOT, 'crate_table.sql')
+RESULTS_DIR = os.path.join(ROOT, 'bench-results')
+
+# Maintenance connection used to create and drop the disposable database
+ADMIN_DSN = os.getenv('BENCH_ADMIN_DSN', 'postgresql://postgres@localhost:5432/postgres')
+
+# Scenario name -> relative weight in the mix
+SCENARIO_WEIGHTS = {
+    'poll_tables': 40,
+    'fetch_menu': 8,
+    'open_order': 10,
+    'add_item': 16,
+    'add_items_batch': 6,
+    'change_table': 4,
+    'merge_orders': 3,
+    'pay_order': 8,
+    'pay_linked': 3,
+}
+
+SEED_SQL = """
+INSERT INTO restaurant_sections (name) VALUES ('Main'), ('Patio'), ('Bar');
+
+INSERT INTO tables (number, capacity, status, section_id)
+SELECT g::text, 2 + 2 * (g %% 3), 'available',
+       (SELECT id FROM restaurant_sections ORDER BY name OFFSET g %% 3 LIMIT 1)
+FROM generate_series(1, %(tables)s) g;
+
+INSERT INTO menu_categories (name)
+SELECT 'Bench Category ' || g FROM generate_series(1, 12) g
+ON CONFLICT DO NOTHING;
+
+INSERT INTO menu_items (name, price, category, category_id)
+SELECT 'Bench Item ' || g, (g %% 25) + 3.5, mc.name, mc.id
+FROM generate_series(1, %(menu_items)s) g
+JOIN LATERAL (
+    SELECT id, name FROM menu_categories ORDER BY name OFFSET g %% 12 LIMIT 1
+) mc ON TRUE;
+
+INSERT INTO orders (table_number, server, status, tip, paid, client_count, payment_method, created_at)
+SELECT (1 + g %% %(tables)s)::text, 'Server ' || (g %% 12), 'paid', 3, TRUE, 1 + g %% 6, 'card',
+       NOW() - (g || ' minutes')::interval
+FROM generate_series(1, %(history)s) g;
+
+INSERT INTO order_items (order_id, menu_item_id, quantity, client_number)
+SELECT o.id, mi.id, 1 + n %% 2, n
+FROM orders o
+CROSS JOIN generate_series(1, 3) n
+JOIN LATERAL (
+    SELECT id FROM menu_items ORDER BY id OFFSET (n * 7) %% %(menu_items)s LIMIT 1
+) mi ON TRUE;
+"""
+
+
+# ----------- Disposable database -----------
+
+def server_settings(admin_dsn):
+    """PG_* settings for the app and db.connect() on the server of `admin_dsn`."""
+    params = pg_extensions.parse_dsn(admin_dsn)
+    return {
+        'PG_HOST': params.get('host', 'localhost'),
+        'PG_PORT': params.get('port', '5432'),
+        'PG_USER': params.get('user', 'postgres'),
+        'PG_PASSWORD': params.get('password', ''),
+    }
+
+
+def admin_connect(admin_dsn):
+    conn = psycopg2.connect(admin_dsn)
+    conn.set_isolation_level(pg_extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    return conn
+
+
+def create_database(admin_dsn, name, tables, menu_items, history):
+    conn = admin_connect(admin_dsn)
+    cur = conn.cursor()
+    cur.execute(f'DROP DATABASE IF EXISTS "{name}";')
+    cur.execute(f'CREATE DATABASE "{name}";')
+    cur.close()
+    conn.close()
+
+    # db.connect() and migrate() read these at call time
+    settings = server_settings(admin_dsn)
+    db.DB_HOST, db.DB_PORT = settings['PG_HOST'], settings['PG_PORT']
+    db.DB_USER, db.DB_PASSWORD = settings['PG_USER'], settings['PG_PASSWORD']
+    db.DB_NAME = name
+    conn = db.connect()
+    cur = conn.cursor()
+    with open(SCHEMA_FILE) as f:
+        cur.execute(f.read())
+    conn.commit()
+    migrate()
+    cur.execute(SEED_SQL, {'tables': tables, 'menu_items': menu_items, 'history': history})
+    # Roll the seeded history into the report tables so the run starts clean
+    cur.execute("SELECT refresh_sales_rollups();")
+    cur.execute("ANALYZE;")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def drop_database(admin_dsn, name):
+    conn = admin_connect(admin_dsn)
+    cur = conn.cursor()
+    cur.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE);')
+    cur.close()
+    conn.close()
+
+
+# ----------- App server -----------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, admin_dsn, database, port):
+    env = dict(os.environ, **server_settings(admin_dsn), PG_DATABASE=database,
+               PORT=str(port), FLASK_PORT=str(port), FLASK_DEBUG='0')
+    if kind == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}']
+    else:
+        cmd = [sys.executable, 'app.py']
+    log = open(os.path.join(RESULTS_DIR, f'server-{port}.log'), 'w')
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with status {proc.returncode}, see {log.name}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f'server did not become healthy, see {log.name}')
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ----------- Floor model -----------
+
+class Floor:
+    """What the clients know about the restaurant: free tables and open orders."""
+
+    def __init__(self, tables, menu_item_ids):
+        self.lock = threading.Lock()
+        self.free = set(tables)
+        # table_number -> order id, for orders no client is working on
+        self.open = {}
+        self.menu_item_ids = menu_item_ids
+
+    def take_free(self):
+        with self.lock:
+            if not self.free:
+                return None
+            table = random.choice(tuple(self.free))
+            self.free.discard(table)
+            return table
+
+    def take_open(self, count=1):
+        """Reserve `count` open orders as [(table, order_id)], or None."""
+        with self.lock:
+            if len(self.open) < count:
+                return None
+            tables = random.sample(tuple(self.open), count)
+            return [(t, self.open.pop(t)) for t in tables]
+
+    def release_free(self, *tables):
+        with self.lock:
+            self.free.update(tables)
+
+    def release_open(self, table, order_id):
+        with self.lock:
+            self.open[table] = order_id
+
+
+# ----------- Client -----------
+
+class Client:
+    """One keep-alive connection replaying scenarios; records (route, status, seconds)."""
+
+    def __init__(self, host, port, floor, samples, rng):
+        self.host, self.port = host, port
+        self.floor = floor
+        self.samples = samples
+        self.rng = rng
+        self.conn = None
+        self.recording = False
+
+    def call(self, route, method, path, body=None):
+        """Send one request; returns (status, parsed JSON or None). Status 0 is a failed request."""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Accept-Encoding': 'identity'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            status, raw = 0, b''
+        if self.recording:
+            self.samples.append((route, status, time.perf_counter() - start))
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+    def poll_tables(self):
+        self.call('GET /api/tables', 'GET', '/api/tables')
+
+    def fetch_menu(self):
+        self.call('GET /api/menu', 'GET', '/api/menu')
+
+    def open_order(self):
+        table = self.floor.take_free()
+        if table is None:
+            return self.poll_tables()
+        status, order = self.call('POST /api/orders', 'POST', '/api/orders', {
+            'table_number': table, 'server': f'Server {self.rng.randrange(12)}',
+            'status': 'pending', 'client_count': self.rng.randint(1, 6),
+        })
+        if status in (200, 201) and order:
+            self.floor.release_open(table, order['id'])
+        else:
+            self.floor.release_free(table)
+
+    def add_item(self):
+        taken = self.floor.take_open()
+        if not taken:
+            return self.open_order()
+        table, order_id = taken[0]
+        self.call('POST /api/order-items', 'POST', '/api/order-items', {
+            'order_id': order_id, 'menu_item_id': self.rng.choice(self.floor.menu_item_ids),
+            'quantity': self.rng.randint(1, 3), 'client_number': self.rng.randint(1, 4),
+        })
+        self.floor.release_open(table, order_id)
+
+    def add_items_batch(self):
+        taken = self.floor.take_open()
+        if not taken:
+            return self.open_order()
+        table, order_id = taken[0]
+        items = [
+            {'menu_item_id': self.rng.choice(self.floor.menu_item_ids), 'client_number': n}
+            for n in range(1, self.rng.randint(3, 8))
+        ]
+        self.call('POST /api/orders/<id>/items:batch', 'POST', f'/api/orders/{order_id}/items:batch', {'items': items})
+        self.floor.release_open(table, order_id)
+
+    def change_table(self):
+        taken = self.floor.take_open()
+        if not taken:
+            return self.open_order()
+        table, order_id = taken[0]
+        target = self.floor.take_free()
+        if target is None:
+            self.floor.release_open(table, order_id)
+            return self.poll_tables()
+        status, _ = self.call('POST /api/orders/change-table', 'POST', '/api/orders/change-table', {
+            'order_id': order_id, 'table_number': target,
+        })
+        if status == 200:
+            self.floor.release_free(table)
+            self.floor.release_open(target, order_id)
+        else:
+            self.floor.release_free(target)
+            self.floor.release_open(table, order_id)
+
+    def merge_orders(self):
+        taken = self.floor.take_open(2)
+        if not taken:
+            return self.open_order()
+        (target_table, target_id), (source_table, source_id) = taken
+        status, _ = self.call('POST /api/orders/merge', 'POST', '/api/orders/merge', {
+            'source_order_id': source_id, 'target_order_id': target_id,
+        })
+        self.floor.release_open(target_table, target_id)
+        if status == 200:
+            self.floor.release_free(source_table)
+        else:
+            self.floor.release_open(source_table, source_id)
+
+    def pay_order(self):
+        taken = self.floor.take_open()
+        if not taken:
+            return self.open_order()
+        table, order_id = taken[0]
+        status, _ = self.call('POST /api/orders:close', 'POST', '/api/orders:close', {
+            'order_ids': [order_id], 'payment_method': self.rng.choice(['card', 'cash']),
+        })
+        if status == 200:
+            self.floor.release_free(table)
+        else:
+            self.floor.release_open(table, order_id)
+
+    def pay_linked(self):
+        taken = self.floor.take_open(self.rng.randint(2, 3))
+        if not taken:
+            return self.open_order()
+        tables = [t for t, _ in taken]
+        status, _ = self.call('POST /api/table-links', 'POST', '/api/table-links', {
+            'leader': tables[0], 'tables': tables[1:],
+        })
+        if status == 201:
+            status, _ = self.call('POST /api/pay-linked/<table>', 'POST',
+                                  f'/api/pay-linked/{urllib.parse.quote(tables[0])}')
+        if status == 200:
+            self.floor.release_free(*tables)
+        else:
+            for table, order_id in taken:
+                self.floor.release_open(table, order_id)
+
+    def run(self, scenarios, weights, record_from, stop_at):
+        while time.monotonic() < stop_at:
+            self.recording = time.monotonic() >= record_from
+            getattr(self, self.rng.choices(scenarios, weights)[0])()
+        if self.conn is not None:
+            self.conn.close()
+
+
+def fetch_floor(host, port):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.request('GET', '/api/tables')
+    tables = json.loads(conn.getresponse().read())
+    conn.request('GET', '/api/menu')
+    menu = json.loads(conn.getresponse().read())
+    conn.request('GET', '/api/orders?open=true&limit=500')
+    open_orders = json.loads(conn.getresponse().read())['orders']
+    conn.close()
+    floor = Floor(
+        [t['number'] for t in tables if not t.get('group_id')],
+        [m['id'] for m in menu],
+    )
+    for order in open_orders:
+        if order.get('table_number') in floor.free:
+            floor.free.discard(order['table_number'])
+            floor.open[order['table_number']] = order['id']
+    if not floor.menu_item_ids:
+        raise RuntimeError('the menu is empty; seed the database first')
+    return floor
+
+
+def run_load(host, port, concurrency, duration, warmup, seed):
+    floor = fetch_floor(host, port)
+    samples = []
+    scenarios = list(SCENARIO_WEIGHTS)
+    weights = [SCENARIO_WEIGHTS[s] for s in scenarios]
+    start = time.monotonic()
+    record_from, stop_at = start + warmup, start + warmup + duration
+    clients = [Client(host, port, floor, samples, random.Random(seed + i)) for i in range(concurrency)]
+    threads = [threading.Thread(target=c.run, args=(scenarios, weights, record_from, stop_at)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+# ----------- Results -----------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, duration):
+    def stats(rows):
+        latencies = sorted(seconds * 1000 for _, _, seconds in rows)
+        statuses = {}
+        for _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'count': len(rows),
+            'errors': sum(1 for _, status, _ in rows if status == 0 or status >= 500),
+            'statuses': statuses,
+            'rps': round(len(rows) / duration, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+            'max_ms': round(latencies[-1], 3) if latencies else None,
+        }
+
+    by_route = {}
+    for row in samples:
+        by_route.setdefault(row[0], []).append(row)
+    return stats(samples), {route: stats(rows) for route, rows in sorted(by_route.items())}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(total, routes, previous=None):
+    header = f"{'route':38} {'count':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if previous:
+        header += f" {'Δp95':>8} {'Δreq/s':>8}"
+    print(header)
+    rows = list(routes.items()) + [('TOTAL', total)]
+    for route, s in rows:
+        line = (f"{route:38} {s['count']:7d} {s['errors']:5d} {s['rps']:8.1f} "
+                f"{s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f}")
+        if previous:
+            before = previous['total'] if route == 'TOTAL' else previous['routes'].get(route)
+            if before and before.get('p95_ms'):
+                line += (f" {(s['p95_ms'] / before['p95_ms'] - 1) * 100:+7.1f}%"
+                         f" {(s['rps'] / before['rps'] - 1) * 100 if before['rps'] else 0:+7.1f}%")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='simultaneous clients')
+    parser.add_argument('-d', '--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before the run')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the scenario mix')
+    parser.add_argument('--url', help='benchmark an already running app instead of booting one')
+    parser.add_argument('--server', choices=['gunicorn', 'dev'], default='gunicorn', help='how to boot the app')
+    parser.add_argument('--admin-dsn', default=ADMIN_DSN,
+                        help='maintenance connection on the server that hosts the disposable database')
+    parser.add_argument('--db', default=f'pos_bench_{os.getpid()}', help='name of the disposable database')
+    parser.add_argument('--keep-db', action='store_true', help='do not drop the database afterwards')
+    parser.add_argument('--tables', type=int, default=60, help='tables on the floor')
+    parser.add_argument('--menu-items', type=int, default=300, help='menu items')
+    parser.add_argument('--history', type=int, default=20000, help='paid orders already in the database')
+    parser.add_argument('--output', help='results file (default bench-results/load-<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args(argv)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    started_at = datetime.now(timezone.utc)
+    proc = None
+    if args.url:
+        parsed = urllib.parse.urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        server = server_settings(args.admin_dsn)['PG_HOST']
+        if server == db.DEFAULT_HOST:
+            print("Refusing to run: --admin-dsn is the production cluster; use a scratch server")
+            return 2
+        print(f"Creating database {args.db} on {server}")
+        create_database(args.admin_dsn, args.db, args.tables, args.menu_items, args.history)
+        host, port = '127.0.0.1', free_port()
+    try:
+        if not args.url:
+            print(f"Starting {args.server} on port {port}")
+            proc = start_server(args.server, args.admin_dsn, args.db, port)
+        print(f"Running {args.concurrency} clients for {args.warmup:g}s warmup + {args.duration:g}s")
+        samples = run_load(host, port, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+        if not args.url and not args.keep_db:
+            drop_database(args.admin_dsn, args.db)
+
+    total, routes = summarize(samples, args.duration)
+    results = {
+        'started_at': started_at.isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'settings': {
+            'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup,
+            'seed': args.seed, 'server': 'external' if args.url else args.server,
+            'tables': args.tables, 'menu_items': args.menu_items, 'history': args.history,
+            'scenario_weights': SCENARIO_WEIGHTS,
+        },
+        'total': total,
+        'routes': routes,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{started_at:%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_table(total, routes, previous)
+    print(f"Results written to {output}")
+    return 1 if total['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
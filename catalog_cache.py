@@ -0,0 +1,267 @@
+"""
+Read-through cache for the menu catalog responses.
+
+Every catalog write bumps `catalog_version` through a trigger (migration
+0006) and NOTIFYs 'catalog_changed'. Each worker process keeps a LISTEN
+connection on a background thread, so it always knows the current version
+without querying: cached bodies are served, and conditional GETs whose
+If-None-Match carries the current ETag get a 304, with no DB access at all.
+
+The version and invalidation rules live in CatalogState, which the async
+read tier (read_tier.py) reuses with an asyncpg listener.
+"""
+import functools
+import os
+import select
+import threading
+import time
+
+from flask import current_app, request
+from psycopg2 import extensions as pg_extensions
+
+import compression
+from db import connect, get_db_connection
+
+CHANNEL = 'catalog_changed'
+# Max cached responses per worker (menu + per-item customization pages)
+MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '1024'))
+# Seconds between keep-alive pings on the LISTEN connection
+LISTEN_PING_INTERVAL = 30
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+VERSION_SQL = "SELECT version FROM catalog_version WHERE id = 1;"
+# Sent with every catalog response: revalidate each time, usually with a 304
+CACHE_CONTROL = 'no-cache'
+
+
+class CatalogState:
+    """
+    Known catalog version and cached bodies, independent of how the LISTEN
+    connection is driven. Shared by the Flask workers (CatalogCache below)
+    and the async read tier (read_tier.py), so both follow the same version
+    and invalidation rules.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # request key -> (version, body, mimetype, {encoding: compressed body})
+        self._entries = {}
+        # Current catalog version while the listener is connected, else None
+        self._version = None
+        self._listening = False
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.compressions = 0
+
+    # -- listener events --------------------------------------------------
+
+    def listener_connected(self, version):
+        """LISTEN is active and `version` was read after it."""
+        with self._lock:
+            self._listening = True
+        self._set_version(version if version is not None else 0)
+
+    def listener_notified(self, payload):
+        try:
+            self._set_version(int(payload))
+        except ValueError:
+            self.invalidate()
+
+    def listener_lost(self):
+        """Notifications may have been missed: stop trusting the known version."""
+        with self._lock:
+            self._listening = False
+            self._version = None
+
+    def _set_version(self, version):
+        with self._lock:
+            if self._version is not None and version <= self._version:
+                return
+            self._version = version
+            self._entries = {k: v for k, v in self._entries.items() if v[0] >= version}
+
+    # -- versioning -------------------------------------------------------
+
+    def known_version(self):
+        """Version from memory, or None when it has to be read from the database."""
+        return self._version
+
+    def queried_version(self, version):
+        """Record a version read from the database; returns it."""
+        version = version if version is not None else 0
+        # Safe to remember: the listener is LISTENing, so any later bump notifies us
+        with self._lock:
+            if self._listening and (self._version is None or version > self._version):
+                self._version = version
+        return version
+
+    def invalidate(self):
+        """Forget the known version so the next read re-checks the database."""
+        with self._lock:
+            self._version = None
+
+    # -- entries ----------------------------------------------------------
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, version, body, mimetype):
+        entry = (version, body, mimetype, {})
+        with self._lock:
+            if len(self._entries) >= MAX_ENTRIES:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+
+    def encoded(self, entry, encoding):
+        """Entry body compressed with `encoding`, compressed on first use only."""
+        body = entry[3].get(encoding)
+        if body is None:
+            body = entry[3][encoding] = compression.compress(entry[1], encoding, cached=True)
+            self.compressions += 1
+        return body
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'listening': self._listening,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'compressions': self.compressions,
+        }
+
+
+class CatalogCache(CatalogState):
+    """CatalogState kept current by a LISTEN thread in each worker process."""
+
+    def __init__(self):
+        super().__init__()
+        self._pid = None
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # New process (first use, or a forked worker): start clean
+            self._pid = os.getpid()
+            self._entries = {}
+            self._version = None
+            self._listening = False
+            thread = threading.Thread(target=self._listen, name='catalog-listener', daemon=True)
+            thread.start()
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = connect()
+                conn.set_isolation_level(pg_extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANNEL};")
+                # Read the version only after LISTEN so no bump can slip between
+                cur.execute(VERSION_SQL)
+                row = cur.fetchone()
+                self.listener_connected(row[0] if row else None)
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], LISTEN_PING_INTERVAL) == ([], [], []):
+                        cur.execute("SELECT 1;")
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.listener_notified(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Warning: catalog cache listener disconnected: {e}")
+                self.listener_lost()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def current_version(self):
+        """Catalog version, from memory when the listener is up, else one cheap query."""
+        self._ensure_listener()
+        version = self.known_version()
+        if version is not None:
+            return version
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(VERSION_SQL)
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return self.queried_version(row[0] if row else None)
+
+
+catalog_cache = CatalogCache()
+
+
+def catalog_etag(version):
+    return f"catalog-{version}"
+
+
+def is_not_modified(if_none_match, version):
+    """True when a parsed If-None-Match (werkzeug ETags) matches `version`."""
+    return if_none_match.contains_weak(catalog_etag(version))
+
+
+def catalog_route(view):
+    """
+    Decorator for catalog endpoints.
+
+    GET responses are cached per URL (path + query string) and catalog
+    version, along with their compressed variants, and carry an ETag; a
+    matching If-None-Match gets a 304.
+    Writes pass through and make this worker re-check the version, so the
+    writer sees its own change even before the NOTIFY arrives.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in WRITE_METHODS:
+            try:
+                return view(*args, **kwargs)
+            finally:
+                catalog_cache.invalidate()
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        version = catalog_cache.current_version()
+        etag = catalog_etag(version)
+        if is_not_modified(request.if_none_match, version):
+            catalog_cache.not_modified += 1
+            response = current_app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            response.vary.add('Accept-Encoding')
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            return response
+
+        key = request.full_path
+        entry = catalog_cache.get(key, version)
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = catalog_cache.put(key, version, response.get_data(), response.mimetype)
+        response = current_app.response_class(entry[1], mimetype=entry[2])
+        encoding = compression.negotiate(len(entry[1]), entry[2])
+        if encoding:
+            compression.set_encoded_body(response, catalog_cache.encoded(entry, encoding), encoding)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response
+
+    return wrapper
@@ -0,0 +1,94 @@
+"""
+Response compression negotiated on Accept-Encoding.
+
+JSON and text responses of at least COMPRESS_MIN_SIZE bytes are sent with
+brotli when the client accepts it and the `brotli` package is installed,
+otherwise gzip. Streamed responses (SSE, exports) are left alone.
+
+Catalog responses are compressed once per catalog version and encoding at
+a high level and kept next to the cached body (see catalog_cache.py),
+so identical menus are never recompressed.
+
+Environment variables:
+    COMPRESS_ENABLED      0 to turn compression off (default 1)
+    COMPRESS_MIN_SIZE     smallest body in bytes worth compressing (default 1024)
+    COMPRESS_GZIP_LEVEL   gzip level for per-request compression, 1-9 (default 6)
+    COMPRESS_BR_LEVEL     brotli quality for per-request compression, 0-11 (default 4)
+"""
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.getenv('COMPRESS_ENABLED', '1') == '1'
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', '4'))
+# Cached bodies are compressed once, so use high levels. Brotli 10-11 would
+# take seconds on a large menu, on the request that happens to fill the cache.
+CACHED_LEVELS = {'br': 9, 'gzip': 9}
+
+# Preferred first when the client rates encodings equally
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(size, mimetype):
+    """Encoding to use for a body of `size` bytes in the current request, or None."""
+    return choose_encoding(size, mimetype, request.accept_encodings)
+
+
+def choose_encoding(size, mimetype, accepted):
+    """Encoding for a body of `size` bytes given the parsed Accept-Encoding `accepted`, or None."""
+    if not ENABLED or size < MIN_SIZE or not is_compressible(mimetype):
+        return None
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding, cached=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=CACHED_LEVELS['br'] if cached else BR_LEVEL)
+    return gzip.compress(body, compresslevel=CACHED_LEVELS['gzip'] if cached else GZIP_LEVEL, mtime=0)
+
+
+def set_encoded_body(response, body, encoding):
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # A strong ETag names exact bytes; the encoded body is different bytes
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    """after_request hook: compress eligible responses for the negotiated encoding."""
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or not is_compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = negotiate(len(body), response.mimetype)
+    if encoding:
+        set_encoded_body(response, compress(body, encoding), encoding)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -1,5 +1,6 @@
 -- SQL schema export for RMG POS system
--- Run this script to recreate the database schema on another machine
+-- Run this script to recreate the database schema on another machine.
+-- Live databases are upgraded with the versioned files in ./migrations (python migrate.py).
 
 -- Enable UUID generation
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
@@ -0,0 +1,425 @@
+import functools
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions as pg_extensions
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Production cluster, used when PG_HOST / PG_DATABASE are not set
+DEFAULT_HOST = "cfls9h51f4i86c.cluster-czrs8kj4isg7.us-east-1.rds.amazonaws.com"
+DEFAULT_DATABASE = "dfc2jmocqkio6k"
+
+# Database configuration from environment
+DB_HOST = os.getenv("PG_HOST", DEFAULT_HOST)
+DB_NAME = os.getenv("PG_DATABASE", DEFAULT_DATABASE)
+DB_USER = os.getenv("PG_USER", "uf6s7k0lvso94d")
+DB_PASSWORD = os.getenv("PG_PASSWORD", "p26334802041005114bc98db3c5f0766326cca1abea7a6899ef860a12e79b95e8")
+DB_PORT = os.getenv("PG_PORT", "5432")
+
+# Connection pool configuration (per process; every gunicorn worker owns its own pool)
+POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX", "10"))
+# Seconds a request waits for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))
+# Connections older than this (seconds) are closed and replaced
+POOL_MAX_LIFETIME = float(os.getenv("PG_POOL_MAX_LIFETIME", "1800"))
+# Connections idle longer than this (seconds) are pinged with SELECT 1 on checkout
+POOL_HEALTHCHECK_IDLE = float(os.getenv("PG_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within POOL_TIMEOUT."""
+
+
+# Instrumentation hooks (see metrics.py, profiler.py). Observers are plain callables:
+#   query_observers:    fn(query, params, seconds, rowcount) after every cursor execute
+#   checkout_observers: fn(seconds, timed_out) after every pool checkout
+query_observers = []
+checkout_observers = []
+
+
+def _notify(observers, *args):
+    for observer in observers:
+        try:
+            observer(*args)
+        except Exception as e:
+            print(f"Warning: db observer failed: {e}")
+
+
+class _TimedCursorMixin:
+    """Reports the duration of every execute to query_observers."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _notify(query_observers, query, vars, time.perf_counter() - start, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _notify(query_observers, query, None, time.perf_counter() - start, self.rowcount)
+
+
+@functools.lru_cache(maxsize=None)
+def timed_cursor_class(base):
+    """Subclass of cursor class `base` (e.g. RealDictCursor) with timed execute."""
+    return type(f"Timed{base.__name__}", (_TimedCursorMixin, base), {})
+
+
+def target_problem(allow_production=False):
+    """
+    Why the PG_* target is not safe for a dev tool, or None when it is.
+
+    Tools that migrate, seed or load data check this first so they never
+    fall back to the production defaults above: PG_HOST must be set,
+    PG_DATABASE too unless the tool set DB_NAME itself, and the production
+    host is refused unless allow_production (read-only tools).
+    """
+    if not os.getenv("PG_HOST"):
+        return "PG_HOST is not set, so db.py would use the production cluster"
+    if not os.getenv("PG_DATABASE") and DB_NAME == DEFAULT_DATABASE:
+        return "PG_DATABASE is not set, so db.py would use the production database"
+    if DB_HOST == DEFAULT_HOST and not allow_production:
+        return "PG_HOST is the production cluster; point PG_* at a scratch database"
+    return None
+
+
+def connect():
+    """
+    Establishes a new, unpooled database connection using psycopg2.
+    Used by the pool itself and by one-off scripts (migrations, tooling).
+    """
+    return psycopg2.connect(
+        host=DB_HOST,
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        port=DB_PORT
+    )
+
+
+class PooledConnection:
+    """
+    Thin proxy around a psycopg2 connection handed out by ConnectionPool.
+
+    Behaves like the raw connection, except close() returns it to the pool
+    instead of tearing down the session, so existing route code that ends
+    with conn.close() keeps working unchanged.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def _live(self):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise psycopg2.InterfaceError('connection already returned to the pool')
+        return raw
+
+    def __getattr__(self, name):
+        return getattr(self._live(), name)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        raw = self._live()
+        if query_observers:
+            base = kwargs.get('cursor_factory') or raw.cursor_factory or pg_extensions.cursor
+            kwargs['cursor_factory'] = timed_cursor_class(base)
+        return raw.cursor(*args, **kwargs)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.putconn(raw)
+
+    def __del__(self):
+        # Safety net for handlers that return early without closing
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe, blocking psycopg2 connection pool.
+
+    - keeps between min_size and max_size connections open
+    - blocks up to `timeout` seconds when every connection is checked out
+    - pings connections that sat idle longer than `healthcheck_idle`
+    - recycles connections older than `max_lifetime`
+    - tracks checkout wait times and occupancy for stats()
+    """
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 max_lifetime=POOL_MAX_LIFETIME, healthcheck_idle=POOL_HEALTHCHECK_IDLE,
+                 connect_fn=connect):
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.healthcheck_idle = healthcheck_idle
+        self.pid = os.getpid()
+        self._connect = connect_fn
+        self._cond = threading.Condition()
+        # Idle connections as [conn, created_at, last_used_at], most recently used last
+        self._idle = []
+        # id(conn) -> created_at for every connection owned by the pool
+        self._born = {}
+        self._in_use = 0
+        self._closed = False
+        # Stats
+        self._checkouts = 0
+        self._timeouts = 0
+        self._waiting = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recycled = 0
+        self._failed_checks = 0
+        self._in_use_peak = 0
+
+    # -- internal helpers -------------------------------------------------
+
+    def _open(self):
+        conn = self._connect()
+        now = time.monotonic()
+        with self._cond:
+            self._born[id(conn)] = now
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, created_at):
+        return self.max_lifetime > 0 and time.monotonic() - created_at > self.max_lifetime
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # -- public API -------------------------------------------------------
+
+    def fill(self):
+        """Open connections until min_size is reached."""
+        while True:
+            with self._cond:
+                if self._closed or len(self._born) >= self.min_size:
+                    return
+            conn = self._open()
+            with self._cond:
+                self._idle.append([conn, self._born[id(conn)], time.monotonic()])
+                self._cond.notify()
+
+    def getconn(self):
+        """Check a raw connection out of the pool, waiting if necessary."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        entry = None
+        timed_out = False
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError('connection pool is closed')
+            while not self._idle and self._in_use + len(self._idle) >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    timed_out = True
+                    break
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            else:
+                if self._idle:
+                    entry = self._idle.pop()
+                self._in_use += 1
+        if timed_out:
+            _notify(checkout_observers, time.monotonic() - start, True)
+            raise PoolTimeout(
+                f'no database connection available after {self.timeout:.1f}s '
+                f'(max_size={self.max_size})'
+            )
+
+        try:
+            if entry is not None:
+                conn, created_at, last_used = entry
+                if self._is_expired(created_at):
+                    with self._cond:
+                        self._recycled += 1
+                    self._discard(conn)
+                    conn = self._open()
+                elif not self._is_healthy(conn, last_used):
+                    with self._cond:
+                        self._failed_checks += 1
+                    self._discard(conn)
+                    conn = self._open()
+            else:
+                conn = self._open()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._in_use_peak = max(self._in_use_peak, self._in_use)
+        _notify(checkout_observers, waited, False)
+        return conn
+
+    def putconn(self, conn):
+        """Return a raw connection to the pool, resetting any open transaction."""
+        keep = not conn.closed
+        if keep:
+            try:
+                status = conn.info.transaction_status
+                if status == pg_extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != pg_extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if keep and conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                keep = False
+        with self._cond:
+            created_at = self._born.get(id(conn))
+            if created_at is None or self._closed:
+                keep = False
+            elif keep and self._is_expired(created_at):
+                keep = False
+                self._recycled += 1
+        if not keep:
+            self._discard(conn)
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append([conn, created_at, time.monotonic()])
+            self._cond.notify()
+
+    def connection(self):
+        """Check out a connection wrapped in a PooledConnection proxy."""
+        return PooledConnection(self, self.getconn())
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Snapshot of pool occupancy and checkout wait times."""
+        with self._cond:
+            return {
+                'pid': self.pid,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': len(self._born),
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'in_use_peak': self._in_use_peak,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'failed_health_checks': self._failed_checks,
+                'wait_avg_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Pools inherited across fork(); kept referenced so their sockets are never
+# closed from the child (that would terminate the parent's sessions)
+_inherited_pools = []
+
+
+def get_pool():
+    """
+    Return this process's pool, creating it lazily.
+
+    The pool is keyed to the current pid: a gunicorn worker forked from a
+    preloaded master never reuses the master's sockets.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited_pools.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool()
+            try:
+                _pool.fill()
+            except Exception as e:
+                print(f"Warning: could not pre-open pooled connections: {e}")
+        return _pool
+
+
+def get_db_connection():
+    """
+    Check a connection out of the process-wide pool.
+    Returns a connection object; call close() to hand it back.
+    """
+    return get_pool().connection()
+
+
+def pool_stats():
+    """Stats for the current process's pool (creates it if needed)."""
+    return get_pool().stats()
+
+
+def close_pool():
+    """Close every idle pooled connection, e.g. before fork or on shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            if _pool.pid == os.getpid():
+                _pool.closeall()
+            else:
+                _inherited_pools.append(_pool)
+        _pool = None
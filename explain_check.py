@@ -0,0 +1,190 @@
+"""
+EXPLAIN regression check for the hot route queries.
+
+Runs EXPLAIN on the queries behind the busiest routes and fails when the
+planner picks a sequential scan on one of the large tables. Meant for a
+disposable local Postgres (PG_* env vars, see db.py):
+
+    python explain_check.py --migrate --seed   # migrate, load synthetic volume, check
+    python explain_check.py                    # check the current schema and data only
+
+PG_HOST and PG_DATABASE must be set; the production defaults in db.py are
+never used. Plain EXPLAIN does not write, so the check alone may run against
+any database named explicitly, but --migrate and --seed refuse the
+production cluster.
+
+Exits with status 1 when any query regresses to a Seq Scan.
+"""
+import argparse
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+
+import db
+import read_queries
+from db import connect
+from migrate import migrate
+
+# Tables large enough in production that a sequential scan is a regression
+BIG_TABLES = {'orders', 'order_items', 'linked_table_members', 'break_history', 'menu_items'}
+
+SAMPLE_TABLE = '7'
+SAMPLE_UUID = str(uuid.UUID(int=1))
+
+def _orders_page(args):
+    sql, params, _ = read_queries.orders_page_query(args)
+    return sql, tuple(params)
+
+
+def _break_history(args):
+    sql, params = read_queries.break_history_query(args)
+    return sql, tuple(params)
+
+
+# (route, sql, params) for every checked query, with the SQL the routes run
+ROUTE_QUERIES = [
+    # Fails to plan if the ON CONFLICT target stops matching idx_orders_one_open_per_table
+    ('create_order', read_queries.create_order_sql(['table_number', 'status']), (SAMPLE_TABLE, 'pending')),
+    # Without limit/cursor the route returns every order by design; check the paged form
+    ('list_orders?limit=100', *_orders_page({'limit': '100'})),
+    ('list_orders?cursor=', *_orders_page({'cursor': read_queries.encode_order_cursor(
+        {'created_at': datetime(2025, 5, 1, tzinfo=timezone.utc), 'id': SAMPLE_UUID})})),
+    ('list_orders?open=true', *_orders_page({'open': 'true', 'table_number': SAMPLE_TABLE})),
+    ('get_order', read_queries.ORDER_BY_ID_SQL, (SAMPLE_UUID,)),
+    ('get_order_items', read_queries.ORDER_ITEMS_SQL, (SAMPLE_UUID,)),
+    ('merge_orders_endpoint', read_queries.MOVE_ORDER_ITEMS_SQL, (SAMPLE_UUID, 2, SAMPLE_UUID)),
+    ('change_order_table_endpoint', read_queries.OPEN_ORDER_FOR_TABLE_SQL, (SAMPLE_TABLE,)),
+    ('get_table', read_queries.TABLE_BY_ID_SQL, (SAMPLE_UUID,)),
+    ('get_table_link', read_queries.TABLE_LINK_SQL, (SAMPLE_TABLE,)),
+    ('pay_linked_group', read_queries.PAY_LINKED_GROUP_SQL, (SAMPLE_TABLE,)),
+    ('close_orders_endpoint', read_queries.CLOSE_ORDERS_SQL, (None, [SAMPLE_UUID], [SAMPLE_UUID])),
+    ('break_history_collection', *_break_history({'employee_id': SAMPLE_UUID})),
+    # Not a route query: deleting a category checks menu_items through this FK lookup
+    ('menu items by category',
+     "SELECT * FROM menu_items WHERE category_id = %s;",
+     (SAMPLE_UUID,)),
+]
+
+# Synthetic volume so the planner sees production-like table sizes
+SEED_SQL = """
+INSERT INTO menu_categories (name)
+SELECT 'Explain Category ' || g FROM generate_series(1, 20) g
+ON CONFLICT DO NOTHING;
+
+INSERT INTO menu_items (name, price, category, category_id)
+SELECT 'Explain Item ' || g, (g % 30) + 0.99, mc.name, mc.id
+FROM generate_series(1, 5000) g
+JOIN LATERAL (
+    SELECT id, name FROM menu_categories ORDER BY name OFFSET (g % 20) LIMIT 1
+) mc ON TRUE;
+
+INSERT INTO tables (number, capacity, status)
+SELECT 'X' || g, 4, 'available' FROM generate_series(1, 200) g;
+
+-- One open order on each of X1..X200, at most one per table (idx_orders_one_open_per_table)
+INSERT INTO orders (table_number, server, status, subtotal, tax, tip, total, paid, client_count, created_at)
+SELECT 'X' || CASE WHEN g <= 200 THEN g ELSE g % 200 END, 'Server ' || (g % 12),
+       CASE WHEN g <= 200 THEN 'pending' ELSE 'paid' END,
+       20, 2, 3, 25, g > 200, 1 + g % 6,
+       NOW() - (g || ' minutes')::interval
+FROM generate_series(1, 100000) g;
+
+INSERT INTO order_items (order_id, quantity, price, client_number)
+SELECT o.id, 1, 9.5, n
+FROM (SELECT id FROM orders ORDER BY created_at DESC LIMIT 100000) o,
+     generate_series(1, 3) n;
+
+INSERT INTO linked_table_groups (id)
+SELECT uuid_generate_v4() FROM generate_series(1, 5000);
+INSERT INTO linked_table_members (group_id, table_number, is_leader)
+SELECT g.id, 'L' || row_number() OVER (), TRUE
+FROM linked_table_groups g;
+
+INSERT INTO employees (name, position, status, hourly_rate)
+SELECT 'Explain Employee ' || g, 'server', 'active', 15 FROM generate_series(1, 200) g;
+INSERT INTO break_history (employee_id, break_start, break_end, date)
+SELECT e.id, NOW() - (g || ' hours')::interval, NOW() - (g || ' hours')::interval + interval '15 minutes',
+       (NOW() - (g || ' hours')::interval)::date
+FROM employees e, generate_series(1, 200) g;
+"""
+
+
+def seq_scans(plan, found=None):
+    """Collect the relation names of every Seq Scan node in an EXPLAIN JSON plan."""
+    if found is None:
+        found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        seq_scans(child, found)
+    return found
+
+
+def explain(cur, sql, params):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(';'), params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def check(verbose=False):
+    """EXPLAIN every route query; returns a list of (route, [tables]) regressions."""
+    conn = connect()
+    cur = conn.cursor()
+    failures = []
+    try:
+        for route, sql, params in ROUTE_QUERIES:
+            plan = explain(cur, sql, params)
+            bad = sorted({t for t in seq_scans(plan) if t in BIG_TABLES})
+            conn.rollback()
+            status = 'FAIL' if bad else 'ok'
+            print(f"{status:4} {route}" + (f"  (Seq Scan on {', '.join(bad)})" if bad else ''))
+            if verbose:
+                print(json.dumps(plan, indent=2, default=str))
+            if bad:
+                failures.append((route, bad))
+    finally:
+        cur.close()
+        conn.close()
+    return failures
+
+
+def seed():
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        cur.execute(SEED_SQL)
+        cur.execute("ANALYZE;")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--migrate', action='store_true', help='apply pending migrations first (disposable DB only)')
+    parser.add_argument('--seed', action='store_true', help='load synthetic rows before checking (disposable DB only)')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args(argv)
+
+    problem = db.target_problem(allow_production=not (args.migrate or args.seed))
+    if problem:
+        print(f"Refusing to run: {problem}")
+        return 2
+    if args.migrate:
+        migrate()
+    if args.seed:
+        seed()
+    failures = check(verbose=args.verbose)
+    if failures:
+        print(f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} regressed to a sequential scan")
+        return 1
+    print("No sequential scans on large tables")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
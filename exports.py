@@ -0,0 +1,150 @@
+"""
+Streaming CSV / NDJSON exports of order history.
+
+Rows are read through a server-side (named) cursor EXPORT_BATCH_SIZE at a
+time and written out batch by batch, so a worker's memory stays flat
+however large the export is. The pooled connection is held until the
+stream finishes or the client disconnects.
+"""
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from db import get_db_connection
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '2000'))
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+ORDER_COLUMNS = [
+    'id', 'created_at', 'updated_at', 'table_number', 'server', 'status', 'client_count',
+    'subtotal', 'discount_type', 'discount_value', 'discount', 'tax_rate', 'tax', 'tip', 'total',
+    'payment_method', 'paid',
+]
+
+ORDER_ITEM_COLUMNS = [
+    'id', 'order_id', 'order_created_at', 'table_number', 'server', 'order_status',
+    'menu_item_id', 'menu_item_name', 'quantity', 'price', 'modifiers', 'modifiers_total',
+    'line_total', 'notes', 'client_number', 'created_at',
+]
+
+ORDERS_SQL = f"""
+    SELECT {', '.join('o.' + c for c in ORDER_COLUMNS)}
+    FROM orders o
+    {{where}}
+    ORDER BY o.created_at, o.id
+"""
+
+ORDER_ITEMS_SQL = """
+    SELECT oi.id, oi.order_id, o.created_at, o.table_number, o.server, o.status,
+           oi.menu_item_id, mi.name, oi.quantity, oi.price,
+           (SELECT string_agg(co.name, '; ' ORDER BY co.name)
+              FROM order_item_modifiers m
+              JOIN customization_options co ON co.id = m.customization_option_id
+             WHERE m.order_item_id = oi.id),
+           oi.modifiers_total, oi.line_total, oi.notes, oi.client_number, oi.created_at
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN menu_items mi ON mi.id = oi.menu_item_id
+    {where}
+    ORDER BY o.created_at, o.id, oi.created_at, oi.id
+"""
+
+EXPORTS = {
+    'orders': (ORDERS_SQL, ORDER_COLUMNS),
+    'order-items': (ORDER_ITEMS_SQL, ORDER_ITEM_COLUMNS),
+}
+
+
+def parse_export_filters(args):
+    """
+    Filters on the order's created_at: from (inclusive) and to (exclusive),
+    ISO dates or timestamps; status (comma-separated). Returns (where, params);
+    raises ValueError with a client-facing message.
+    """
+    where, params = [], []
+    for name, op in (('from', '>='), ('to', '<')):
+        if args.get(name):
+            try:
+                value = datetime.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f'{name} must be an ISO date or timestamp')
+            where.append(f"o.created_at {op} %s")
+            params.append(value)
+    if args.get('status'):
+        where.append("o.status = ANY(%s)")
+        params.append([s.strip() for s in args['status'].split(',') if s.strip()])
+    return ("WHERE " + " AND ".join(where)) if where else "", params
+
+
+def to_text(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def format_csv(columns, rows, header=False):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([to_text(v) for v in row] for row in rows)
+    return buf.getvalue()
+
+
+def format_ndjson(columns, rows, header=False):
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), default=to_text) + '\n'
+        for row in rows
+    )
+
+
+def open_export(kind, where, params):
+    """
+    Declare the server-side cursor for an export. Done before the response
+    starts so query errors can still become a proper error status.
+    Returns (conn, cursor, columns).
+    """
+    sql, columns = EXPORTS[kind]
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        cur.itersize = EXPORT_BATCH_SIZE
+        cur.execute(sql.format(where=where), params)
+    except Exception:
+        conn.close()
+        raise
+    return conn, cur, columns
+
+
+def stream_export(conn, cur, columns, fmt):
+    """Generator of export chunks, one per batch; always releases the connection."""
+    formatter = format_csv if fmt == 'csv' else format_ndjson
+    try:
+        header = True
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows and not header:
+                break
+            yield formatter(columns, rows, header=header)
+            header = False
+            if len(rows) < EXPORT_BATCH_SIZE:
+                break
+    except Exception as e:
+        # Headers are already sent; all we can do is cut the stream short
+        print(f"Warning: export aborted: {e}")
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        # Returning the connection to the pool rolls back the read transaction
+        conn.close()
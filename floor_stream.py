@@ -0,0 +1,282 @@
+"""
+Live floor-plan events for GET /api/stream/floor (Server-Sent Events).
+
+Table, order-status and table-link writes are logged to `floor_events` by
+triggers (migration 0007), which NOTIFY 'floor_events' with the event id.
+Each worker process runs one LISTEN thread that fetches the notified events
+and fans them out to every open stream in that process, so the number of
+connected devices never multiplies database load.
+
+Under gunicorn every open stream pins a worker thread for up to
+FLOOR_STREAM_MAX_SECONDS, so each worker accepts at most
+FLOOR_STREAM_MAX_STREAMS streams and answers further ones with a 503 and
+Retry-After. The async read tier (read_tier.py) serves the same stream
+without that cost and is where devices should be sent in production; it
+reuses the queries and framing below.
+
+The SSE `id:` of every event is its floor_events id. A reconnecting client
+sends it back (EventSource does this automatically via Last-Event-ID) and
+receives what it missed. Ids are taken at insert time but become visible at
+commit, so a transaction that started earlier can commit a lower id after
+the client has seen a higher one. Resume therefore replays from an overlap
+window: every event since the first one recorded up to
+FLOOR_STREAM_RESUME_OVERLAP_SECONDS before the client's last event. Clients
+must skip events whose id they have already applied.
+"""
+import json
+import os
+import queue
+import select
+import threading
+import time
+
+from psycopg2 import extensions as pg_extensions
+from psycopg2.extras import RealDictCursor
+
+from db import connect, get_db_connection
+from json_provider import encode_default
+
+CHANNEL = 'floor_events'
+# How long events are kept for resuming clients
+RETENTION_HOURS = float(os.getenv('FLOOR_EVENTS_RETENTION_HOURS', '24'))
+# Seconds between SSE keep-alive comments
+HEARTBEAT_SECONDS = 15
+# Streams end after this many seconds; the client reconnects and resumes.
+# Keeps a gthread worker thread from being pinned by one device forever.
+MAX_STREAM_SECONDS = int(os.getenv('FLOOR_STREAM_MAX_SECONDS', '300'))
+# Max events replayed on resume before asking the client to refetch
+MAX_REPLAY = 1000
+# Longest a writing transaction may stay open and still have its events
+# replayed to a client that resumed past them
+RESUME_OVERLAP_SECONDS = float(os.getenv('FLOOR_STREAM_RESUME_OVERLAP_SECONDS', '60'))
+# Buffered events per stream before a slow client is told to refetch
+SUBSCRIBER_QUEUE_SIZE = 1000
+PRUNE_INTERVAL_SECONDS = 600
+# Open streams per worker process; unset means no limit (gunicorn.conf.py sets it)
+MAX_STREAMS = int(os.environ['FLOOR_STREAM_MAX_STREAMS']) if os.getenv('FLOOR_STREAM_MAX_STREAMS') else None
+# Seconds a client refused for capacity is told to wait
+RETRY_AFTER_SECONDS = 5
+
+PRUNE_SQL = "DELETE FROM floor_events WHERE created_at < NOW() - %s * interval '1 hour';"
+BOUNDS_SQL = "SELECT COALESCE(MIN(id), 0) AS min_id, COALESCE(MAX(id), 0) AS max_id FROM floor_events;"
+EVENTS_BY_ID_SQL = "SELECT id, kind, op, payload, created_at FROM floor_events WHERE id = ANY(%s) ORDER BY id;"
+# A lower id committed late started (created_at) at most
+# RESUME_OVERLAP_SECONDS before the client's last event
+MISSED_SQL = """
+    SELECT id, kind, op, payload, created_at FROM floor_events
+    WHERE id > LEAST(%s, COALESCE((
+        SELECT MIN(e.id) - 1 FROM floor_events e
+        WHERE e.created_at >= (SELECT created_at FROM floor_events WHERE id = %s)
+                              - make_interval(secs => %s)
+    ), %s))
+    ORDER BY id LIMIT %s;
+"""
+
+# floor_events.kind -> SSE event name
+EVENT_NAMES = {
+    'tables': 'table',
+    'orders': 'order',
+    'linked_table_members': 'link',
+}
+
+
+class FloorHub:
+    """Per-process fan-out of floor events from one LISTEN connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._subscribers = set()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._subscribers = set()
+            thread = threading.Thread(target=self._listen, name='floor-listener', daemon=True)
+            thread.start()
+
+    def _listen(self):
+        backoff = 1
+        last_prune = 0
+        while True:
+            conn = None
+            try:
+                conn = connect()
+                conn.set_isolation_level(pg_extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+                cur.execute(f"LISTEN {CHANNEL};")
+                backoff = 1
+                while True:
+                    if time.monotonic() - last_prune > PRUNE_INTERVAL_SECONDS:
+                        cur.execute(PRUNE_SQL, (RETENTION_HOURS,))
+                        last_prune = time.monotonic()
+                    if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    ids = []
+                    while conn.notifies:
+                        try:
+                            ids.append(int(conn.notifies.pop(0).payload))
+                        except ValueError:
+                            pass
+                    # Fetch by notified id: commit order can differ from id order
+                    if ids and self._subscribers:
+                        cur.execute(EVENTS_BY_ID_SQL, (ids,))
+                        for event in cur.fetchall():
+                            self._broadcast(event)
+            except Exception as e:
+                print(f"Warning: floor event listener disconnected: {e}")
+                # Streams may have missed events; make them reconnect and resume
+                self._broadcast(None)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _broadcast(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop its buffer and tell it to resync
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(None)
+
+    def subscribe(self):
+        """A new stream's event queue, or None when MAX_STREAMS are already open."""
+        self._ensure_listener()
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if MAX_STREAMS is not None and len(self._subscribers) >= MAX_STREAMS:
+                return None
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stats(self):
+        return {'listening_pid': self._pid, 'streams': len(self._subscribers), 'max_streams': MAX_STREAMS}
+
+
+floor_hub = FloorHub()
+
+
+def format_sse(event_name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_name}")
+    lines.append(f"data: {json.dumps(data, default=encode_default)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def format_event(event):
+    return format_sse(
+        EVENT_NAMES.get(event['kind'], event['kind']),
+        {'op': event['op'], 'data': event['payload'], 'at': event['created_at']},
+        event['id'],
+    )
+
+
+def parse_last_event_id(token):
+    """Resume token from Last-Event-ID or ?last_event_id=; raises ValueError."""
+    return int(token) if token else None
+
+
+def resume_plan(last_event_id, bounds):
+    """
+    'fresh' for a new client, 'reset' when its token fell out of retention
+    (or is from the future), else 'replay'. `bounds` is a BOUNDS_SQL row.
+    """
+    if last_event_id is None:
+        return 'fresh'
+    if last_event_id < bounds['min_id'] - 1 or last_event_id > bounds['max_id']:
+        return 'reset'
+    return 'replay'
+
+
+def missed_params(last_event_id):
+    return (last_event_id, last_event_id, RESUME_OVERLAP_SECONDS, last_event_id, MAX_REPLAY + 1)
+
+
+def load_missed_events(last_event_id):
+    """
+    Events the client may have missed since `last_event_id` (overlap window
+    included), or None when the client must refetch the floor plan (its
+    token fell out of retention or it missed too much). Also returns the
+    newest event id, used as the token for fresh clients.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(BOUNDS_SQL)
+        bounds = cur.fetchone()
+        plan = resume_plan(last_event_id, bounds)
+        if plan != 'replay':
+            return ([] if plan == 'fresh' else None), bounds['max_id']
+        cur.execute(MISSED_SQL, missed_params(last_event_id))
+        events = cur.fetchall()
+        if len(events) > MAX_REPLAY:
+            return None, bounds['max_id']
+        return events, bounds['max_id']
+    finally:
+        cur.close()
+        conn.close()
+
+
+def opening_chunks(last_event_id, missed, newest_id):
+    """
+    SSE chunks that open a stream (retry hint, ready/reset marker, replayed
+    events) and the set of replayed ids, to skip when they arrive live too.
+    """
+    chunks = ["retry: 3000\n\n"]
+    if missed is None:
+        # Too far behind: client reloads GET /api/tables, then resumes from newest_id
+        chunks.append(format_sse('reset', {'last_event_id': newest_id}, newest_id))
+        missed = []
+    elif last_event_id is None:
+        chunks.append(format_sse('ready', {'last_event_id': newest_id}, newest_id))
+    chunks.extend(format_event(event) for event in missed)
+    return chunks, {event['id'] for event in missed}
+
+
+def floor_event_stream(q, last_event_id):
+    """
+    Generator of SSE chunks for a queue from floor_hub.subscribe(): resume
+    replay first, then live events. Unsubscribes when it ends; the caller
+    also unsubscribes on close in case it is never started.
+    """
+    try:
+        # Subscribed before replaying so nothing committed in between is lost
+        missed, newest_id = load_missed_events(last_event_id)
+        chunks, sent = opening_chunks(last_event_id, missed, newest_id)
+        yield from chunks
+
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                event = q.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # Listener lost events or this client fell behind: end the
+                # stream, the client reconnects and resumes from its last id
+                return
+            if event['id'] in sent:
+                continue
+            yield format_event(event)
+    finally:
+        floor_hub.unsubscribe(q)
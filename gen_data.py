@@ -0,0 +1,660 @@
+"""
+Synthetic dataset generator for performance testing.
+
+Fills every table of crate_table.sql (and the tables added by migrations)
+with a restaurant's worth of history, loaded with COPY:
+
+    python gen_data.py --orders 1000000 --days 365 --truncate
+    python gen_data.py --menu-items 500 --options 5000 --orders 50000
+    python gen_data.py --seed 7 --end 2025-06-30     # same seed and end, same rows
+
+Runs against the PG_* database (see db.py), or --database on the PG_HOST
+server, after migrating it. Disposable databases only: PG_HOST must be set
+and must not be the production cluster, and PG_DATABASE or --database must
+name the target. The db.py production defaults are never used. The load
+truncates with --truncate and disables triggers, which locks the generated
+tables (ACCESS EXCLUSIVE) until it commits. Refuses to add to a database
+that already has orders unless --truncate is given, which empties the
+generated tables first.
+
+Output is deterministic: ids, times and choices come from random streams
+seeded by --seed, one stream per domain, so changing --orders leaves the
+catalog and the staff unchanged. History ends on --end (default today),
+which is the only input that depends on the clock.
+
+Distributions:
+    orders per day   weekday weights (Fri/Sat busiest), slow growth over the period
+    order time       lunch peak ~12:30 and dinner peak ~19:30 in REPORTS_TIMEZONE
+    party size       mostly 2, long tail up to 8; tables picked by capacity
+    items            one main per guest, plus drinks, starters, sides and desserts;
+                     popularity follows a Zipf curve within each category
+    customizations   ~35% of items carry 1-2 options allowed for that item
+    payments         card (with a 10-22% tip) or cash; a few discounts and split checks
+    staff            servers, cooks, hosts, bartenders and managers on lunch or
+                     dinner shifts with breaks; shifts also feed employees.clock_in/out
+
+The app's triggers (order totals, item prices, sales rollup queue, floor
+events, catalog version, shift history) are disabled for the load and
+their results written directly: prices, modifier totals and order totals
+are computed here with the same rules as migration 0008, then the sales
+rollups are rebuilt and the catalog version bumped once.
+
+Locally (1 vCPU, PostgreSQL 16) 20,000 orders over 30 days, about 155k
+items, load in 15 s; most of it is COPY and foreign-key checks on the
+server, so expect roughly linear scaling with --orders.
+"""
+import argparse
+import bisect
+import io
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from zoneinfo import ZoneInfo
+
+import db
+from db import connect
+from migrate import migrate
+from reports import REPORTS_TIMEZONE
+
+# Orders generated and copied per batch
+CHUNK_SIZE = 20000
+
+# Tables whose user triggers are disabled while loading
+TRIGGER_TABLES = [
+    'tables', 'employees', 'menu_items', 'menu_categories', 'menu_subcategories',
+    'customization_groups', 'customization_options', 'menu_item_customizations',
+    'menu_item_customization_options', 'orders', 'order_items', 'order_item_modifiers',
+    'linked_table_members',
+]
+
+# Emptied by --truncate (children first is not needed with CASCADE)
+GENERATED_TABLES = [
+    'split_items', 'order_splits', 'order_item_modifiers', 'order_items', 'orders',
+    'linked_table_members', 'linked_table_groups', 'map_elements', 'tables', 'restaurant_sections',
+    'menu_item_customization_options', 'menu_item_customizations', 'customization_options',
+    'customization_groups', 'menu_item_modifiers', 'modifier_options', 'modifiers',
+    'menu_items', 'menu_subcategories', 'menu_categories', 'inventory_items',
+    'break_history', 'shifts', 'employees', 'floor_events',
+    'sales_hourly', 'sales_hourly_items', 'sales_hourly_servers', 'sales_rollup_dirty',
+]
+
+# (category, kind, share of the menu)
+CATEGORIES = [
+    ('Starters', 'starter', 0.15),
+    ('Mains', 'main', 0.30),
+    ('Sides', 'side', 0.10),
+    ('Desserts', 'dessert', 0.10),
+    ('Soft Drinks', 'drink', 0.10),
+    ('Beer & Wine', 'drink', 0.15),
+    ('Cocktails', 'drink', 0.10),
+]
+SUBCATEGORIES = ['House', 'Classics', 'Seasonal']
+PRICE_RANGES = {
+    'starter': (6, 14), 'main': (12, 38), 'side': (4, 9), 'dessert': (6, 12), 'drink': (3, 14),
+}
+# Chance that a guest orders one more item of the kind
+EXTRA_ITEM_RATES = {'drink': 0.75, 'starter': 0.25, 'side': 0.2, 'dessert': 0.2}
+
+PARTY_SIZES = [1, 2, 3, 4, 5, 6, 7, 8]
+PARTY_WEIGHTS = [10, 36, 15, 20, 7, 6, 3, 3]
+# Monday first
+WEEKDAY_WEIGHTS = [0.75, 0.8, 0.9, 1.0, 1.35, 1.45, 1.15]
+OPENING_HOUR, CLOSING_HOUR = 11, 23
+# (share, mean local hour, standard deviation in hours)
+SERVICE_PEAKS = [(0.38, 12.6, 0.8), (0.52, 19.5, 1.2), (0.10, None, None)]
+
+POSITIONS = [
+    # (position, share, hourly rate range)
+    ('server', 0.45, (11, 16)),
+    ('cook', 0.25, (16, 24)),
+    ('host', 0.10, (12, 15)),
+    ('bartender', 0.12, (13, 18)),
+    ('manager', 0.08, (24, 34)),
+]
+FIRST_NAMES = [
+    'Ana', 'Luis', 'Maria', 'Jose', 'Carmen', 'Diego', 'Sofia', 'Mateo', 'Lucia', 'Andres',
+    'Elena', 'Pablo', 'Valeria', 'Jorge', 'Camila', 'Ricardo', 'Isabel', 'Hector', 'Paula', 'Raul',
+]
+LAST_NAMES = [
+    'Flores', 'Garcia', 'Martinez', 'Lopez', 'Hernandez', 'Perez', 'Ramirez', 'Torres', 'Rivera',
+    'Gomez', 'Diaz', 'Morales', 'Castro', 'Ortiz', 'Vargas', 'Mendoza', 'Ruiz', 'Navarro',
+]
+SECTIONS = ['Main Dining', 'Patio', 'Bar', 'Terrace', 'Private Room', 'Mezzanine']
+TABLE_SHAPES = ['square', 'round', 'rectangle']
+MAP_ELEMENT_TYPES = ['wall', 'label', 'door', 'plant', 'bar', 'window']
+INVENTORY_UNITS = ['kg', 'liters', 'pcs', 'boxes', 'bottles']
+SUPPLIERS = ['Local Supplier', 'Dairy Co', 'Bakery Inc', 'Green Farms', 'Sea Foods', 'Wine Cellar']
+
+CENTS = Decimal('0.01')
+
+
+def money(value):
+    return Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def new_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def zipf_weights(count, exponent=1.07):
+    """Cumulative Zipf weights, for rng.choices(cum_weights=...)."""
+    total, cumulative = 0.0, []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def spread(total, weights):
+    """Split `total` into integers proportional to `weights` (largest remainder)."""
+    scale = sum(weights)
+    exact = [total * w / scale for w in weights]
+    counts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+# ----------- COPY -----------
+
+def copy_value(value):
+    if value.__class__ is str:
+        if '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+            return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+        return value
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def copy_rows(cur, table, columns, rows):
+    """COPY `rows` (tuples in `columns` order) into `table`; returns the row count."""
+    buf = io.StringIO()
+    count = 0
+    for row in rows:
+        buf.write('\t'.join(copy_value(v) for v in row))
+        buf.write('\n')
+        count += 1
+    if count:
+        buf.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+    return count
+
+
+# ----------- Generator -----------
+
+class Generator:
+    def __init__(self, cur, args):
+        self.cur = cur
+        self.args = args
+        self.tz = ZoneInfo(args.tz)
+        self.end = args.end
+        self.start = args.end - timedelta(days=args.days)
+        # Catalog rows are dated a little before the order history starts
+        self.catalog_at = datetime.combine(self.start, datetime.min.time(), self.tz) - timedelta(days=30)
+        self.tax_rate = args.tax_rate
+        self.counts = {}
+
+    def rng(self, name):
+        return random.Random(f"{self.args.seed}:{name}")
+
+    def copy(self, table, columns, rows):
+        count = copy_rows(self.cur, table, columns, rows)
+        self.counts[table] = self.counts.get(table, 0) + count
+        return count
+
+    def local_time(self, day, hours):
+        """Aware datetime `hours` (float) after local midnight of `day`."""
+        midnight = datetime.combine(day, datetime.min.time(), self.tz)
+        return (midnight + timedelta(hours=hours)).astimezone(timezone.utc)
+
+    # -- floor ------------------------------------------------------------
+
+    def floor(self):
+        rng = self.rng('floor')
+        sections = [(new_id(rng), name) for name in SECTIONS[:self.args.sections]]
+        self.copy('restaurant_sections', ['id', 'name', 'created_at', 'updated_at'],
+                  ((sid, name, self.catalog_at, self.catalog_at) for sid, name in sections))
+
+        self.tables = []
+        rows = []
+        for n in range(1, self.args.tables + 1):
+            section_id = sections[(n - 1) % len(sections)][0]
+            capacity = rng.choices([2, 4, 6, 8], [30, 45, 17, 8])[0]
+            shape = rng.choice(TABLE_SHAPES)
+            size = 60 + capacity * 10
+            slot = (n - 1) // len(sections)
+            rows.append((new_id(rng), str(n), capacity, 'available', section_id,
+                         40 + (slot % 8) * 140, 40 + (slot // 8) * 140, size,
+                         size if shape != 'rectangle' else size // 2 + 30,
+                         shape, rng.choice([0, 0, 0, 90]), None, self.catalog_at, self.catalog_at))
+            self.tables.append((str(n), capacity))
+        self.copy('tables', ['id', 'number', 'capacity', 'status', 'section_id', 'position_x', 'position_y',
+                             'width', 'height', 'shape', 'rotation', 'color', 'created_at', 'updated_at'], rows)
+
+        rows = []
+        for i in range(self.args.map_elements):
+            kind = rng.choice(MAP_ELEMENT_TYPES)
+            rows.append((new_id(rng), kind, sections[i % len(sections)][0],
+                         rng.randrange(0, 1200), rng.randrange(0, 900),
+                         rng.randrange(20, 400), rng.randrange(10, 200), rng.choice([0, 90, 180, 270]),
+                         f"{kind.title()} {i + 1}" if kind == 'label' else None,
+                         rng.choice(['#8d6e63', '#9e9e9e', '#4caf50', '#2196f3']),
+                         14 if kind == 'label' else None, 'bold' if kind == 'label' else None,
+                         self.catalog_at, self.catalog_at))
+        self.copy('map_elements', ['id', 'type', 'section_id', 'position_x', 'position_y', 'width', 'height',
+                                   'rotation', 'content', 'color', 'font_size', 'font_style',
+                                   'created_at', 'updated_at'], rows)
+
+    # -- catalog ----------------------------------------------------------
+
+    def catalog(self):
+        rng = self.rng('catalog')
+        at = self.catalog_at
+        categories, subcategories = [], []
+        for name, kind, share in CATEGORIES:
+            cid = new_id(rng)
+            categories.append((cid, name, kind, share, [(new_id(rng), sub) for sub in SUBCATEGORIES]))
+        self.copy('menu_categories', ['id', 'name', 'created_at', 'updated_at'],
+                  ((cid, name, at, at) for cid, name, _, _, _ in categories))
+        self.copy('menu_subcategories', ['id', 'category_id', 'name', 'created_at', 'updated_at'],
+                  ((sid, cid, sub, at, at) for cid, _, _, _, subs in categories for sid, sub in subs))
+
+        # menu_items; popularity is a shuffled Zipf rank within each kind
+        self.menu = {}  # kind -> ([item ids], cumulative weights)
+        self.prices = {}
+        items = []
+        counts = spread(self.args.menu_items, [share for _, _, _, share, _ in categories])
+        for (cid, cname, kind, _, subs), count in zip(categories, counts):
+            low, high = PRICE_RANGES[kind]
+            for n in range(count):
+                item_id = new_id(rng)
+                # Whole and half prices, half of them ending in .99 / .49
+                price = Decimal(round(rng.uniform(low, high) * 2)) / 2
+                price = money(price - CENTS if rng.random() < 0.5 else price)
+                sid, _ = rng.choice(subs)
+                active = rng.random() > 0.03
+                items.append((item_id, f"{cname} {n + 1}", price, cname, None, at, at, cid, sid, active))
+                self.prices[item_id] = price
+                if active:
+                    self.menu.setdefault(kind, ([], None))[0].append(item_id)
+        for kind, (ids, _) in self.menu.items():
+            rng.shuffle(ids)
+            self.menu[kind] = (ids, zipf_weights(len(ids)))
+        self.copy('menu_items', ['id', 'name', 'price', 'category', 'image', 'created_at', 'updated_at',
+                                 'category_id', 'subcategory_id', 'is_active'], items)
+
+        # Customization groups of 4-12 options each, attached to 0-4 groups per item
+        groups, options = [], []
+        remaining, n = self.args.options, 0
+        while remaining > 0:
+            size = min(remaining, rng.randint(4, 12))
+            gid = new_id(rng)
+            n += 1
+            groups.append((gid, f"Options {n}", rng.random() < 0.15, rng.choice([1, 1, 2, 3, None]), at, at))
+            group_options = []
+            for k in range(size):
+                extra = money(rng.choice([0, 0, 0, 0.5, 1, 1.5, 2, 3]))
+                option_id = new_id(rng)
+                options.append((option_id, gid, f"Option {n}.{k + 1}", extra, at, at))
+                group_options.append((option_id, extra))
+            groups[-1] = groups[-1] + (group_options,)
+            remaining -= size
+        self.copy('customization_groups', ['id', 'name', 'is_required', 'max_select', 'created_at', 'updated_at'],
+                  (g[:6] for g in groups))
+        self.copy('customization_options', ['id', 'group_id', 'name', 'extra_price', 'created_at', 'updated_at'],
+                  options)
+
+        self.allowed = {}  # menu item id -> [(option id, extra price)]
+        links, allowed_rows = [], []
+        for item in items:
+            item_id = item[0]
+            for group in rng.sample(groups, min(len(groups), rng.choice([0, 1, 1, 2, 2, 3, 4]))):
+                links.append((new_id(rng), item_id, group[0]))
+                for option_id, extra in group[6]:
+                    if rng.random() < 0.7:
+                        allowed_rows.append((new_id(rng), item_id, option_id))
+                        self.allowed.setdefault(item_id, []).append((option_id, extra))
+        self.copy('menu_item_customizations', ['id', 'menu_item_id', 'group_id'], links)
+        self.copy('menu_item_customization_options', ['id', 'item_id', 'option_id'], allowed_rows)
+
+        # Legacy modifier tables
+        modifiers, modifier_options, item_modifiers = [], [], []
+        for n in range(1, 11):
+            mid = new_id(rng)
+            modifiers.append((mid, f"Modifier {n}", n % 4 == 0, n % 3 == 0, at, at))
+            for k in range(1, 5):
+                modifier_options.append((new_id(rng), mid, f"Modifier {n}.{k}", money(k * 0.5), at, at))
+        for item in items:
+            if rng.random() < 0.2:
+                item_modifiers.append((new_id(rng), item[0], rng.choice(modifiers)[0], at, at))
+        self.copy('modifiers', ['id', 'name', 'required', 'multi_select', 'created_at', 'updated_at'], modifiers)
+        self.copy('modifier_options', ['id', 'modifier_id', 'name', 'price', 'created_at', 'updated_at'],
+                  modifier_options)
+        self.copy('menu_item_modifiers', ['id', 'menu_item_id', 'modifier_id', 'created_at', 'updated_at'],
+                  item_modifiers)
+
+        self.copy('inventory_items', ['id', 'name', 'quantity', 'unit', 'cost', 'supplier', 'image',
+                                      'created_at', 'updated_at'],
+                  ((new_id(rng), f"Stock Item {n}", money(rng.uniform(0, 200)), rng.choice(INVENTORY_UNITS),
+                    money(rng.uniform(0.2, 60)), rng.choice(SUPPLIERS), None, at, at)
+                   for n in range(1, self.args.inventory + 1)))
+
+    # -- staff ------------------------------------------------------------
+
+    def staff(self):
+        rng = self.rng('staff')
+        employees = []
+        counts = spread(self.args.employees, [share for _, share, _ in POSITIONS])
+        codes = rng.sample(range(1000000, 9999999), self.args.employees)
+        for (position, _, (low, high)), count in zip(POSITIONS, counts):
+            for _ in range(count):
+                name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                employees.append([new_id(rng), name, position, money(rng.uniform(low, high)), str(codes.pop())])
+        self.servers = [e[1] for e in employees if e[2] == 'server'] or [e[1] for e in employees]
+
+        shifts, breaks, last_shift = [], [], {}
+        day = self.start
+        while day <= self.end:
+            for emp_id, _, position, rate, _ in employees:
+                if rng.random() > 5 / 7:
+                    continue
+                dinner = rng.random() < 0.6
+                start_hour = (15.5 if dinner else 9.5) + rng.choice([0, 0.25, 0.5, 0.75, 1])
+                length = rng.uniform(5.5, 9) + (rng.uniform(0.5, 2) if rng.random() < 0.08 else 0)
+                clock_in = self.local_time(day, start_hour)
+                clock_out = clock_in + timedelta(hours=length)
+                shifts.append((new_id(rng), emp_id, clock_in, clock_out, rate, clock_in, clock_out))
+                last_shift[emp_id] = (clock_in, clock_out)
+                if length > 6:
+                    start = clock_in + timedelta(hours=rng.uniform(3, 4.5))
+                    breaks.append((new_id(rng), emp_id, start, start + timedelta(minutes=rng.choice([30, 30, 45])),
+                                   start.astimezone(self.tz).date(), None, start, start))
+                if rng.random() < 0.5:
+                    start = clock_in + timedelta(hours=rng.uniform(1, 2.5))
+                    breaks.append((new_id(rng), emp_id, start, start + timedelta(minutes=rng.choice([10, 15])),
+                                   start.astimezone(self.tz).date(), None, start, start))
+            day += timedelta(days=1)
+
+        self.copy('employees', ['id', 'name', 'position', 'status', 'clock_in', 'clock_out', 'hourly_rate',
+                                'break_start', 'break_end', 'access_code', 'created_at', 'updated_at'],
+                  ((e[0], e[1], e[2], 'active', *last_shift.get(e[0], (None, None)), e[3],
+                    None, None, e[4], self.catalog_at, self.catalog_at) for e in employees))
+        self.copy('shifts', ['id', 'employee_id', 'clock_in', 'clock_out', 'hourly_rate', 'created_at',
+                             'updated_at'], shifts)
+        self.copy('break_history', ['id', 'employee_id', 'break_start', 'break_end', 'date', 'paid',
+                                    'created_at', 'updated_at'], breaks)
+
+    # -- orders -----------------------------------------------------------
+
+    def order_times(self, rng):
+        """Yield every order's created_at in ascending order."""
+        days = [self.start + timedelta(days=d) for d in range(self.args.days + 1)]
+        # Weekday pattern plus ~20% growth across the period
+        weights = [WEEKDAY_WEIGHTS[d.weekday()] * (1 + 0.2 * i / len(days)) for i, d in enumerate(days)]
+        for day, count in zip(days, spread(self.args.orders, weights)):
+            hours = []
+            for _ in range(count):
+                share = rng.random()
+                for peak_share, mean, sd in SERVICE_PEAKS:
+                    share -= peak_share
+                    if share < 0:
+                        break
+                if mean is None:
+                    hour = rng.uniform(OPENING_HOUR, CLOSING_HOUR)
+                else:
+                    hour = min(max(rng.gauss(mean, sd), OPENING_HOUR), CLOSING_HOUR - 0.01)
+                hours.append(hour)
+            hours.sort()
+            for hour in hours:
+                yield self.local_time(day, hour)
+
+    def pick(self, rng, kind):
+        ids, cumulative = self.menu[kind]
+        return ids[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+    def order_items(self, rng, order_id, party, created_at):
+        """Items and options of one order; returns (items, modifiers, subtotal)."""
+        # Formatted once for every row of the order
+        created_at = created_at.isoformat()
+        items, modifiers, subtotal = [], [], Decimal(0)
+        for guest in range(1, party + 1):
+            kinds = ['main'] if 'main' in self.menu else []
+            for kind, rate in EXTRA_ITEM_RATES.items():
+                if kind in self.menu and rng.random() < rate:
+                    kinds.append(kind)
+            for kind in kinds:
+                menu_item_id = self.pick(rng, kind)
+                quantity = 2 if kind == 'drink' and rng.random() < 0.2 else 1
+                item_id = new_id(rng)
+                price = self.prices[menu_item_id]
+                modifiers_total = Decimal(0)
+                allowed = self.allowed.get(menu_item_id)
+                if allowed and rng.random() < 0.35:
+                    for option_id, extra in rng.sample(allowed, min(len(allowed), rng.choice([1, 1, 2]))):
+                        modifiers.append((new_id(rng), item_id, option_id, extra, created_at, created_at))
+                        modifiers_total += extra
+                items.append((item_id, order_id, menu_item_id, quantity, price, None, guest,
+                              created_at, created_at, modifiers_total))
+                subtotal += quantity * (price + modifiers_total)
+        return items, modifiers, subtotal
+
+    def price(self, subtotal, discount_type, discount_value, tip):
+        """discount, tax and total, as price_order() (migration 0008) computes them."""
+        if discount_type == 'percent':
+            discount = subtotal * discount_value / 100
+        elif discount_type == 'amount':
+            discount = discount_value
+        else:
+            discount = Decimal(0)
+        discount = money(min(max(discount, 0), subtotal))
+        tax = money((subtotal - discount) * self.tax_rate)
+        return discount, tax, subtotal - discount + tax + tip
+
+    def orders(self):
+        rng = self.rng('orders')
+        capacity_tables = {}
+        for number, capacity in self.tables:
+            capacity_tables.setdefault(capacity, []).append(number)
+        capacities = sorted(capacity_tables)
+        open_from = self.args.orders - self.args.open_orders
+        open_tables = set()
+
+        order_cols = ['id', 'table_number', 'server', 'status', 'subtotal', 'discount_type', 'discount_value',
+                      'discount', 'tax_rate', 'tax', 'tip', 'total', 'payment_method', 'paid', 'client_count',
+                      'created_at', 'updated_at']
+        item_cols = ['id', 'order_id', 'menu_item_id', 'quantity', 'price', 'notes', 'client_number',
+                     'created_at', 'updated_at', 'modifiers_total']
+        modifier_cols = ['id', 'order_item_id', 'customization_option_id', 'extra_price', 'created_at',
+                         'updated_at']
+        orders, items, modifiers, splits, split_items = [], [], [], [], []
+        self.open_orders = []
+
+        def flush():
+            self.copy('orders', order_cols, orders)
+            self.copy('order_items', item_cols, items)
+            self.copy('order_item_modifiers', modifier_cols, modifiers)
+            self.copy('order_splits', ['id', 'order_id', 'name', 'subtotal', 'tax', 'tip', 'total', 'paid',
+                                       'payment_method', 'created_at', 'updated_at'], splits)
+            self.copy('split_items', ['id', 'split_id', 'order_item_id', 'created_at', 'updated_at'], split_items)
+            for rows in (orders, items, modifiers, splits, split_items):
+                rows.clear()
+            print(f"  {self.counts['orders']:,} orders")
+
+        for n, created_at in enumerate(self.order_times(rng)):
+            order_id = new_id(rng)
+            party = rng.choices(PARTY_SIZES, PARTY_WEIGHTS)[0]
+            fitting = [c for c in capacities if c >= party] or capacities[-1:]
+            table = rng.choice(capacity_tables[fitting[0]])
+            is_open = n >= open_from and table not in open_tables
+            order_items, order_modifiers, subtotal = self.order_items(rng, order_id, party, created_at)
+            items.extend(order_items)
+            modifiers.extend(order_modifiers)
+
+            discount_type = discount_value = None
+            if rng.random() < 0.04:
+                discount_type, discount_value = rng.choice([('percent', Decimal(10)), ('percent', Decimal(15)),
+                                                            ('amount', Decimal(5))])
+            if is_open:
+                open_tables.add(table)
+                self.open_orders.append((order_id, table, created_at))
+                payment_method, tip = None, Decimal(0)
+            else:
+                payment_method = 'card' if rng.random() < 0.78 else 'cash'
+                tip = money(subtotal * Decimal(rng.uniform(0.10, 0.22))) if payment_method == 'card' \
+                    else money(rng.choice([0, 0, 1, 2, 5]))
+            discount, tax, total = self.price(subtotal, discount_type, discount_value, tip)
+            closed_at = created_at + timedelta(minutes=rng.uniform(35, 110)) if not is_open else created_at
+            orders.append((order_id, table, rng.choice(self.servers), 'pending' if is_open else 'paid', subtotal,
+                           discount_type, discount_value, discount, self.tax_rate, tax, tip, total,
+                           payment_method, not is_open, party, created_at, closed_at))
+
+            if not is_open and party > 1 and rng.random() < 0.03:
+                by_guest = {}
+                for item in order_items:
+                    by_guest.setdefault(item[6], []).append(item)
+                for guest, guest_items in sorted(by_guest.items()):
+                    split_id = new_id(rng)
+                    split_subtotal = sum(i[3] * (i[4] + i[9]) for i in guest_items)
+                    split_tax = money(split_subtotal * self.tax_rate)
+                    splits.append((split_id, order_id, f"Guest {guest}", split_subtotal, split_tax, Decimal(0),
+                                   split_subtotal + split_tax, True, payment_method, closed_at, closed_at))
+                    split_items.extend((new_id(rng), split_id, i[0], closed_at, closed_at) for i in guest_items)
+
+            if len(orders) >= CHUNK_SIZE:
+                flush()
+        flush()
+
+        # Occupied tables and a couple of linked parties among the open orders
+        self.cur.execute(
+            "UPDATE tables SET status = 'occupied' WHERE number = ANY(%s);", ([t for _, t, _ in self.open_orders],)
+        )
+        groups, members = [], []
+        pairs = [self.open_orders[i:i + 2] for i in range(0, len(self.open_orders) - 1, 2)]
+        for pair in pairs[:self.args.linked_groups]:
+            gid = new_id(rng)
+            groups.append((gid, pair[1][2]))
+            members.extend((new_id(rng), gid, table, i == 0) for i, (_, table, _) in enumerate(pair))
+        self.copy('linked_table_groups', ['id', 'created_at'], groups)
+        self.copy('linked_table_members', ['id', 'group_id', 'table_number', 'is_leader'], members)
+
+    # -- derived state ----------------------------------------------------
+
+    def finish(self):
+        # Same backfill as migration 0009, for every paid hour just loaded
+        self.cur.execute(
+            """
+            INSERT INTO sales_rollup_dirty (hour_start)
+            SELECT DISTINCT date_trunc('hour', created_at) FROM orders WHERE status = 'paid';
+            """
+        )
+        self.cur.execute("SELECT refresh_sales_rollups();")
+        self.cur.execute("UPDATE catalog_version SET version = version + 1, updated_at = NOW() WHERE id = 1;")
+
+
+def set_triggers(cur, enabled):
+    action = 'ENABLE' if enabled else 'DISABLE'
+    for table in TRIGGER_TABLES:
+        cur.execute(f"ALTER TABLE {table} {action} TRIGGER USER;")
+
+
+def parse_date(value):
+    return date.fromisoformat(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default 1)')
+    parser.add_argument('--end', type=parse_date, default=date.today(), help='last day of history (default today)')
+    parser.add_argument('--days', type=int, default=120, help='days of history (default 120)')
+    parser.add_argument('--orders', type=int, default=100000, help='orders over the period (default 100000)')
+    parser.add_argument('--open-orders', type=int, default=12, help='orders still open at the end (default 12)')
+    parser.add_argument('--linked-groups', type=int, default=2, help='linked table groups among open orders')
+    parser.add_argument('--menu-items', type=int, default=500, help='menu items (default 500)')
+    parser.add_argument('--options', type=int, default=5000, help='customization options (default 5000)')
+    parser.add_argument('--inventory', type=int, default=200, help='inventory items (default 200)')
+    parser.add_argument('--employees', type=int, default=40, help='employees (default 40)')
+    parser.add_argument('--tables', type=int, default=60, help='dining tables (default 60)')
+    parser.add_argument('--sections', type=int, default=4, choices=range(1, len(SECTIONS) + 1),
+                        metavar=f'1-{len(SECTIONS)}', help='restaurant sections (default 4)')
+    parser.add_argument('--map-elements', type=int, default=150, help='floor map elements (default 150)')
+    parser.add_argument('--tax-rate', type=Decimal, help='tax rate fraction (default: pricing_settings)')
+    parser.add_argument('--tz', default=REPORTS_TIMEZONE, help='restaurant time zone (default REPORTS_TIMEZONE)')
+    parser.add_argument('--truncate', action='store_true', help='empty the generated tables first')
+    parser.add_argument('--database', help='database on the PG_HOST server (default PG_DATABASE)')
+    args = parser.parse_args(argv)
+    if args.tables < 1 or args.menu_items < 1 or args.employees < 1 or args.orders < 0:
+        parser.error('--tables, --menu-items and --employees must be positive')
+    args.open_orders = min(args.open_orders, args.orders, args.tables)
+
+    # db.connect() and migrate() read the database name at call time
+    if args.database:
+        db.DB_NAME = args.database
+    problem = db.target_problem()
+    if problem:
+        print(f"Refusing to run: {problem}")
+        return 2
+    print(f"Loading into {db.DB_NAME} on {db.DB_HOST}")
+    migrate()
+    conn = connect()
+    cur = conn.cursor()
+    started = time.monotonic()
+    try:
+        if args.truncate:
+            cur.execute(f"TRUNCATE {', '.join(GENERATED_TABLES)} RESTART IDENTITY CASCADE;")
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM orders);")
+            if cur.fetchone()[0]:
+                print("The database already has orders; use --truncate to replace them")
+                return 1
+        if args.tax_rate is None:
+            cur.execute("SELECT tax_rate FROM pricing_settings WHERE id = 1;")
+            row = cur.fetchone()
+            args.tax_rate = row[0] if row else Decimal(0)
+
+        # Triggers are off inside this transaction only; DDL rolls back with it
+        set_triggers(cur, False)
+        generator = Generator(cur, args)
+        print("Generating floor, catalog and staff")
+        generator.floor()
+        generator.catalog()
+        generator.staff()
+        print(f"Generating {args.orders:,} orders over {args.days} days")
+        generator.orders()
+        set_triggers(cur, True)
+        print("Rebuilding sales rollups")
+        generator.finish()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    conn = connect()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("ANALYZE;")
+    cur.close()
+    conn.close()
+
+    width = max(len(t) for t in generator.counts)
+    for table, count in sorted(generator.counts.items()):
+        print(f"  {table:{width}} {count:>12,}")
+    print(f"Done in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Idempotency-Key support for POST write routes.
+
+A client that may retry a POST (tablets on flaky Wi-Fi) sends a unique
+`Idempotency-Key` header. The first request with a key reserves it in
+`idempotency_keys` (migration 0011) and runs normally; its response is
+stored for IDEMPOTENCY_TTL seconds. A retry with the same key gets the
+stored response back, marked `Idempotent-Replayed: true`, without the
+handler running again. Meanwhile:
+
+- a retry arriving while the first request is still running gets a 409
+  with Retry-After, so it can't double-fire the write
+- reusing a key for a different method, path or body gets a 422
+- 5xx responses are not stored; the key is released so a retry runs again
+
+Keys live in the database so a retry is recognised by whichever worker
+serves it. Each worker also keeps its most recent stored responses in a
+small LRU, so most replays need no query at all. Reservations of a worker
+that died mid-request expire after IDEMPOTENCY_LOCK_SECONDS. Expired keys,
+and the oldest keys beyond IDEMPOTENCY_MAX_KEYS, are pruned periodically.
+
+Environment variables:
+    IDEMPOTENCY_TTL           seconds a stored response is replayed (default 86400)
+    IDEMPOTENCY_LOCK_SECONDS  seconds an in-flight key stays reserved (default 60)
+    IDEMPOTENCY_MAX_KEYS      keys kept in the database (default 100000)
+    IDEMPOTENCY_CACHE_SIZE    stored responses kept in each worker's memory (default 1000)
+"""
+import collections
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from psycopg2.extras import Json, RealDictCursor
+
+from db import get_db_connection
+
+HEADER = 'Idempotency-Key'
+METHODS = {'POST'}
+MAX_KEY_LENGTH = 255
+TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '60'))
+MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '100000'))
+CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '1000'))
+# Reservations between prunes, per worker
+PRUNE_EVERY = 200
+# Headers stored with the body; CORS and Content-Encoding are applied again on replay
+STORED_HEADERS = ('Content-Type', 'Location')
+
+
+class ResponseCache:
+    """Thread-safe LRU of stored responses, each dropped at its expiry time."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires_at'] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = ResponseCache(CACHE_SIZE)
+_reservations = 0
+_reservations_lock = threading.Lock()
+
+
+def request_fingerprint():
+    """Hash of what makes a retry the same request: method, path and body."""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b' ')
+    digest.update(request.full_path.encode())
+    digest.update(b'\n')
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def replay(entry, fingerprint):
+    if entry['fingerprint'] != fingerprint:
+        return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+    response = current_app.response_class(entry['body'], status=entry['status_code'])
+    for name, value in entry['headers']:
+        response.headers[name] = value
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def prune(cur):
+    cur.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW();")
+    cur.execute(
+        """
+        DELETE FROM idempotency_keys
+        WHERE key IN (SELECT key FROM idempotency_keys ORDER BY created_at DESC OFFSET %s);
+        """,
+        (MAX_KEYS,)
+    )
+
+
+def due_for_prune():
+    global _reservations
+    with _reservations_lock:
+        _reservations += 1
+        return _reservations % PRUNE_EVERY == 0
+
+
+def before_request():
+    """Reserve the request's key, or answer a retry from the stored response."""
+    key = request.headers.get(HEADER)
+    if key is None or request.method not in METHODS:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return jsonify({'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+    fingerprint = request_fingerprint()
+
+    entry = _cache.get(key)
+    if entry is not None:
+        return replay(entry, fingerprint)
+
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # New keys and expired ones are (re)claimed atomically; a live key is left alone
+        cur.execute(
+            """
+            INSERT INTO idempotency_keys (key, fingerprint, expires_at)
+            VALUES (%s, %s, NOW() + make_interval(secs => %s))
+            ON CONFLICT (key) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint, status_code = NULL, headers = NULL,
+                    body = NULL, created_at = NOW(), expires_at = EXCLUDED.expires_at
+                WHERE idempotency_keys.expires_at < NOW()
+            RETURNING key;
+            """,
+            (key, fingerprint, LOCK_SECONDS)
+        )
+        reserved = cur.fetchone() is not None
+        stored = None
+        if reserved:
+            if due_for_prune():
+                prune(cur)
+        else:
+            cur.execute(
+                """
+                SELECT fingerprint, status_code, headers, body,
+                       EXTRACT(EPOCH FROM expires_at)::float AS expires_at
+                FROM idempotency_keys WHERE key = %s;
+                """,
+                (key,)
+            )
+            stored = cur.fetchone()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        return jsonify({'error': str(e)}), 500
+    cur.close()
+    conn.close()
+
+    if reserved:
+        g.idempotency = (key, fingerprint)
+        return None
+    if stored is not None and stored['fingerprint'] != fingerprint:
+        return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+    if stored is None or stored['status_code'] is None:
+        response = jsonify({'error': f'A request with this {HEADER} is still in progress'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    stored['body'] = bytes(stored['body'])
+    _cache.put(key, stored)
+    return replay(stored, fingerprint)
+
+
+def release(key):
+    """Forget a reservation so the request can be retried."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM idempotency_keys WHERE key = %s AND status_code IS NULL;", (key,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Warning: could not release idempotency key {key}: {e}")
+    cur.close()
+    conn.close()
+
+
+def after_request(response):
+    """Store the response of a request that reserved a key."""
+    pending = g.pop('idempotency', None)
+    if pending is None:
+        return response
+    key, fingerprint = pending
+    if response.status_code >= 500 or response.is_streamed or response.direct_passthrough:
+        release(key)
+        return response
+
+    entry = {
+        'fingerprint': fingerprint,
+        'status_code': response.status_code,
+        'headers': [[name, response.headers[name]] for name in STORED_HEADERS if name in response.headers],
+        'body': response.get_data(),
+    }
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(
+            """
+            UPDATE idempotency_keys
+            SET status_code = %s, headers = %s, body = %s, expires_at = NOW() + make_interval(secs => %s)
+            WHERE key = %s AND fingerprint = %s
+            RETURNING EXTRACT(EPOCH FROM expires_at)::float AS expires_at;
+            """,
+            (entry['status_code'], Json(entry['headers']), entry['body'], TTL, key, fingerprint)
+        )
+        row = cur.fetchone()
+        conn.commit()
+        if row is not None:
+            entry['expires_at'] = row['expires_at']
+            _cache.put(key, entry)
+    except Exception as e:
+        conn.rollback()
+        print(f"Warning: could not store response for idempotency key {key}: {e}")
+    cur.close()
+    conn.close()
+    return response
+
+
+def teardown_request(exc):
+    # A handler that raised never reached after_request
+    pending = g.pop('idempotency', None)
+    if pending is not None:
+        release(pending[0])
+
+
+def init_app(app):
+    """
+    Register after compression.init_app: after_request hooks run in reverse
+    order, so the stored body is the uncompressed one and replays are
+    encoded for each retry's Accept-Encoding.
+    """
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
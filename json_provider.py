@@ -0,0 +1,139 @@
+"""
+JSON provider for the app's responses.
+
+Uses orjson when installed, which encodes UUID natively and is several
+times faster than the standard encoder on RealDictCursor rows (see
+bench_json.py). Without orjson the stdlib encoder is used. Either way the
+output keeps the wire format of Flask's default provider, byte for byte:
+
+    UUID       "3f2b..."
+    datetime   HTTP date, "Thu, 01 May 2025 18:30:00 GMT" (werkzeug http_date)
+    date       HTTP date, "Thu, 01 May 2025 00:00:00 GMT"
+    Decimal    JSON_DECIMAL=string (default): "12.50"
+               JSON_DECIMAL=number: 12.5
+    non-ASCII  escaped, "Caf\\u00e9"
+    keys       sorted
+
+orjson is run with OPT_PASSTHROUGH_DATETIME so datetimes reach
+encode_default, and its raw UTF-8 is escaped afterwards (only for bodies
+that contain any). Changing any of these formats is an API change and
+ships on its own, not as part of a serializer swap.
+
+The Decimal policy applies to NUMERIC columns only. Numbers inside
+json/jsonb values (json_agg / json_build_object documents) are decoded by
+json.loads and stay JSON numbers, so one field never mixes "1.50" and 0.
+"""
+import json
+import os
+import re
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DECIMAL_POLICY = os.getenv('JSON_DECIMAL', 'string')
+if DECIMAL_POLICY not in ('string', 'number'):
+    raise ValueError("JSON_DECIMAL must be 'string' or 'number'")
+
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def format_http_date(value):
+    """
+    werkzeug's http_date() for a date or datetime (naive means UTC), in
+    about half the time; it runs once per value of every row.
+    """
+    if not isinstance(value, datetime):
+        return '%s, %02d %s %04d 00:00:00 GMT' % (
+            _DAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year)
+    if value.utcoffset():
+        value = value.astimezone(timezone.utc)
+    return '%s, %02d %s %04d %02d:%02d:%02d GMT' % (
+        _DAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year,
+        value.hour, value.minute, value.second,
+    )
+
+
+def encode_default(value):
+    """Encode the types neither encoder handles on its own."""
+    if isinstance(value, Decimal):
+        return str(value) if DECIMAL_POLICY == 'string' else float(value)
+    if isinstance(value, date):
+        return format_http_date(value)
+    if isinstance(value, time):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Characters the stdlib encoder escapes with ensure_ascii and orjson does not
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+
+
+def _escape_char(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return '\\u%04x\\u%04x' % (0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return '\\u%04x' % code
+
+
+def ascii_escape(body):
+    """orjson output escaped like json.dumps(ensure_ascii=True); non-ASCII only occurs inside strings."""
+    if body.isascii() and b'\x7f' not in body:
+        return body
+    return _NON_ASCII.sub(_escape_char, body.decode()).encode()
+
+
+def dumps_response(obj):
+    """
+    Response body bytes for `obj`, exactly as the installed provider renders
+    them outside debug mode. Used where no Flask app is involved (read_tier.py).
+    """
+    if orjson:
+        return ascii_escape(orjson.dumps(obj, default=encode_default, option=FastJSONProvider.options)) + b"\n"
+    return (json.dumps(obj, default=encode_default, separators=(",", ":"), sort_keys=True) + "\n").encode()
+
+
+class StdJSONProvider(DefaultJSONProvider):
+    """Flask's encoder with the app's type rules (Decimal policy)."""
+
+    default = staticmethod(encode_default)
+
+
+class FastJSONProvider(StdJSONProvider):
+    """orjson-backed provider; falls back to the stdlib encoder for dumps() options it can't honour."""
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return ascii_escape(orjson.dumps(obj, default=encode_default, option=self.options)).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.options
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            ascii_escape(orjson.dumps(obj, default=encode_default, option=option)) + b"\n",
+            mimetype=self.mimetype,
+        )
+
+
+def init_app(app):
+    """Install the fastest available provider on `app`."""
+    app.json = FastJSONProvider(app) if orjson else StdJSONProvider(app)
+    return app.json
@@ -0,0 +1,141 @@
+"""
+Prometheus metrics for GET /metrics.
+
+Per route (the URL rule, e.g. /api/orders/<string:order_id>):
+    http_requests_total{method,route,status}
+    http_request_duration_seconds{method,route}      histogram
+    http_requests_in_progress{method,route}
+    http_request_db_queries{method,route}            histogram, queries per request
+    db_queries_total{route}
+    db_query_duration_seconds{route}                 histogram
+Per process, summed across workers:
+    db_pool_acquire_seconds                          histogram, checkout wait
+    db_pool_timeouts_total
+    db_pool_connections{state}                       in_use / idle
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set by gunicorn.conf.py) and /metrics aggregates all workers, whichever
+one serves the scrape. Without that variable the in-process registry is
+used. Streaming responses are timed until their first byte is ready.
+"""
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+
+import db
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+ACQUIRE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+if prometheus_client is not None:
+    REQUESTS = Counter(
+        'http_requests_total', 'HTTP requests by route and status',
+        ['method', 'route', 'status'])
+    LATENCY = Histogram(
+        'http_request_duration_seconds', 'Time to produce the response',
+        ['method', 'route'], buckets=LATENCY_BUCKETS)
+    IN_PROGRESS = Gauge(
+        'http_requests_in_progress', 'Requests being handled',
+        ['method', 'route'], multiprocess_mode='livesum')
+    QUERIES_PER_REQUEST = Histogram(
+        'http_request_db_queries', 'Database queries issued per request',
+        ['method', 'route'], buckets=QUERIES_PER_REQUEST_BUCKETS)
+    DB_QUERIES = Counter(
+        'db_queries_total', 'Database queries by route', ['route'])
+    DB_QUERY_SECONDS = Histogram(
+        'db_query_duration_seconds', 'Database query execution time',
+        ['route'], buckets=QUERY_BUCKETS)
+    POOL_ACQUIRE = Histogram(
+        'db_pool_acquire_seconds', 'Time waiting for a pooled connection',
+        buckets=ACQUIRE_BUCKETS)
+    POOL_TIMEOUTS = Counter(
+        'db_pool_timeouts_total', 'Checkouts that gave up waiting for a connection')
+    POOL_CONNECTIONS = Gauge(
+        'db_pool_connections', 'Pooled connections by state',
+        ['state'], multiprocess_mode='livesum')
+
+# Requests to these paths are not measured
+UNMEASURED_PATHS = {'/metrics'}
+
+
+def current_route():
+    """Route label shared by metrics and the SQL profiler: the URL rule of the request."""
+    if not has_request_context():
+        return 'background'
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def observe_query(query, params, seconds, rowcount):
+    route = current_route()
+    DB_QUERIES.labels(route).inc()
+    DB_QUERY_SECONDS.labels(route).observe(seconds)
+    if has_request_context() and 'metrics_start' in g:
+        g.metrics_queries += 1
+
+
+def observe_checkout(seconds, timed_out):
+    POOL_ACQUIRE.observe(seconds)
+    if timed_out:
+        POOL_TIMEOUTS.inc()
+
+
+def before_request():
+    if request.path in UNMEASURED_PATHS:
+        return
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_labels = (request.method, current_route())
+    IN_PROGRESS.labels(*g.metrics_labels).inc()
+
+
+def after_request(response):
+    if 'metrics_start' not in g:
+        return response
+    method, route = g.metrics_labels
+    LATENCY.labels(method, route).observe(time.perf_counter() - g.metrics_start)
+    REQUESTS.labels(method, route, str(response.status_code)).inc()
+    QUERIES_PER_REQUEST.labels(method, route).observe(g.metrics_queries)
+    stats = db.pool_stats()
+    POOL_CONNECTIONS.labels('in_use').set(stats['in_use'])
+    POOL_CONNECTIONS.labels('idle').set(stats['idle'])
+    return response
+
+
+def teardown_request(exc):
+    labels = g.pop('metrics_labels', None)
+    if labels is not None:
+        IN_PROGRESS.labels(*labels).dec()
+
+
+def metrics_endpoint():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Instrument `app` and serve /metrics; a no-op without prometheus_client."""
+    if prometheus_client is None:
+        print("Warning: prometheus_client is not installed; /metrics is disabled")
+        return
+    db.query_observers.append(observe_query)
+    db.checkout_observers.append(observe_checkout)
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
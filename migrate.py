@@ -0,0 +1,160 @@
+"""
+Versioned schema migrations.
+
+Migrations are plain SQL files in ./migrations named `<version>_<name>.sql`
+(e.g. 0004_order_indexes.sql) and are applied in version order, each in its
+own transaction together with its row in `schema_migrations`.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py status     # list applied / pending migrations
+"""
+import os
+import re
+import sys
+
+from db import connect
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_RE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+# Arbitrary key so concurrent deploys never run migrations twice
+MIGRATION_LOCK_ID = 724_113_001
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path)] for every migration file, sorted by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f'Duplicate migration version in {directory}')
+    return migrations
+
+
+def latest_version():
+    migrations = discover_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def ensure_version_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        """
+    )
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations ORDER BY version;")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate():
+    """Apply all pending migrations. Returns the list of applied (version, name)."""
+    conn = connect()
+    cur = conn.cursor()
+    applied = []
+    try:
+        cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+        ensure_version_table(cur)
+        conn.commit()
+        done = applied_versions(cur)
+        conn.commit()
+        for version, name, path in discover_migrations():
+            if version in done:
+                continue
+            with open(path) as f:
+                sql = f.read()
+            try:
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                    (version, name)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"Migration {version:04d}_{name} failed")
+                raise
+            print(f"Applied migration {version:04d}_{name}")
+            applied.append((version, name))
+    finally:
+        try:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+            conn.commit()
+        except Exception:
+            pass
+        cur.close()
+        conn.close()
+    return applied
+
+
+def current_version(cur):
+    """Highest applied version, or 0 when the version table does not exist yet."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+    return cur.fetchone()[0]
+
+
+def check_schema_version():
+    """
+    Cheap startup check: compare the database's schema version with the
+    newest migration file. Never modifies the schema.
+    Returns (current, latest).
+    """
+    latest = latest_version()
+    try:
+        conn = connect()
+        try:
+            cur = conn.cursor()
+            current = current_version(cur)
+            cur.close()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Warning: could not check schema version: {e}")
+        return None, latest
+    if current < latest:
+        print(f"Warning: database schema is at version {current}, latest is {latest}; run `python migrate.py`")
+    return current, latest
+
+
+def status():
+    conn = connect()
+    cur = conn.cursor()
+    try:
+        done = applied_versions(cur) if current_version(cur) else set()
+    finally:
+        cur.close()
+        conn.close()
+    for version, name, _ in discover_migrations():
+        state = 'applied' if version in done else 'pending'
+        print(f"{version:04d}_{name}: {state}")
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'up'
+    if command == 'up':
+        applied = migrate()
+        if not applied:
+            print("Schema is up to date")
+    elif command == 'status':
+        status()
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,194 @@
+-- Initial schema (mirrors crate_table.sql)
+
+-- Enable UUID generation
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+-- Sections (areas of the restaurant)
+CREATE TABLE IF NOT EXISTS restaurant_sections (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Tables (physical seating)
+CREATE TABLE IF NOT EXISTS tables (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    number TEXT NOT NULL,
+    capacity INT NOT NULL,
+    status TEXT,
+    section_id UUID REFERENCES restaurant_sections(id),
+    position_x INT,
+    position_y INT,
+    width INT,
+    height INT,
+    shape TEXT,
+    rotation INT NOT NULL DEFAULT 0,
+    color TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Employees (staff)
+CREATE TABLE IF NOT EXISTS employees (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT NOT NULL,
+    position TEXT,
+    status TEXT,
+    clock_in TIMESTAMPTZ,
+    clock_out TIMESTAMPTZ,
+    hourly_rate NUMERIC,
+    break_start TIMESTAMPTZ,
+    break_end TIMESTAMPTZ,
+    access_code TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Break history records
+CREATE TABLE IF NOT EXISTS break_history (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    employee_id UUID REFERENCES employees(id),
+    break_start TIMESTAMPTZ,
+    break_end TIMESTAMPTZ,
+    date DATE,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Inventory items
+CREATE TABLE IF NOT EXISTS inventory_items (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT,
+    quantity NUMERIC,
+    unit TEXT,
+    cost NUMERIC,
+    supplier TEXT,
+    image TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Menu items and modifiers
+CREATE TABLE IF NOT EXISTS menu_items (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT,
+    price NUMERIC,
+    category TEXT,
+    image TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS modifiers (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT,
+    required BOOLEAN,
+    multi_select BOOLEAN,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS modifier_options (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    modifier_id UUID REFERENCES modifiers(id),
+    name TEXT,
+    price NUMERIC,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS menu_item_modifiers (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    menu_item_id UUID REFERENCES menu_items(id),
+    modifier_id UUID REFERENCES modifiers(id),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Orders and related details
+CREATE TABLE IF NOT EXISTS orders (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    table_number TEXT,
+    server TEXT,
+    status TEXT,
+    subtotal NUMERIC,
+    tax NUMERIC,
+    tip NUMERIC,
+    total NUMERIC,
+    discount_type TEXT,
+    discount_value NUMERIC,
+    payment_method TEXT,
+    paid BOOLEAN,
+    client_count INT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    order_id UUID REFERENCES orders(id),
+    menu_item_id UUID REFERENCES menu_items(id),
+    quantity INT,
+    price NUMERIC,
+    notes TEXT,
+    client_number INT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS order_item_modifiers (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    order_item_id UUID REFERENCES order_items(id),
+    modifier_id UUID REFERENCES modifiers(id),
+    modifier_option_id UUID REFERENCES modifier_options(id),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS order_splits (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    order_id UUID REFERENCES orders(id),
+    name TEXT,
+    subtotal NUMERIC,
+    tax NUMERIC,
+    tip NUMERIC,
+    total NUMERIC,
+    paid BOOLEAN,
+    payment_method TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS split_items (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    split_id UUID REFERENCES order_splits(id),
+    order_item_id UUID REFERENCES order_items(id),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Map elements (custom shapes/annotations)
+CREATE TABLE IF NOT EXISTS map_elements (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    type TEXT NOT NULL,
+    section_id UUID REFERENCES restaurant_sections(id),
+    position_x INT NOT NULL,
+    position_y INT NOT NULL,
+    width INT NOT NULL DEFAULT 0,
+    height INT NOT NULL DEFAULT 0,
+    rotation INT NOT NULL DEFAULT 0,
+    content TEXT,
+    color TEXT,
+    font_size INT,
+    font_style TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+-- Linked tables for shared billing
+CREATE TABLE IF NOT EXISTS linked_table_groups (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS linked_table_members (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    group_id UUID REFERENCES linked_table_groups(id) ON DELETE CASCADE,
+    table_number TEXT NOT NULL,
+    is_leader BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
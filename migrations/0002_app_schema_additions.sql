@@ -0,0 +1,66 @@
+-- Columns and tables previously ensured by app.py at import time
+
+-- Table shape, orientation and color
+ALTER TABLE tables ADD COLUMN IF NOT EXISTS shape TEXT;
+ALTER TABLE tables ADD COLUMN IF NOT EXISTS rotation INT NOT NULL DEFAULT 0;
+ALTER TABLE tables ADD COLUMN IF NOT EXISTS color TEXT;
+
+-- Map element styling and section link
+ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS color TEXT;
+ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS section_id UUID;
+ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS font_size INT;
+ALTER TABLE map_elements ADD COLUMN IF NOT EXISTS font_style TEXT;
+
+-- Employee access code
+ALTER TABLE employees ADD COLUMN IF NOT EXISTS access_code TEXT;
+
+-- Menu categories and sub-categories (for Menu Management)
+CREATE TABLE IF NOT EXISTS menu_categories (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS menu_subcategories (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    category_id UUID REFERENCES menu_categories(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (category_id, name)
+);
+
+-- Menu item columns used by the menu API
+ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS category_id UUID REFERENCES menu_categories(id) ON DELETE CASCADE;
+ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS subcategory_id UUID REFERENCES menu_subcategories(id) ON DELETE SET NULL;
+ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
+
+-- Customization groups, options, and menu item relations
+CREATE TABLE IF NOT EXISTS customization_groups (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT UNIQUE NOT NULL,
+    is_required BOOLEAN DEFAULT FALSE,
+    max_select INT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS customization_options (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    group_id UUID REFERENCES customization_groups(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    extra_price NUMERIC DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS menu_item_customizations (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    menu_item_id UUID REFERENCES menu_items(id) ON DELETE CASCADE,
+    group_id UUID REFERENCES customization_groups(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS menu_item_customization_options (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    item_id UUID REFERENCES menu_items(id) ON DELETE CASCADE,
+    option_id UUID REFERENCES customization_options(id) ON DELETE CASCADE
+);
+ALTER TABLE menu_item_customizations ADD COLUMN IF NOT EXISTS menu_item_id UUID REFERENCES menu_items(id) ON DELETE CASCADE;
+ALTER TABLE menu_item_customizations ADD COLUMN IF NOT EXISTS group_id UUID REFERENCES customization_groups(id) ON DELETE CASCADE;
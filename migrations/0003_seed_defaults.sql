@@ -0,0 +1,38 @@
+-- Default categories, mock menu/inventory data and owner account.
+-- Each block only seeds a table that is still empty.
+
+INSERT INTO menu_categories (name)
+SELECT v.name
+FROM (VALUES ('Breakfast'), ('Lunch'), ('Dinner')) AS v(name)
+WHERE NOT EXISTS (SELECT 1 FROM menu_categories)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO menu_items (name, price, category, category_id, image)
+SELECT v.name, v.price, v.category, mc.id, v.image
+FROM (VALUES
+    ('Pancakes', 5.99, 'Breakfast', 'pancakes.png'),
+    ('Omelette', 6.49, 'Breakfast', 'omelette.png'),
+    ('Coffee', 2.50, 'Breakfast', 'coffee.png'),
+    ('BLT Sandwich', 7.50, 'Lunch', 'blt_sandwich.png'),
+    ('Caesar Salad', 8.00, 'Lunch', 'caesar_salad.png'),
+    ('Burger', 9.25, 'Lunch', 'burger.png'),
+    ('Steak Dinner', 15.00, 'Dinner', 'steak_dinner.png'),
+    ('Grilled Salmon', 14.50, 'Dinner', 'grilled_salmon.png'),
+    ('Ice Cream', 4.00, 'Dessert', 'ice_cream.png')
+) AS v(name, price, category, image)
+LEFT JOIN menu_categories mc ON mc.name = v.category
+WHERE NOT EXISTS (SELECT 1 FROM menu_items);
+
+INSERT INTO inventory_items (name, quantity, unit, cost, supplier, image)
+SELECT v.name, v.quantity, v.unit, v.cost, v.supplier, NULL
+FROM (VALUES
+    ('Coffee Beans', 20, 'kg', 15.0, 'Local Supplier'),
+    ('Milk', 10, 'liters', 1.2, 'Dairy Co'),
+    ('Bread Loaf', 30, 'pcs', 0.5, 'Bakery Inc'),
+    ('Lettuce', 25, 'heads', 0.8, 'Green Farms')
+) AS v(name, quantity, unit, cost, supplier)
+WHERE NOT EXISTS (SELECT 1 FROM inventory_items);
+
+INSERT INTO employees (name, position, status, hourly_rate, access_code)
+SELECT 'Carlos Flores', 'owner', 'active', 0, '1020304'
+WHERE NOT EXISTS (SELECT 1 FROM employees);
@@ -0,0 +1,51 @@
+-- Secondary indexes for the hot query predicates.
+-- Plain CREATE INDEX (not CONCURRENTLY) because every migration runs inside a
+-- transaction; on a busy production database create these by hand with
+-- CONCURRENTLY first and this migration becomes a no-op.
+
+-- Open order lookup by table (create_order, change_order_table_endpoint,
+-- pay_linked_group). Partial: paid orders are the vast majority and are
+-- never looked up this way.
+CREATE INDEX IF NOT EXISTS idx_orders_open_table_number
+    ON orders (table_number, created_at DESC)
+    WHERE status != 'paid';
+
+-- Keyset pagination for GET /api/orders
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id
+    ON orders (created_at DESC, id DESC);
+
+-- Items of an order (get_order_items, merge_orders_endpoint)
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id
+    ON order_items (order_id);
+
+-- Linked table lookups (get_tables join, get_table_link, pay_linked_group)
+CREATE INDEX IF NOT EXISTS idx_linked_table_members_table_number
+    ON linked_table_members (table_number);
+CREATE INDEX IF NOT EXISTS idx_linked_table_members_group_id
+    ON linked_table_members (group_id);
+
+-- Tables are addressed by number when orders move or get paid
+CREATE INDEX IF NOT EXISTS idx_tables_number
+    ON tables (number);
+
+-- Break history per employee, newest first
+CREATE INDEX IF NOT EXISTS idx_break_history_employee_start
+    ON break_history (employee_id, break_start DESC);
+
+-- Menu items per category
+CREATE INDEX IF NOT EXISTS idx_menu_items_category_id
+    ON menu_items (category_id);
+
+-- Foreign keys followed by joins and ON DELETE CASCADE
+CREATE INDEX IF NOT EXISTS idx_order_item_modifiers_order_item_id
+    ON order_item_modifiers (order_item_id);
+CREATE INDEX IF NOT EXISTS idx_order_splits_order_id
+    ON order_splits (order_id);
+CREATE INDEX IF NOT EXISTS idx_split_items_split_id
+    ON split_items (split_id);
+CREATE INDEX IF NOT EXISTS idx_customization_options_group_id
+    ON customization_options (group_id);
+CREATE INDEX IF NOT EXISTS idx_menu_item_customizations_menu_item_id
+    ON menu_item_customizations (menu_item_id);
+CREATE INDEX IF NOT EXISTS idx_menu_item_customization_options_item_id
+    ON menu_item_customization_options (item_id);
@@ -0,0 +1,11 @@
+-- Record the customization options chosen for each order item.
+-- order_item_modifiers predates the customization_* catalog; link it to
+-- customization_options and snapshot the option price at order time.
+ALTER TABLE order_item_modifiers ADD COLUMN IF NOT EXISTS customization_option_id UUID REFERENCES customization_options(id) ON DELETE SET NULL;
+ALTER TABLE order_item_modifiers ADD COLUMN IF NOT EXISTS extra_price NUMERIC NOT NULL DEFAULT 0;
+
+-- Modifiers go away with their order item
+ALTER TABLE order_item_modifiers DROP CONSTRAINT IF EXISTS order_item_modifiers_order_item_id_fkey;
+ALTER TABLE order_item_modifiers
+    ADD CONSTRAINT order_item_modifiers_order_item_id_fkey
+    FOREIGN KEY (order_item_id) REFERENCES order_items(id) ON DELETE CASCADE;
@@ -0,0 +1,43 @@
+-- Catalog version for the menu/customization response cache.
+-- Any write to a catalog table bumps the version and notifies every app
+-- worker on the 'catalog_changed' channel (delivered at commit).
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+INSERT INTO catalog_version (id) VALUES (1) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE catalog_version SET version = version + 1, updated_at = NOW()
+    WHERE id = 1
+    RETURNING version INTO new_version;
+    PERFORM pg_notify('catalog_changed', new_version::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_catalog_version ON menu_items;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON menu_items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+DROP TRIGGER IF EXISTS trg_catalog_version ON menu_categories;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON menu_categories
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+DROP TRIGGER IF EXISTS trg_catalog_version ON menu_subcategories;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON menu_subcategories
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+DROP TRIGGER IF EXISTS trg_catalog_version ON customization_groups;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON customization_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+DROP TRIGGER IF EXISTS trg_catalog_version ON customization_options;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON customization_options
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+DROP TRIGGER IF EXISTS trg_catalog_version ON menu_item_customizations;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON menu_item_customizations
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+DROP TRIGGER IF EXISTS trg_catalog_version ON menu_item_customization_options;
+CREATE TRIGGER trg_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON menu_item_customization_options
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
@@ -0,0 +1,70 @@
+-- Change log behind the live floor-plan stream (GET /api/stream/floor).
+-- Row triggers on tables, orders and linked_table_members append an event
+-- and NOTIFY 'floor_events' with its id; the id doubles as the resume token.
+CREATE TABLE IF NOT EXISTS floor_events (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL,
+    op TEXT NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_floor_events_created_at ON floor_events (created_at);
+
+CREATE OR REPLACE FUNCTION record_floor_event() RETURNS trigger AS $$
+DECLARE
+    rec RECORD;
+    body JSONB;
+    event_id BIGINT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+    IF TG_TABLE_NAME = 'orders' THEN
+        -- Only the fields the floor plan needs, not the totals
+        body := jsonb_build_object(
+            'id', rec.id,
+            'table_number', rec.table_number,
+            'status', rec.status,
+            'paid', rec.paid,
+            'server', rec.server,
+            'client_count', rec.client_count
+        );
+        IF TG_OP = 'UPDATE' AND OLD.table_number IS DISTINCT FROM NEW.table_number THEN
+            body := body || jsonb_build_object('previous_table_number', OLD.table_number);
+        END IF;
+    ELSE
+        body := to_jsonb(rec);
+    END IF;
+    INSERT INTO floor_events (kind, op, payload)
+    VALUES (TG_TABLE_NAME, lower(TG_OP), body)
+    RETURNING id INTO event_id;
+    PERFORM pg_notify('floor_events', event_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_floor_event ON tables;
+CREATE TRIGGER trg_floor_event AFTER INSERT OR DELETE ON tables
+    FOR EACH ROW EXECUTE FUNCTION record_floor_event();
+DROP TRIGGER IF EXISTS trg_floor_event_update ON tables;
+CREATE TRIGGER trg_floor_event_update AFTER UPDATE ON tables
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION record_floor_event();
+
+DROP TRIGGER IF EXISTS trg_floor_event ON orders;
+CREATE TRIGGER trg_floor_event AFTER INSERT OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION record_floor_event();
+DROP TRIGGER IF EXISTS trg_floor_event_update ON orders;
+CREATE TRIGGER trg_floor_event_update AFTER UPDATE OF status, table_number, paid ON orders
+    FOR EACH ROW WHEN (
+        OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.table_number IS DISTINCT FROM NEW.table_number
+        OR OLD.paid IS DISTINCT FROM NEW.paid
+    )
+    EXECUTE FUNCTION record_floor_event();
+
+DROP TRIGGER IF EXISTS trg_floor_event ON linked_table_members;
+CREATE TRIGGER trg_floor_event AFTER INSERT OR UPDATE OR DELETE ON linked_table_members
+    FOR EACH ROW EXECUTE FUNCTION record_floor_event();
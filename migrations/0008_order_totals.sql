@@ -0,0 +1,133 @@
+-- Server-side order pricing, maintained incrementally by triggers.
+--
+--   order_items.modifiers_total  sum of the item's chosen option prices
+--   order_items.line_total       quantity * (price + modifiers_total)
+--   orders.subtotal              running sum of line_total (delta updates)
+--   orders.discount/tax/total    derived from subtotal, discount_type/value,
+--                                tax_rate and tip whenever one of them changes
+--
+-- tax_rate is a fraction (0.0825 = 8.25%), copied from pricing_settings when
+-- an order is created so later rate changes don't alter existing orders.
+
+CREATE TABLE IF NOT EXISTS pricing_settings (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    tax_rate NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+INSERT INTO pricing_settings (id) VALUES (1) ON CONFLICT DO NOTHING;
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS discount NUMERIC NOT NULL DEFAULT 0;
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS tax_rate NUMERIC;
+ALTER TABLE order_items ADD COLUMN IF NOT EXISTS modifiers_total NUMERIC NOT NULL DEFAULT 0;
+ALTER TABLE order_items ADD COLUMN IF NOT EXISTS line_total NUMERIC
+    GENERATED ALWAYS AS (COALESCE(quantity, 1) * (COALESCE(price, 0) + modifiers_total)) STORED;
+
+-- Backfill option totals for existing items
+UPDATE order_items oi
+SET modifiers_total = m.total
+FROM (
+    SELECT order_item_id, SUM(COALESCE(extra_price, 0)) AS total
+    FROM order_item_modifiers
+    GROUP BY order_item_id
+) m
+WHERE m.order_item_id = oi.id;
+
+-- Derived order amounts
+CREATE OR REPLACE FUNCTION price_order() RETURNS trigger AS $$
+DECLARE
+    base NUMERIC;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.tax_rate IS NULL THEN
+            SELECT tax_rate INTO NEW.tax_rate FROM pricing_settings WHERE id = 1;
+        END IF;
+    ELSIF NEW.subtotal IS NOT DISTINCT FROM OLD.subtotal
+      AND NEW.discount_type IS NOT DISTINCT FROM OLD.discount_type
+      AND NEW.discount_value IS NOT DISTINCT FROM OLD.discount_value
+      AND NEW.tip IS NOT DISTINCT FROM OLD.tip
+      AND NEW.tax_rate IS NOT DISTINCT FROM OLD.tax_rate THEN
+        RETURN NEW;
+    END IF;
+
+    base := COALESCE(NEW.subtotal, 0);
+    NEW.subtotal := base;
+    NEW.discount := CASE lower(COALESCE(NEW.discount_type, ''))
+        WHEN 'percent' THEN base * COALESCE(NEW.discount_value, 0) / 100
+        WHEN 'percentage' THEN base * COALESCE(NEW.discount_value, 0) / 100
+        WHEN 'amount' THEN COALESCE(NEW.discount_value, 0)
+        WHEN 'fixed' THEN COALESCE(NEW.discount_value, 0)
+        ELSE 0
+    END;
+    NEW.discount := round(LEAST(GREATEST(NEW.discount, 0), base), 2);
+    NEW.tax := round((base - NEW.discount) * COALESCE(NEW.tax_rate, 0), 2);
+    NEW.total := base - NEW.discount + NEW.tax + COALESCE(NEW.tip, 0);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_price_order ON orders;
+CREATE TRIGGER trg_price_order BEFORE INSERT OR UPDATE ON orders
+    FOR EACH ROW EXECUTE FUNCTION price_order();
+
+-- Recompute open orders once; from here on totals move by deltas only
+UPDATE orders o
+SET tax_rate = COALESCE(o.tax_rate, (SELECT tax_rate FROM pricing_settings WHERE id = 1)),
+    subtotal = COALESCE((SELECT SUM(oi.line_total) FROM order_items oi WHERE oi.order_id = o.id), 0)
+WHERE o.status != 'paid';
+
+-- Items without a price take the menu price
+CREATE OR REPLACE FUNCTION default_order_item_price() RETURNS trigger AS $$
+BEGIN
+    IF NEW.price IS NULL AND NEW.menu_item_id IS NOT NULL THEN
+        SELECT price INTO NEW.price FROM menu_items WHERE id = NEW.menu_item_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_default_order_item_price ON order_items;
+CREATE TRIGGER trg_default_order_item_price BEFORE INSERT ON order_items
+    FOR EACH ROW EXECUTE FUNCTION default_order_item_price();
+
+-- Push line_total deltas into orders.subtotal (moves between orders included)
+CREATE OR REPLACE FUNCTION apply_order_item_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.order_id IS NOT DISTINCT FROM NEW.order_id THEN
+        IF OLD.line_total IS DISTINCT FROM NEW.line_total AND NEW.order_id IS NOT NULL THEN
+            UPDATE orders SET subtotal = COALESCE(subtotal, 0) + NEW.line_total - OLD.line_total
+            WHERE id = NEW.order_id;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.order_id IS NOT NULL THEN
+        UPDATE orders SET subtotal = COALESCE(subtotal, 0) - OLD.line_total WHERE id = OLD.order_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.order_id IS NOT NULL THEN
+        UPDATE orders SET subtotal = COALESCE(subtotal, 0) + NEW.line_total WHERE id = NEW.order_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_order_item_delta ON order_items;
+CREATE TRIGGER trg_order_item_delta AFTER INSERT OR UPDATE OR DELETE ON order_items
+    FOR EACH ROW EXECUTE FUNCTION apply_order_item_delta();
+
+-- Push option price deltas into order_items.modifiers_total
+CREATE OR REPLACE FUNCTION apply_order_item_modifier_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE order_items SET modifiers_total = modifiers_total - COALESCE(OLD.extra_price, 0)
+        WHERE id = OLD.order_item_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE order_items SET modifiers_total = modifiers_total + COALESCE(NEW.extra_price, 0)
+        WHERE id = NEW.order_item_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_order_item_modifier_delta ON order_item_modifiers;
+CREATE TRIGGER trg_order_item_modifier_delta AFTER INSERT OR UPDATE OR DELETE ON order_item_modifiers
+    FOR EACH ROW EXECUTE FUNCTION apply_order_item_modifier_delta();
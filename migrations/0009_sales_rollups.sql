@@ -0,0 +1,121 @@
+-- Hourly sales rollups for the reports API.
+--
+-- Paid orders are bucketed by the UTC hour they were opened (created_at).
+-- Any write that can change a paid order's figures queues its hour in
+-- sales_rollup_dirty; refresh_sales_rollups() rebuilds only the queued
+-- hours from orders/order_items. Days, weeks and business-day cutoffs are
+-- derived from the hourly rows at query time (see reports.py).
+
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    hour_start TIMESTAMPTZ PRIMARY KEY,
+    orders INT NOT NULL,
+    covers INT NOT NULL,
+    subtotal NUMERIC NOT NULL,
+    discount NUMERIC NOT NULL,
+    tax NUMERIC NOT NULL,
+    tips NUMERIC NOT NULL,
+    total NUMERIC NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sales_hourly_items (
+    hour_start TIMESTAMPTZ NOT NULL,
+    menu_item_id UUID NOT NULL,
+    quantity NUMERIC NOT NULL,
+    revenue NUMERIC NOT NULL,
+    PRIMARY KEY (hour_start, menu_item_id)
+);
+
+CREATE TABLE IF NOT EXISTS sales_hourly_servers (
+    hour_start TIMESTAMPTZ NOT NULL,
+    server TEXT NOT NULL,
+    orders INT NOT NULL,
+    covers INT NOT NULL,
+    net_sales NUMERIC NOT NULL,
+    tips NUMERIC NOT NULL,
+    PRIMARY KEY (hour_start, server)
+);
+
+-- Append-only queue: no unique key, so a writer never skips its row
+-- because a refresh is about to consume an older one for the same hour
+CREATE TABLE IF NOT EXISTS sales_rollup_dirty (
+    id BIGSERIAL PRIMARY KEY,
+    hour_start TIMESTAMPTZ NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION queue_sales_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'paid' AND OLD.created_at IS NOT NULL THEN
+        INSERT INTO sales_rollup_dirty (hour_start) VALUES (date_trunc('hour', OLD.created_at));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'paid' AND NEW.created_at IS NOT NULL
+       AND (TG_OP = 'INSERT' OR OLD.status IS DISTINCT FROM 'paid'
+            OR date_trunc('hour', OLD.created_at) IS DISTINCT FROM date_trunc('hour', NEW.created_at)) THEN
+        INSERT INTO sales_rollup_dirty (hour_start) VALUES (date_trunc('hour', NEW.created_at));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Item writes reach this trigger through the subtotal maintenance (0008)
+DROP TRIGGER IF EXISTS trg_queue_sales_rollup ON orders;
+CREATE TRIGGER trg_queue_sales_rollup AFTER INSERT OR UPDATE OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION queue_sales_rollup();
+
+CREATE OR REPLACE FUNCTION refresh_sales_rollups() RETURNS INT AS $$
+DECLARE
+    hours TIMESTAMPTZ[];
+BEGIN
+    -- One refresher at a time; others wait and then find the queue empty
+    PERFORM pg_advisory_xact_lock(724113002);
+
+    WITH consumed AS (
+        DELETE FROM sales_rollup_dirty RETURNING hour_start
+    )
+    SELECT array_agg(DISTINCT hour_start) INTO hours FROM consumed;
+    IF hours IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM sales_hourly WHERE hour_start = ANY(hours);
+    DELETE FROM sales_hourly_items WHERE hour_start = ANY(hours);
+    DELETE FROM sales_hourly_servers WHERE hour_start = ANY(hours);
+
+    CREATE TEMP TABLE rollup_orders ON COMMIT DROP AS
+    SELECT h.hour_start, o.id, COALESCE(o.server, '') AS server,
+           COALESCE(o.client_count, 0) AS covers,
+           COALESCE(o.subtotal, 0) AS subtotal, COALESCE(o.discount, 0) AS discount,
+           COALESCE(o.tax, 0) AS tax, COALESCE(o.tip, 0) AS tip, COALESCE(o.total, 0) AS total
+    FROM unnest(hours) AS h (hour_start)
+    JOIN orders o ON o.created_at >= h.hour_start
+                 AND o.created_at < h.hour_start + interval '1 hour'
+                 AND o.status = 'paid';
+
+    INSERT INTO sales_hourly (hour_start, orders, covers, subtotal, discount, tax, tips, total)
+    SELECT hour_start, COUNT(*), SUM(covers), SUM(subtotal), SUM(discount), SUM(tax), SUM(tip), SUM(total)
+    FROM rollup_orders
+    GROUP BY hour_start;
+
+    INSERT INTO sales_hourly_items (hour_start, menu_item_id, quantity, revenue)
+    SELECT r.hour_start, oi.menu_item_id, SUM(COALESCE(oi.quantity, 1)), SUM(oi.line_total)
+    FROM rollup_orders r
+    JOIN order_items oi ON oi.order_id = r.id
+    WHERE oi.menu_item_id IS NOT NULL
+    GROUP BY r.hour_start, oi.menu_item_id;
+
+    INSERT INTO sales_hourly_servers (hour_start, server, orders, covers, net_sales, tips)
+    SELECT hour_start, server, COUNT(*), SUM(covers), SUM(subtotal - discount), SUM(tip)
+    FROM rollup_orders
+    GROUP BY hour_start, server;
+
+    DROP TABLE rollup_orders;
+    RETURN array_length(hours, 1);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Build the rollups for existing history
+INSERT INTO sales_rollup_dirty (hour_start)
+SELECT DISTINCT date_trunc('hour', created_at)
+FROM orders
+WHERE status = 'paid' AND created_at IS NOT NULL;
+
+SELECT refresh_sales_rollups();
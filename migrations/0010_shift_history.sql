@@ -0,0 +1,56 @@
+-- Shift history for labor reporting.
+--
+-- employees only holds the current clock_in/clock_out, so every clock-in
+-- now also opens a row in `shifts` and the matching clock-out closes it
+-- (trigger below). hourly_rate is copied at clock-in so raises don't
+-- rewrite past labor cost.
+
+CREATE TABLE IF NOT EXISTS shifts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    employee_id UUID REFERENCES employees(id),
+    clock_in TIMESTAMPTZ NOT NULL,
+    clock_out TIMESTAMPTZ,
+    hourly_rate NUMERIC,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (employee_id, clock_in),
+    CHECK (clock_out IS NULL OR clock_out >= clock_in)
+);
+CREATE INDEX IF NOT EXISTS idx_shifts_clock_in ON shifts (clock_in);
+
+-- NULL: paid when shorter than LABOR_PAID_BREAK_MAX_MINUTES (reports.py)
+ALTER TABLE break_history ADD COLUMN IF NOT EXISTS paid BOOLEAN;
+
+CREATE OR REPLACE FUNCTION record_shift() RETURNS trigger AS $$
+BEGIN
+    IF NEW.clock_in IS NOT NULL AND NEW.clock_in IS DISTINCT FROM OLD.clock_in THEN
+        INSERT INTO shifts (employee_id, clock_in, clock_out, hourly_rate)
+        VALUES (
+            NEW.id, NEW.clock_in,
+            CASE WHEN NEW.clock_out >= NEW.clock_in THEN NEW.clock_out END,
+            NEW.hourly_rate
+        )
+        ON CONFLICT (employee_id, clock_in) DO NOTHING;
+    ELSIF NEW.clock_out IS NOT NULL AND NEW.clock_out IS DISTINCT FROM OLD.clock_out THEN
+        UPDATE shifts SET clock_out = NEW.clock_out, updated_at = NOW()
+        WHERE id = (
+            SELECT id FROM shifts
+            WHERE employee_id = NEW.id AND clock_in <= NEW.clock_out
+            ORDER BY clock_in DESC
+            LIMIT 1
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_record_shift ON employees;
+CREATE TRIGGER trg_record_shift AFTER UPDATE OF clock_in, clock_out ON employees
+    FOR EACH ROW EXECUTE FUNCTION record_shift();
+
+-- Seed history with each employee's last known shift
+INSERT INTO shifts (employee_id, clock_in, clock_out, hourly_rate)
+SELECT id, clock_in, CASE WHEN clock_out >= clock_in THEN clock_out END, hourly_rate
+FROM employees
+WHERE clock_in IS NOT NULL
+ON CONFLICT (employee_id, clock_in) DO NOTHING;
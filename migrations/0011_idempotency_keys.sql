@@ -0,0 +1,20 @@
+-- Idempotency keys for POST write routes (see idempotency.py).
+--
+-- The first request with a key reserves a row (status_code NULL) and,
+-- once it has a response, stores it so retries are replayed without
+-- running the handler again. Rows expire at expires_at: in-flight
+-- reservations after a short lock timeout, so a crashed worker doesn't
+-- block the key forever, and stored responses after the replay TTL.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status_code INT,
+    headers JSONB,
+    body BYTEA,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys (created_at);
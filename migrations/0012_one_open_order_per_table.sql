@@ -0,0 +1,27 @@
+-- At most one open order per table.
+--
+-- create_order used to look for the table's open order and insert in two
+-- statements, so two tablets seating the same table at once could both
+-- insert. This unique partial index makes the database the arbiter and
+-- lets create_order open an order with a single INSERT ... ON CONFLICT.
+-- It also serves every "open order of this table" lookup, so it replaces
+-- idx_orders_open_table_number (0004).
+
+-- Existing duplicates: the newest order stays on the table (it is the one
+-- create_order has been returning). Older ones are detached from the table
+-- rather than closed, so no sale is invented or lost.
+WITH ranked AS (
+    SELECT id, row_number() OVER (PARTITION BY table_number ORDER BY created_at DESC, id DESC) AS n
+    FROM orders
+    WHERE status != 'paid' AND table_number IS NOT NULL
+)
+UPDATE orders o
+SET table_number = NULL, updated_at = NOW()
+FROM ranked r
+WHERE o.id = r.id AND r.n > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_one_open_per_table
+    ON orders (table_number)
+    WHERE status != 'paid';
+
+DROP INDEX IF EXISTS idx_orders_open_table_number;
@@ -0,0 +1,15 @@
+-- Every order has a created_at.
+--
+-- GET /api/orders pages on (created_at, id) and encodes created_at in its
+-- cursor. With a nullable column a page ending on a NULL row could not
+-- build its cursor, and the row comparison silently skipped NULL rows.
+-- The column always had DEFAULT NOW(); only explicit NULLs (old imports)
+-- are affected. They get their last update time, or now if there is none.
+-- Paid ones enter the sales rollups through trg_queue_sales_rollup (0009).
+UPDATE orders
+SET created_at = COALESCE(updated_at, NOW())
+WHERE created_at IS NULL;
+
+ALTER TABLE orders
+    ALTER COLUMN created_at SET DEFAULT NOW(),
+    ALTER COLUMN created_at SET NOT NULL;
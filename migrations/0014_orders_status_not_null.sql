@@ -0,0 +1,35 @@
+-- Every order has a status; new ones start as 'pending'.
+--
+-- The one-open-order-per-table index (0012) and create_order's ON CONFLICT
+-- target are both WHERE status != 'paid', which is NULL for a NULL status.
+-- orders.status had no default and create_order only set it when the
+-- client sent one, so two POSTs without a status each opened an order on
+-- the same table. With a default and NOT NULL every order is either
+-- 'paid' or covered by the index.
+
+-- NULL-status orders were invisible to every "open order" lookup. Unpaid
+-- ones become pending below; where that would give a table a second open
+-- order, the order the app has been returning (non-NULL status, then
+-- newest) keeps the table and the others are detached, as in 0012.
+WITH ranked AS (
+    SELECT id, row_number() OVER (
+               PARTITION BY table_number
+               ORDER BY status IS NULL, created_at DESC, id DESC
+           ) AS n
+    FROM orders
+    WHERE table_number IS NOT NULL
+      AND COALESCE(status, CASE WHEN paid THEN 'paid' ELSE 'pending' END) != 'paid'
+)
+UPDATE orders o
+SET table_number = NULL, updated_at = NOW()
+FROM ranked r
+WHERE o.id = r.id AND r.n > 1;
+
+-- Paid ones enter the sales rollups through trg_queue_sales_rollup (0009)
+UPDATE orders
+SET status = CASE WHEN paid THEN 'paid' ELSE 'pending' END, updated_at = NOW()
+WHERE status IS NULL;
+
+ALTER TABLE orders
+    ALTER COLUMN status SET DEFAULT 'pending',
+    ALTER COLUMN status SET NOT NULL;
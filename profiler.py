@@ -0,0 +1,211 @@
+"""
+Opt-in per-request SQL profiler (SQL_PROFILE=1).
+
+Every statement a request runs through a pooled connection is recorded with
+its duration and row count (see db.query_observers). When the request ends:
+
+- requests issuing more than SQL_PROFILE_MAX_QUERIES statements or spending
+  more than SQL_PROFILE_MAX_DB_MS in the database are logged with their
+  busiest statements
+- a statement run SQL_PROFILE_REPEAT times or more in one request (same SQL
+  text, any parameters) is logged as an N+1 pattern
+- single statements slower than SQL_PROFILE_SLOW_QUERY_MS are logged
+
+The worst offenders are kept per worker process and listed by
+GET /api/dev/sql-profile (DELETE resets them). The endpoint is only
+registered while profiling is on.
+
+Environment variables:
+    SQL_PROFILE                1 to enable (default 0)
+    SQL_PROFILE_MAX_QUERIES    statements per request before it is logged (default 15)
+    SQL_PROFILE_MAX_DB_MS      database time per request before it is logged (default 200)
+    SQL_PROFILE_SLOW_QUERY_MS  single statement duration logged as slow (default 100)
+    SQL_PROFILE_REPEAT         repeats of a statement in one request flagged as N+1 (default 3)
+    SQL_PROFILE_TRACKED        offenders kept per list (default 200)
+"""
+import collections
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, jsonify, request
+
+import db
+from metrics import current_route
+
+ENABLED = os.getenv('SQL_PROFILE', '0') == '1'
+MAX_QUERIES = int(os.getenv('SQL_PROFILE_MAX_QUERIES', '15'))
+MAX_DB_MS = float(os.getenv('SQL_PROFILE_MAX_DB_MS', '200'))
+SLOW_QUERY_MS = float(os.getenv('SQL_PROFILE_SLOW_QUERY_MS', '100'))
+REPEAT_THRESHOLD = int(os.getenv('SQL_PROFILE_REPEAT', '3'))
+TRACKED = int(os.getenv('SQL_PROFILE_TRACKED', '200'))
+# Statements printed per logged request
+LOG_TOP_STATEMENTS = 5
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# execute_values expands to VALUES (?, ?), (?, ?), ...
+_VALUES_LIST = re.compile(r'(\([?, ]+\))(?:\s*,\s*\([?, ]+\))+')
+
+_lock = threading.Lock()
+# (route, statement) -> stats dict, for repeated and for slow statements
+_repeats = {}
+_slow_queries = {}
+_slow_requests = collections.deque(maxlen=TRACKED)
+
+
+def fingerprint(query):
+    """SQL text with whitespace collapsed and inline literals replaced by ?."""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    elif not isinstance(query, str):
+        query = str(query)
+    query = _STRING_LITERAL.sub('?', query)
+    query = _NUMBER_LITERAL.sub('?', query)
+    query = _VALUES_LIST.sub(r'\1, ...', query)
+    return _WHITESPACE.sub(' ', query).strip().rstrip(';')
+
+
+def observe_query(query, params, seconds, rowcount):
+    if not has_request_context() or 'sql_profile' not in g:
+        return
+    g.sql_profile.append((query, seconds, rowcount))
+
+
+def before_request():
+    g.sql_profile = []
+    g.sql_profile_start = time.perf_counter()
+
+
+def _track(table, key, seconds, executions, rowcount):
+    """Add to an offender's stats, evicting the cheapest one when full."""
+    entry = table.get(key)
+    if entry is None:
+        if len(table) >= TRACKED:
+            del table[min(table, key=lambda k: table[k]['total_ms'])]
+        entry = table[key] = {
+            'route': key[0], 'statement': key[1], 'requests': 0, 'executions': 0,
+            'max_per_request': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+        }
+    entry['requests'] += 1
+    entry['executions'] += executions
+    entry['max_per_request'] = max(entry['max_per_request'], executions)
+    entry['total_ms'] += seconds * 1000
+    entry['max_ms'] = max(entry['max_ms'], seconds * 1000 / executions)
+    entry['rows'] += max(rowcount, 0)
+
+
+def summarize(queries):
+    """Group a request's statements: {statement: [executions, seconds, rows, slowest]}."""
+    grouped = {}
+    for query, seconds, rowcount in queries:
+        stats = grouped.setdefault(fingerprint(query), [0, 0.0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += max(rowcount, 0)
+        stats[3] = max(stats[3], seconds)
+    return grouped
+
+
+def teardown_request(exc):
+    queries = g.pop('sql_profile', None)
+    start = g.pop('sql_profile_start', None)
+    if not queries:
+        return
+    route = current_route()
+    method = request.method
+    db_ms = sum(seconds for _, seconds, _ in queries) * 1000
+    grouped = summarize(queries)
+
+    repeated = {s: v for s, v in grouped.items() if v[0] >= REPEAT_THRESHOLD}
+    slow = [(query, seconds, rowcount) for query, seconds, rowcount in queries
+            if seconds * 1000 >= SLOW_QUERY_MS]
+    heavy = len(queries) > MAX_QUERIES or db_ms > MAX_DB_MS
+
+    if not (repeated or slow or heavy):
+        return
+    with _lock:
+        for statement, (executions, seconds, rows, _) in repeated.items():
+            _track(_repeats, (route, statement), seconds, executions, rows)
+        for query, seconds, rowcount in slow:
+            _track(_slow_queries, (route, fingerprint(query)), seconds, 1, rowcount)
+        if heavy:
+            _slow_requests.append({
+                'method': method,
+                'path': request.full_path.rstrip('?'),
+                'route': route,
+                'queries': len(queries),
+                'db_ms': round(db_ms, 3),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3) if start else None,
+                'at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'statements': [
+                    {'statement': s, 'executions': v[0], 'total_ms': round(v[1] * 1000, 3), 'rows': v[2]}
+                    for s, v in sorted(grouped.items(), key=lambda item: -item[1][1])[:LOG_TOP_STATEMENTS]
+                ],
+            })
+
+    for statement, (executions, seconds, _, _) in repeated.items():
+        print(f"SQL profile: N+1 in {method} {route}: {executions}x ({seconds * 1000:.1f} ms) {statement[:200]}")
+    for query, seconds, rowcount in slow:
+        print(f"SQL profile: slow query in {method} {route}: {seconds * 1000:.1f} ms, "
+              f"{rowcount} rows: {fingerprint(query)[:200]}")
+    if heavy:
+        print(f"SQL profile: {method} {request.path}: {len(queries)} queries, {db_ms:.1f} ms in the database")
+        for statement, (executions, seconds, _, _) in sorted(grouped.items(), key=lambda item: -item[1][1])[:LOG_TOP_STATEMENTS]:
+            print(f"    {executions:3d}x {seconds * 1000:8.1f} ms  {statement[:160]}")
+
+
+def _ranked(table, limit):
+    entries = sorted(table.values(), key=lambda e: -e['total_ms'])[:limit]
+    return [
+        dict(e, total_ms=round(e['total_ms'], 3), max_ms=round(e['max_ms'], 3),
+             avg_per_request=round(e['executions'] / e['requests'], 1))
+        for e in entries
+    ]
+
+
+def report(limit=20):
+    """This worker's worst offenders, most database time first."""
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'thresholds': {
+                'max_queries': MAX_QUERIES,
+                'max_db_ms': MAX_DB_MS,
+                'slow_query_ms': SLOW_QUERY_MS,
+                'repeat': REPEAT_THRESHOLD,
+            },
+            'n_plus_one': _ranked(_repeats, limit),
+            'slow_queries': _ranked(_slow_queries, limit),
+            'slow_requests': sorted(_slow_requests, key=lambda r: -r['db_ms'])[:limit],
+        }
+
+
+def reset():
+    with _lock:
+        _repeats.clear()
+        _slow_queries.clear()
+        _slow_requests.clear()
+
+
+def profile_endpoint():
+    if request.method == 'DELETE':
+        reset()
+        return '', 204
+    try:
+        limit = max(1, int(request.args.get('limit', 20)))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(report(limit))
+
+
+def init_app(app):
+    """Profile every request and serve /api/dev/sql-profile; a no-op unless SQL_PROFILE=1."""
+    if not ENABLED:
+        return
+    db.query_observers.append(observe_query)
+    app.before_request(before_request)
+    app.teardown_request(teardown_request)
+    app.add_url_rule('/api/dev/sql-profile', 'sql_profile', profile_endpoint, methods=['GET', 'DELETE'])
@@ -0,0 +1,299 @@
+"""
+SQL of the polled read endpoints and the other hot routes, kept in one
+place so the Flask app (app.py), the async read tier (read_tier.py) and the
+EXPLAIN regression check (explain_check.py) all run the same text.
+
+SQL uses psycopg2's %s placeholders; read_tier.py renumbers them for asyncpg.
+"""
+import base64
+import uuid
+from datetime import datetime
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+
+from reports import REPORTS_TIMEZONE
+
+TABLES_SQL = """
+    SELECT t.*, l.group_id
+    FROM tables t
+    LEFT JOIN linked_table_members l ON t.number = l.table_number;
+"""
+
+ELEMENTS_SQL = "SELECT * FROM map_elements;"
+
+MENU_SQL = """
+    SELECT mi.*, mc.name AS category_name
+    FROM menu_items mi
+    JOIN menu_categories mc ON mc.id = mi.category_id
+    ORDER BY mc.name, mi.name;
+"""
+
+TABLE_BY_ID_SQL = """
+    SELECT t.*, l.group_id
+    FROM tables t
+    LEFT JOIN linked_table_members l ON t.number = l.table_number
+    WHERE t.id = %s;
+"""
+
+ORDER_BY_ID_SQL = "SELECT * FROM orders WHERE id = %s;"
+
+ORDER_ITEMS_SQL = "SELECT * FROM order_items WHERE order_id = %s;"
+
+OPEN_ORDER_FOR_TABLE_SQL = "SELECT id FROM orders WHERE table_number = %s AND status != 'paid';"
+
+# Merge: move the source order's items, renumbering clients after the target's
+MOVE_ORDER_ITEMS_SQL = """
+    UPDATE order_items SET order_id = %s, client_number = COALESCE(client_number,1) + %s
+    WHERE order_id = %s RETURNING id
+"""
+
+TABLE_LINK_SQL = """
+    SELECT g.id as group_id,
+           json_agg(json_build_object('table_number',m.table_number,'is_leader',m.is_leader)) AS tables
+    FROM linked_table_groups g
+    JOIN linked_table_members m ON m.group_id = g.id
+    WHERE m.table_number = %s
+    GROUP BY g.id;
+"""
+
+# Pay every open order of a table's linked group, free the tables, dissolve the group
+PAY_LINKED_GROUP_SQL = """
+    WITH grp AS (
+        SELECT group_id FROM linked_table_members WHERE table_number = %s LIMIT 1
+    ),
+    paid AS (
+        UPDATE orders SET status = 'paid', updated_at = NOW()
+        WHERE status != 'paid'
+          AND table_number IN (
+              SELECT m.table_number FROM linked_table_members m JOIN grp USING (group_id)
+          )
+        RETURNING id, table_number
+    ),
+    freed AS (
+        UPDATE tables SET status = 'available'
+        WHERE number IN (SELECT table_number FROM paid WHERE table_number IS NOT NULL)
+        RETURNING number
+    ),
+    dissolved AS (
+        DELETE FROM linked_table_groups WHERE id IN (SELECT group_id FROM grp)
+        RETURNING id
+    )
+    SELECT (SELECT group_id FROM grp) AS group_id,
+           COALESCE((SELECT array_agg(id::text) FROM paid), '{}') AS paid_orders,
+           (SELECT COUNT(*) FROM freed) AS freed_tables,
+           (SELECT COUNT(*) FROM dissolved) AS dissolved;
+"""
+
+# POST /api/orders:close; params (payment_method, order_ids, order_ids)
+CLOSE_ORDERS_SQL = """
+    WITH closed AS (
+        UPDATE orders
+        SET status = 'paid', paid = TRUE,
+            payment_method = COALESCE(%s, payment_method),
+            updated_at = NOW()
+        WHERE id = ANY(%s::uuid[]) AND status IS DISTINCT FROM 'paid'
+        RETURNING *
+    ),
+    free_numbers AS (
+        SELECT DISTINCT c.table_number FROM closed c
+        WHERE c.table_number IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM orders o
+              WHERE o.table_number = c.table_number
+                AND o.status != 'paid'
+                AND o.id <> ALL(%s::uuid[])
+          )
+    ),
+    freed AS (
+        UPDATE tables SET status = 'available', updated_at = NOW()
+        WHERE number IN (SELECT table_number FROM free_numbers)
+        RETURNING number
+    ),
+    unlinked AS (
+        DELETE FROM linked_table_members
+        WHERE table_number IN (SELECT table_number FROM free_numbers)
+        RETURNING group_id, table_number
+    ),
+    -- CTEs share one snapshot, so the freed members still show up here
+    dissolved AS (
+        DELETE FROM linked_table_groups g
+        WHERE g.id IN (SELECT group_id FROM unlinked)
+          AND (
+              SELECT COUNT(DISTINCT m.table_number) FROM linked_table_members m
+              WHERE m.group_id = g.id
+                AND m.table_number NOT IN (SELECT table_number FROM free_numbers)
+          ) < 2
+        RETURNING id
+    )
+    SELECT (SELECT COALESCE(json_agg(closed), '[]') FROM closed) AS closed,
+           (SELECT COALESCE(array_agg(number), '{}') FROM freed) AS freed_tables,
+           (SELECT COALESCE(array_agg(DISTINCT table_number), '{}') FROM unlinked) AS unlinked_tables,
+           (SELECT COALESCE(array_agg(id::text), '{}') FROM dissolved) AS dissolved_groups;
+"""
+
+
+def create_order_sql(columns):
+    """
+    POST /api/orders insert of `columns` (create_order always includes
+    status, so the row is covered by the open-order index). DO UPDATE rather
+    than DO NOTHING: it locks and returns the existing open order even when
+    that one was committed after this statement started. It is a real update
+    of that row: a new row version, and the row-level UPDATE triggers on
+    orders run. With nothing changed, price_order returns early,
+    queue_sales_rollup skips the unpaid row and trg_floor_event_update's
+    WHEN filters it out. xmax = 0 only on a row this statement inserted.
+    """
+    return f"""
+        INSERT INTO orders ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})
+        ON CONFLICT (table_number) WHERE status != 'paid'
+        DO UPDATE SET table_number = EXCLUDED.table_number
+        RETURNING *, (xmax = 0) AS created;
+    """
+
+
+def break_history_query(args):
+    """GET /api/break-history: (sql, params) for the employee_id/from/to filters in `args`."""
+    where, params = [], []
+    if args.get('employee_id'):
+        where.append("employee_id = %s")
+        params.append(args['employee_id'])
+    if args.get('from'):
+        where.append("break_start >= %s")
+        params.append(args['from'])
+    if args.get('to'):
+        where.append("break_start < %s")
+        params.append(args['to'])
+    sql = "SELECT * FROM break_history"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY break_start DESC;", params
+
+
+# Page size limits for GET /api/orders
+ORDERS_PAGE_SIZE = 100
+ORDERS_MAX_PAGE_SIZE = 500
+
+
+def parse_bool_arg(value):
+    """Parse a query-string boolean; returns None when the value is not recognised."""
+    value = (value or '').strip().lower()
+    if value in ('1', 'true', 'yes', 't'):
+        return True
+    if value in ('0', 'false', 'no', 'f'):
+        return False
+    return None
+
+
+def parse_timestamp(value):
+    """
+    ISO timestamp as an aware datetime; one without an offset is read in
+    REPORTS_TIMEZONE. psycopg2 would read a naive value in the session
+    TimeZone and asyncpg in UTC, so both tiers get an explicit offset.
+    """
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=ZoneInfo(REPORTS_TIMEZONE))
+    return value
+
+
+def encode_order_cursor(row):
+    """Opaque keyset cursor pointing just past `row` in (created_at, id) order (both NOT NULL, 0013)."""
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_order_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, order_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|', 1)
+    created_at = datetime.fromisoformat(created_at)
+    if created_at.tzinfo is None:
+        raise ValueError('cursor timestamps carry an offset')
+    return created_at, str(uuid.UUID(order_id))
+
+
+def orders_page_query(args):
+    """
+    Build the GET /api/orders query from its query-string `args` (a mapping).
+
+    Returns (sql, params, limit). Paging is opt-in: without limit or cursor
+    the query returns every matching order and limit is None, as the route
+    did before it paged. Otherwise it fetches limit + 1 rows so
+    orders_page() can tell whether another page exists. Raises ValueError
+    with the message for the 400 response on a bad parameter.
+    """
+    where, params = [], []
+
+    if args.get('status'):
+        statuses = [s.strip() for s in args['status'].split(',') if s.strip()]
+        where.append("status = ANY(%s)")
+        params.append(statuses)
+    if args.get('open') is not None:
+        is_open = parse_bool_arg(args.get('open'))
+        if is_open is None:
+            raise ValueError('open must be true or false')
+        where.append("status != 'paid'" if is_open else "status = 'paid'")
+    for key in ['table_number', 'server']:
+        if args.get(key):
+            where.append(f"{key} = %s")
+            params.append(args[key])
+    if args.get('paid') is not None:
+        paid = parse_bool_arg(args.get('paid'))
+        if paid is None:
+            raise ValueError('paid must be true or false')
+        where.append("paid = %s" if paid else "paid IS NOT TRUE")
+        if paid:
+            params.append(True)
+    for key, op in [('created_from', '>='), ('created_to', '<')]:
+        if args.get(key):
+            try:
+                params.append(parse_timestamp(args[key]))
+            except ValueError:
+                raise ValueError(f'{key} must be an ISO timestamp')
+            where.append(f"created_at {op} %s")
+
+    limit = None
+    if args.get('limit') or args.get('cursor'):
+        try:
+            limit = int(args.get('limit') or ORDERS_PAGE_SIZE)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        limit = max(1, min(limit, ORDERS_MAX_PAGE_SIZE))
+
+    if args.get('cursor'):
+        try:
+            cursor_created_at, cursor_id = decode_order_cursor(args['cursor'])
+        except Exception:
+            raise ValueError('Invalid cursor')
+        where.append("(created_at, id) < (%s, %s)")
+        params.extend([cursor_created_at, cursor_id])
+
+    sql = "SELECT * FROM orders"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limit is None:
+        return sql + ";", params, limit
+    # Fetch one extra row to know whether another page exists
+    sql += " LIMIT %s;"
+    params.append(limit + 1)
+    return sql, params, limit
+
+
+def orders_page(orders, limit):
+    """(orders, next_cursor) for the rows fetched by an orders_page_query() query."""
+    if limit is None or len(orders) <= limit:
+        return orders, None
+    orders = orders[:limit]
+    return orders, encode_order_cursor(orders[-1])
+
+
+def orders_page_headers(path, args, next_cursor):
+    """
+    Headers pointing at the next page: X-Next-Cursor and an RFC 8288
+    Link rel="next" with the same query string plus the cursor. The body
+    stays a bare array, the shape GET /api/orders always had.
+    """
+    if next_cursor is None:
+        return {}
+    query = urlencode({**args, 'cursor': next_cursor})
+    return {'X-Next-Cursor': next_cursor, 'Link': f'<{path}?{query}>; rel="next"'}
@@ -0,0 +1,444 @@
+"""
+Async read tier: the polled read-only endpoints served from asyncio (ASGI).
+
+Every device on the floor polls the tables, the map and the open orders
+every few seconds. Under gunicorn each of those requests holds a worker
+thread for its whole lifetime, slow client included, so concurrency is
+capped at workers * threads. Here one process keeps thousands of polling
+keep-alive connections on a single event loop, and only requests that are
+actually querying hold one of its READ_PG_POOL_MAX asyncpg connections.
+
+Routes, with the same URLs, query parameters, bodies, errors and headers as
+app.py (queries come from read_queries.py, bodies from
+json_provider.dumps_response, compression is negotiated like compression.py):
+
+    GET /api/tables
+    GET /api/elements
+    GET /api/menu      ETag / 304 and per-version body cache, as catalog_cache.py
+    GET /api/orders
+    GET /api/stream/floor  SSE floor events, as floor_stream.py; a stream costs no thread
+    GET /api/health
+
+Writes and every other route stay on the Flask app. Run both and let the
+proxy send these GETs here, e.g. with nginx:
+
+    map $request_method $api_read_upstream { GET read_tier; default flask; }
+    location ~ ^/api/(tables|elements|menu|orders)$ {
+        proxy_pass http://$api_read_upstream;
+    }
+    location = /api/stream/floor {
+        proxy_pass http://read_tier;
+        proxy_buffering off;
+        proxy_read_timeout 1h;
+    }
+
+    uvicorn read_tier:app --host 0.0.0.0 --port 5051 --workers 2 --timeout-keep-alive 30
+
+Keep the keep-alive timeout above the clients' poll interval, or idle
+connections get closed just as the next poll is sent.
+
+Measured with keep-alive clients each polling once every 5 s for 20 s, one
+worker process per server (gunicorn: default gthread config), 1 vCPU shared
+with the clients, against the 100k-order gen_data.py database:
+
+    endpoint, clients                       server      ok/s   errors   p50 ms   p95 ms
+    /api/orders?open=true&limit=20, 2000    gunicorn     281        0    10091    11700
+                                            read tier    400        0       53      733
+    /api/tables (65 KB), 1000               gunicorn     146      368     5775    12354
+                                            read tier    200        0       98     1781
+
+Timestamps are decoded in UTC; psycopg2 uses the session TimeZone. Both
+render as the same GMT HTTP date, so bodies match. Query-string timestamps
+without an offset (created_from/created_to) are given REPORTS_TIMEZONE by
+read_queries before either driver sees them.
+
+Environment variables (PG_* connection settings as in db.py):
+    READ_PG_POOL_MIN         connections opened at startup, per process (default 2)
+    READ_PG_POOL_MAX         connections per process (default 10)
+    READ_PG_STATEMENT_CACHE  prepared statements kept per connection; 0 behind
+                             pgbouncer in transaction mode (default 100)
+    PG_POOL_TIMEOUT          seconds a request waits for a connection before a 503 (default 10)
+"""
+import asyncio
+import contextlib
+import functools
+import itertools
+import json
+import os
+import re
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.http import parse_accept_header, parse_etags
+
+import compression
+import db
+import floor_stream
+from catalog_cache import (
+    CACHE_CONTROL, CHANNEL, LISTEN_PING_INTERVAL, VERSION_SQL, CatalogState, catalog_etag, is_not_modified,
+)
+from json_provider import dumps_response
+from read_queries import ELEMENTS_SQL, MENU_SQL, TABLES_SQL, orders_page, orders_page_headers, orders_page_query
+
+POOL_MIN_SIZE = int(os.getenv('READ_PG_POOL_MIN', '2'))
+POOL_MAX_SIZE = int(os.getenv('READ_PG_POOL_MAX', '10'))
+STATEMENT_CACHE_SIZE = int(os.getenv('READ_PG_STATEMENT_CACHE', '100'))
+POOL_TIMEOUT = db.POOL_TIMEOUT
+
+MIMETYPE = 'application/json'
+# Same headers app.apply_cors_headers puts on every response
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': 'true',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key',
+    'Access-Control-Allow-Methods': 'GET,PUT,POST,DELETE,OPTIONS',
+    'Access-Control-Expose-Headers': 'X-Next-Cursor,Link',
+}
+
+_PLACEHOLDER = re.compile(r'%s')
+_pool = None
+
+
+@functools.lru_cache(maxsize=256)
+def numbered(sql):
+    """psycopg2 %s placeholders renumbered as asyncpg's $1, $2, ..."""
+    counter = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda _: f'${next(counter)}', sql)
+
+
+async def init_connection(conn):
+    # Same decoding as psycopg2: json/jsonb with json.loads, so numbers
+    # inside them stay JSON numbers. UUIDs stay strings, which the JSON
+    # encoder handles without a fallback.
+    for name in ('json', 'jsonb'):
+        await conn.set_type_codec(name, schema='pg_catalog', encoder=json.dumps,
+                                  decoder=json.loads, format='text')
+    await conn.set_type_codec('uuid', schema='pg_catalog', encoder=str, decoder=str, format='text')
+
+
+def connect_kwargs():
+    return {
+        'host': db.DB_HOST,
+        'database': db.DB_NAME,
+        'user': db.DB_USER,
+        'password': db.DB_PASSWORD,
+        'port': int(db.DB_PORT),
+    }
+
+
+async def fetch(sql, params=()):
+    """Rows of `sql` (psycopg2 placeholders) as dicts, in column order."""
+    async with _pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        rows = await conn.fetch(numbered(sql), *params)
+    return [dict(row) for row in rows]
+
+
+async def listen(channel, name, on_connect, on_notify, on_lost):
+    """
+    Keep a dedicated connection LISTENing on `channel`, reconnecting with
+    backoff. `on_connect(conn)` runs after each LISTEN (read the state that
+    notifications will update from there), `on_notify(payload)` per
+    notification, and `on_lost()` whenever notifications may have been missed.
+    """
+    backoff = 1
+    while True:
+        conn = None
+        lost = asyncio.Event()
+        try:
+            conn = await asyncpg.connect(**connect_kwargs())
+            conn.add_termination_listener(lambda _: lost.set())
+            await conn.add_listener(channel, lambda _conn, _pid, _channel, payload: on_notify(payload))
+            await on_connect(conn)
+            backoff = 1
+            while True:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(lost.wait(), LISTEN_PING_INTERVAL)
+                if lost.is_set():
+                    raise ConnectionError('connection closed')
+                await conn.execute("SELECT 1;")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: read tier {name} listener disconnected: {e}")
+            on_lost()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+        finally:
+            if conn is not None and not conn.is_closed():
+                conn.terminate()
+
+
+class AsyncCatalogCache(CatalogState):
+    """CatalogState kept current by an asyncpg LISTEN connection (see catalog_cache.py)."""
+
+    def listen(self):
+        return listen(CHANNEL, 'catalog', self._connected, self.listener_notified, self.listener_lost)
+
+    async def _connected(self, conn):
+        # Read the version only after LISTEN so no bump can slip between
+        self.listener_connected(await conn.fetchval(VERSION_SQL))
+
+    async def current_version(self):
+        """Catalog version, from memory when the listener is up, else one cheap query."""
+        version = self.known_version()
+        if version is not None:
+            return version
+        rows = await fetch(VERSION_SQL)
+        return self.queried_version(rows[0]['version'] if rows else None)
+
+
+catalog = AsyncCatalogCache()
+
+
+class AsyncFloorHub:
+    """
+    Per-process fan-out of floor events, as floor_stream.FloorHub but on the
+    event loop: an open stream costs a queue, not a thread.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._pending = []
+        self._wake = asyncio.Event()
+
+    async def run(self):
+        await asyncio.gather(
+            listen(floor_stream.CHANNEL, 'floor event', self._connected, self._notified, self._lost),
+            self._drain(),
+        )
+
+    async def _connected(self, conn):
+        pass
+
+    def _notified(self, payload):
+        try:
+            self._pending.append(int(payload))
+        except ValueError:
+            return
+        self._wake.set()
+
+    def _lost(self):
+        # Streams may have missed events; make them reconnect and resume
+        self._broadcast(None)
+
+    async def _drain(self):
+        """Fetch notified events in batches and broadcast them; prune old events now and then."""
+        loop = asyncio.get_running_loop()
+        last_prune = 0
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), floor_stream.HEARTBEAT_SECONDS)
+            self._wake.clear()
+            ids, self._pending = self._pending, []
+            try:
+                if loop.time() - last_prune > floor_stream.PRUNE_INTERVAL_SECONDS:
+                    async with _pool.acquire(timeout=POOL_TIMEOUT) as conn:
+                        await conn.execute(numbered(floor_stream.PRUNE_SQL), floor_stream.RETENTION_HOURS)
+                    last_prune = loop.time()
+                # Fetch by notified id: commit order can differ from id order
+                if ids and self._subscribers:
+                    for event in await fetch(floor_stream.EVENTS_BY_ID_SQL, (ids,)):
+                        self._broadcast(event)
+            except Exception as e:
+                print(f"Warning: read tier floor events fetch failed: {e}")
+                self._broadcast(None)
+
+    def _broadcast(self, event):
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client: drop its buffer and tell it to resync
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(None)
+
+    def subscribe(self):
+        q = asyncio.Queue(maxsize=floor_stream.SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        self._subscribers.discard(q)
+
+
+floor = AsyncFloorHub()
+
+
+async def load_missed_events(last_event_id):
+    """floor_stream.load_missed_events on the async pool."""
+    async with _pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        bounds = await conn.fetchrow(floor_stream.BOUNDS_SQL)
+        plan = floor_stream.resume_plan(last_event_id, bounds)
+        if plan != 'replay':
+            return ([] if plan == 'fresh' else None), bounds['max_id']
+        events = [dict(row) for row in await conn.fetch(
+            numbered(floor_stream.MISSED_SQL), *floor_stream.missed_params(last_event_id))]
+    if len(events) > floor_stream.MAX_REPLAY:
+        return None, bounds['max_id']
+    return events, bounds['max_id']
+
+
+async def floor_event_stream(q, last_event_id):
+    """floor_stream.floor_event_stream on the event loop."""
+    try:
+        # Subscribed before replaying so nothing committed in between is lost
+        missed, newest_id = await load_missed_events(last_event_id)
+        chunks, sent = floor_stream.opening_chunks(last_event_id, missed, newest_id)
+        for chunk in chunks:
+            yield chunk
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + floor_stream.MAX_STREAM_SECONDS
+        while loop.time() < deadline:
+            try:
+                event = await asyncio.wait_for(q.get(), floor_stream.HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                # Events were lost or this client fell behind: end the
+                # stream, the client reconnects and resumes from its last id
+                return
+            if event['id'] in sent:
+                continue
+            yield floor_stream.format_event(event)
+    finally:
+        floor.unsubscribe(q)
+
+
+def negotiate(request, size):
+    return compression.choose_encoding(size, MIMETYPE, parse_accept_header(request.headers.get('accept-encoding')))
+
+
+def json_response(request, obj, status=200, extra_headers=None):
+    """Response rendered and compressed the way the Flask app does it."""
+    body = dumps_response(obj)
+    headers = dict(CORS_HEADERS, **(extra_headers or {}))
+    if 200 <= status < 300:
+        headers['Vary'] = 'Accept-Encoding'
+        encoding = negotiate(request, len(body))
+        if encoding:
+            body = compression.compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+    return Response(body, status_code=status, headers=headers, media_type=MIMETYPE)
+
+
+def first_values(query_params):
+    # Werkzeug's args[key] is the first value of a repeated parameter, Starlette's the last
+    values = {}
+    for key, value in query_params.multi_items():
+        values.setdefault(key, value)
+    return values
+
+
+def read_route(view):
+    """Map pool exhaustion to a 503 and other failures to the app's JSON 500."""
+    @functools.wraps(view)
+    async def wrapper(request):
+        try:
+            return await view(request)
+        except asyncio.TimeoutError:
+            response = json_response(request, {'error': 'Database busy, try again'}, 503)
+            response.headers['Retry-After'] = '1'
+            return response
+        except Exception as e:
+            print(f"Warning: {request.method} {request.url.path} failed: {e}")
+            return json_response(request, {'error': str(e)}, 500)
+    return wrapper
+
+
+@read_route
+async def get_tables(request):
+    return json_response(request, await fetch(TABLES_SQL))
+
+
+@read_route
+async def get_elements(request):
+    return json_response(request, await fetch(ELEMENTS_SQL))
+
+
+@read_route
+async def get_menu(request):
+    version = await catalog.current_version()
+    headers = dict(CORS_HEADERS, ETag=f'W/"{catalog_etag(version)}"', Vary='Accept-Encoding')
+    headers['Cache-Control'] = CACHE_CONTROL
+    if is_not_modified(parse_etags(request.headers.get('if-none-match')), version):
+        catalog.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    key = f"{request.url.path}?{request.url.query}"
+    entry = catalog.get(key, version)
+    if entry is None:
+        entry = catalog.put(key, version, dumps_response(await fetch(MENU_SQL)), MIMETYPE)
+    body = entry[1]
+    encoding = negotiate(request, len(body))
+    if encoding:
+        # High-level compression of a large menu takes long enough to stall the loop
+        body = entry[3].get(encoding) or await asyncio.to_thread(catalog.encoded, entry, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(body, headers=headers, media_type=MIMETYPE)
+
+
+@read_route
+async def list_orders(request):
+    try:
+        args = first_values(request.query_params)
+        sql, params, limit = orders_page_query(args)
+    except ValueError as e:
+        return json_response(request, {'error': str(e)}, 400)
+    orders, next_cursor = orders_page(await fetch(sql, params), limit)
+    return json_response(request, orders, extra_headers=orders_page_headers(request.url.path, args, next_cursor))
+
+
+async def stream_floor(request):
+    try:
+        last_event_id = floor_stream.parse_last_event_id(
+            request.headers.get('last-event-id') or first_values(request.query_params).get('last_event_id'))
+    except ValueError:
+        return json_response(request, {'error': 'Invalid last_event_id'}, 400)
+    headers = dict(CORS_HEADERS, **{'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return StreamingResponse(floor_event_stream(floor.subscribe(), last_event_id),
+                             headers=headers, media_type='text/event-stream')
+
+
+async def healthcheck(request):
+    return json_response(request, {'status': 'ok'})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _pool
+    _pool = await asyncpg.create_pool(
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        statement_cache_size=STATEMENT_CACHE_SIZE,
+        init=init_connection,
+        **connect_kwargs()
+    )
+    listeners = [asyncio.create_task(catalog.listen()), asyncio.create_task(floor.run())]
+    try:
+        yield
+    finally:
+        for listener in listeners:
+            listener.cancel()
+        for listener in listeners:
+            with contextlib.suppress(asyncio.CancelledError):
+                await listener
+        await _pool.close()
+        _pool = None
+
+
+app = Starlette(
+    routes=[
+        Route('/api/tables', get_tables, methods=['GET']),
+        Route('/api/elements', get_elements, methods=['GET']),
+        Route('/api/menu', get_menu, methods=['GET']),
+        Route('/api/orders', list_orders, methods=['GET']),
+        Route('/api/stream/floor', stream_floor, methods=['GET']),
+        Route('/api/health', healthcheck, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
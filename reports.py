@@ -0,0 +1,414 @@
+"""
+Sales reports answered from the hourly rollups (migration 0009).
+
+Paid orders are rolled up per UTC hour by refresh_sales_rollups(), which
+only rebuilds hours queued by writes since the last refresh. Every report
+refreshes first (usually a no-op) and then reads the rollup tables, so
+its cost depends on the length of the range, not on the size of history.
+
+A business day runs from the cutoff (default 04:00) in REPORTS_TIMEZONE
+to the same time the next day, so a 1 a.m. check counts toward the
+previous day. Cutoffs are whole hours because the rollups are hourly,
+and for the same reason only time zones whose UTC offset is a whole hour
+(from 2000 on) are accepted: in Asia/Kolkata or America/St_Johns a UTC
+hour straddles local midnight and could not be given to one business day.
+REPORTS_TIMEZONE is checked at import, the tz query param per request.
+
+The labor report works from `shifts` and `break_history` (migration 0010)
+instead: one query computes hours, breaks, weekly overtime and cost for
+all employees at once. Overtime is worked out over the whole business weeks
+the period touches, then only the hours inside the period are reported, so
+a period starting or ending mid-week still sees that week's overtime.
+
+Environment variables:
+    REPORTS_TIMEZONE              IANA time zone of the restaurant (default UTC)
+    BUSINESS_DAY_CUTOFF           local time a business day starts, HH:00 (default 04:00)
+    LABOR_OVERTIME_WEEKLY_HOURS   paid hours per business week before overtime (default 40)
+    LABOR_OVERTIME_MULTIPLIER     overtime pay multiplier (default 1.5)
+    LABOR_PAID_BREAK_MAX_MINUTES  breaks up to this long are paid unless marked (default 20)
+"""
+import functools
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+REPORTS_TIMEZONE = os.getenv('REPORTS_TIMEZONE', 'UTC')
+BUSINESS_DAY_CUTOFF = os.getenv('BUSINESS_DAY_CUTOFF', '04:00')
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Longest range one report may cover
+MAX_RANGE_DAYS = 3660
+ITEMS_REPORT_LIMIT = 50
+
+OVERTIME_WEEKLY_HOURS = float(os.getenv('LABOR_OVERTIME_WEEKLY_HOURS', '40'))
+OVERTIME_MULTIPLIER = float(os.getenv('LABOR_OVERTIME_MULTIPLIER', '1.5'))
+PAID_BREAK_MAX_MINUTES = float(os.getenv('LABOR_PAID_BREAK_MAX_MINUTES', '20'))
+# Open shifts older than this are treated as a missed clock-out, not as still working
+MAX_SHIFT_HOURS = 24
+
+# Business date of a rollup row
+BUSINESS_DATE_SQL = "((s.hour_start AT TIME ZONE %(tz)s) - %(cutoff)s::interval)::date"
+
+BUCKET_SQL = {
+    'hour': "date_trunc('hour', s.hour_start AT TIME ZONE %(tz)s)",
+    'day': BUSINESS_DATE_SQL,
+    'week': f"date_trunc('week', {BUSINESS_DATE_SQL})::date",
+    'month': f"date_trunc('month', {BUSINESS_DATE_SQL})::date",
+}
+
+# Rollup rows covering business days [from, to]
+RANGE_SQL = """
+    s.hour_start >= ((%(from)s::date + %(cutoff)s::interval) AT TIME ZONE %(tz)s)
+    AND s.hour_start < ((%(to)s::date + 1 + %(cutoff)s::interval) AT TIME ZONE %(tz)s)
+"""
+
+
+def parse_cutoff(value):
+    """'HH:00' or 'H' -> hours; raises ValueError for anything else."""
+    hours, _, minutes = str(value).strip().partition(':')
+    if not hours.isdigit() or (minutes and minutes.strip('0')) or not 0 <= int(hours) < 24:
+        raise ValueError('cutoff must be a whole hour, e.g. 04:00')
+    return int(hours)
+
+
+# One entry per zone of the tz database at most
+@functools.lru_cache(maxsize=None)
+def has_whole_hour_offsets(tz):
+    """True when `tz` is a whole number of hours from UTC on every day from 2000 to 2100."""
+    day = datetime(2000, 1, 1, 12, tzinfo=timezone.utc)
+    end = datetime(2100, 1, 1, tzinfo=timezone.utc)
+    while day < end:
+        if day.astimezone(tz).utcoffset().total_seconds() % 3600:
+            return False
+        day += timedelta(days=1)
+    return True
+
+
+def parse_timezone(name):
+    try:
+        tz = ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'Unknown time zone: {name}')
+    if not has_whole_hour_offsets(tz):
+        raise ValueError(f'Time zone {name} is not a whole number of hours from UTC; '
+                         'hourly rollups cannot be split into its business days')
+    return tz
+
+
+# Fail at startup rather than on the first report
+parse_timezone(REPORTS_TIMEZONE)
+
+
+def business_date(now, tz, cutoff_hours):
+    """Business date that `now` (aware datetime) falls in."""
+    return (now.astimezone(tz) - timedelta(hours=cutoff_hours)).date()
+
+
+def parse_report_params(args):
+    """
+    Validate the common report query params:
+      from, to      business dates YYYY-MM-DD, inclusive (default: today)
+      tz            time zone (default REPORTS_TIMEZONE)
+      cutoff        business-day start, HH:00 (default BUSINESS_DAY_CUTOFF)
+    Raises ValueError with a client-facing message.
+    """
+    tz_name = args.get('tz') or REPORTS_TIMEZONE
+    tz = parse_timezone(tz_name)
+    cutoff_hours = parse_cutoff(args.get('cutoff') or BUSINESS_DAY_CUTOFF)
+    try:
+        today = business_date(datetime.now(tz), tz, cutoff_hours)
+        end = date.fromisoformat(args['to']) if args.get('to') else today
+        start = date.fromisoformat(args['from']) if args.get('from') else end
+    except ValueError:
+        raise ValueError('from and to must be dates, YYYY-MM-DD')
+    if start > end:
+        raise ValueError('from must not be after to')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'Range is limited to {MAX_RANGE_DAYS} days')
+    return {
+        'from': start,
+        'to': end,
+        'tz': tz_name,
+        'cutoff': f'{cutoff_hours} hours',
+        'cutoff_label': f'{cutoff_hours:02d}:00',
+    }
+
+
+def report_header(params):
+    return {
+        'from': params['from'].isoformat(),
+        'to': params['to'].isoformat(),
+        'timezone': params['tz'],
+        'business_day_cutoff': params['cutoff_label'],
+    }
+
+
+def refresh_rollups(cur):
+    """Fold queued writes into the rollups; returns the number of hours rebuilt."""
+    cur.execute("SELECT refresh_sales_rollups() AS hours;")
+    return cur.fetchone()['hours']
+
+
+def sales_report(cur, params, granularity):
+    """Revenue, covers and ticket averages per bucket, plus a totals row."""
+    bucket = BUCKET_SQL[granularity]
+    cur.execute(
+        f"""
+        SELECT {bucket} AS bucket,
+               GROUPING({bucket}) = 1 AS is_total,
+               SUM(s.orders)::int AS orders,
+               SUM(s.covers)::int AS covers,
+               SUM(s.subtotal) AS gross_sales,
+               SUM(s.discount) AS discounts,
+               SUM(s.subtotal - s.discount) AS net_sales,
+               SUM(s.tax) AS tax,
+               SUM(s.tips) AS tips,
+               SUM(s.total) AS total,
+               round(SUM(s.subtotal - s.discount) / NULLIF(SUM(s.orders), 0), 2) AS avg_ticket,
+               round(SUM(s.subtotal - s.discount) / NULLIF(SUM(s.covers), 0), 2) AS avg_per_cover
+        FROM sales_hourly s
+        WHERE {RANGE_SQL}
+        GROUP BY GROUPING SETS (({bucket}), ())
+        ORDER BY is_total, bucket;
+        """,
+        params
+    )
+    rows = cur.fetchall()
+    totals = rows.pop() if rows and rows[-1]['is_total'] else None
+    for row in rows:
+        del row['is_total']
+        row['bucket'] = row['bucket'].isoformat()
+    if totals is None:
+        totals = {'orders': 0, 'covers': 0}
+    else:
+        del totals['is_total'], totals['bucket']
+    return {**report_header(params), 'granularity': granularity, 'buckets': rows, 'totals': totals}
+
+
+def items_report(cur, params, group, limit):
+    """Quantity and revenue per menu item (or per category), best sellers first."""
+    if group == 'category':
+        key, name = "COALESCE(mi.category_id::text, mi.category)", "COALESCE(mc.name, mi.category)"
+    else:
+        key, name = "s.menu_item_id::text", "mi.name"
+    cur.execute(
+        f"""
+        SELECT {key} AS id,
+               MAX({name}) AS name,
+               MAX(COALESCE(mc.name, mi.category)) AS category,
+               SUM(s.quantity) AS quantity,
+               SUM(s.revenue) AS revenue
+        FROM sales_hourly_items s
+        LEFT JOIN menu_items mi ON mi.id = s.menu_item_id
+        LEFT JOIN menu_categories mc ON mc.id = mi.category_id
+        WHERE {RANGE_SQL}
+        GROUP BY {key}
+        ORDER BY quantity DESC, revenue DESC
+        LIMIT %(limit)s;
+        """,
+        {**params, 'limit': limit}
+    )
+    rows = cur.fetchall()
+    if group == 'category':
+        for row in rows:
+            del row['category']
+    return {**report_header(params), 'group': group, 'items': rows}
+
+
+def servers_report(cur, params):
+    """Orders, covers, net sales and tips per server."""
+    cur.execute(
+        f"""
+        SELECT NULLIF(s.server, '') AS server,
+               SUM(s.orders)::int AS orders,
+               SUM(s.covers)::int AS covers,
+               SUM(s.net_sales) AS net_sales,
+               SUM(s.tips) AS tips,
+               round(SUM(s.net_sales) / NULLIF(SUM(s.orders), 0), 2) AS avg_ticket,
+               round(SUM(s.tips) / NULLIF(SUM(s.net_sales), 0) * 100, 1) AS tip_percent
+        FROM sales_hourly_servers s
+        WHERE {RANGE_SQL}
+        GROUP BY s.server
+        ORDER BY net_sales DESC;
+        """,
+        params
+    )
+    return {**report_header(params), 'servers': cur.fetchall()}
+
+
+LABOR_SQL = """
+WITH bounds AS (
+    SELECT (%(from)s::date + %(cutoff)s::interval) AT TIME ZONE %(tz)s AS period_start,
+           (%(to)s::date + 1 + %(cutoff)s::interval) AT TIME ZONE %(tz)s AS period_end,
+           -- Whole business weeks around the period: overtime depends on the full week
+           (date_trunc('week', %(from)s::date)::date + %(cutoff)s::interval) AT TIME ZONE %(tz)s AS weeks_start,
+           (date_trunc('week', %(to)s::date)::date + 7 + %(cutoff)s::interval) AT TIME ZONE %(tz)s AS weeks_end
+),
+-- Shifts clipped to those weeks. An open shift counts up to now only while
+-- it is the employee's latest and younger than MAX_SHIFT_HOURS; any other
+-- open shift is a missing clock-out and counts no hours.
+spans AS (
+    SELECT s.id, s.employee_id, s.clock_in,
+           COALESCE(s.hourly_rate, e.hourly_rate, 0) AS rate,
+           GREATEST(s.clock_in, b.weeks_start) AS span_start,
+           CASE WHEN c.missing_clock_out THEN GREATEST(s.clock_in, b.weeks_start)
+                ELSE LEAST(COALESCE(s.clock_out, NOW()), b.weeks_end)
+           END AS span_end,
+           c.missing_clock_out, b.period_start, b.period_end
+    FROM shifts s
+    CROSS JOIN bounds b
+    LEFT JOIN employees e ON e.id = s.employee_id
+    CROSS JOIN LATERAL (
+        SELECT s.clock_out IS NULL AND NOT (
+                   s.clock_in > NOW() - %(max_shift)s * interval '1 hour'
+                   AND NOT EXISTS (
+                       SELECT 1 FROM shifts n
+                       WHERE n.employee_id = s.employee_id AND n.clock_in > s.clock_in
+                   )
+               ) AS missing_clock_out
+    ) c
+    WHERE s.clock_in >= b.weeks_start - %(max_shift)s * interval '1 hour'
+      AND s.clock_in < b.weeks_end
+),
+-- Breaks clipped to their shift
+breaks AS (
+    SELECT sp.id AS shift_id,
+           GREATEST(bh.break_start, sp.span_start) AS break_start,
+           LEAST(COALESCE(bh.break_end, sp.span_end), sp.span_end) AS break_end,
+           COALESCE(bh.paid, bh.break_end - bh.break_start <= %(paid_break)s * interval '1 minute', FALSE) AS paid
+    FROM spans sp
+    JOIN break_history bh ON bh.employee_id = sp.employee_id
+     AND bh.break_start < sp.span_end
+     AND bh.break_start > sp.span_start - %(max_shift)s * interval '1 hour'
+     AND COALESCE(bh.break_end, sp.span_end) > sp.span_start
+    WHERE sp.span_end > sp.span_start
+),
+-- Each shift's hours and unpaid breaks over its whole span, over the part
+-- before the period (a shift straddling its start) and inside the period
+segments AS (
+    SELECT sp.*, w.*, seg.*
+    FROM spans sp
+    CROSS JOIN LATERAL (
+        SELECT date_trunc('week', (sp.span_start AT TIME ZONE %(tz)s) - %(cutoff)s::interval)::date AS week_start,
+               LEAST(sp.span_end, sp.period_start) AS before_end,
+               GREATEST(sp.span_start, sp.period_start) AS in_start,
+               LEAST(sp.span_end, sp.period_end) AS in_end
+    ) w
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN sp.missing_clock_out
+                    THEN sp.clock_in >= sp.period_start AND sp.clock_in < sp.period_end
+                    ELSE w.in_end > w.in_start
+               END AS in_period,
+               EXTRACT(EPOCH FROM sp.span_end - sp.span_start) / 3600 AS shift_hours,
+               EXTRACT(EPOCH FROM GREATEST(w.before_end - sp.span_start, interval '0')) / 3600 AS before_hours,
+               EXTRACT(EPOCH FROM GREATEST(w.in_end - w.in_start, interval '0')) / 3600 AS in_hours
+    ) seg
+),
+shift_hours AS (
+    SELECT sg.id, sg.employee_id, sg.rate, sg.missing_clock_out, sg.span_start, sg.week_start,
+           sg.in_period, sg.in_hours,
+           sg.shift_hours - COALESCE(SUM(EXTRACT(EPOCH FROM br.break_end - br.break_start))
+               FILTER (WHERE NOT br.paid), 0) / 3600 AS paid_hours,
+           sg.before_hours - COALESCE(SUM(EXTRACT(EPOCH FROM GREATEST(
+               LEAST(br.break_end, sg.before_end) - br.break_start, interval '0')))
+               FILTER (WHERE NOT br.paid), 0) / 3600 AS paid_before_period,
+           COALESCE(SUM(EXTRACT(EPOCH FROM GREATEST(
+               LEAST(br.break_end, sg.in_end) - GREATEST(br.break_start, sg.in_start), interval '0')))
+               FILTER (WHERE br.paid), 0) / 3600 AS in_paid_break_hours,
+           COALESCE(SUM(EXTRACT(EPOCH FROM GREATEST(
+               LEAST(br.break_end, sg.in_end) - GREATEST(br.break_start, sg.in_start), interval '0')))
+               FILTER (WHERE NOT br.paid), 0) / 3600 AS in_unpaid_break_hours
+    FROM segments sg
+    LEFT JOIN breaks br ON br.shift_id = sg.id
+    GROUP BY sg.id, sg.employee_id, sg.rate, sg.missing_clock_out, sg.span_start, sg.week_start,
+             sg.in_period, sg.in_hours, sg.shift_hours, sg.before_hours, sg.before_end, sg.in_start, sg.in_end
+),
+-- Overtime is the paid time past the weekly threshold, in clock order: the
+-- week's earlier shifts (in the period or not) come first
+ordered AS (
+    SELECT sh.*,
+           COALESCE(SUM(sh.paid_hours) OVER (
+               PARTITION BY sh.employee_id, sh.week_start ORDER BY sh.span_start, sh.id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ), 0) + sh.paid_before_period AS paid_before,
+           sh.in_hours - sh.in_unpaid_break_hours AS in_paid_hours
+    FROM shift_hours sh
+),
+period_shifts AS (
+    SELECT o.*,
+           GREATEST(o.paid_before + o.in_paid_hours - %(overtime_after)s, 0)
+           - GREATEST(o.paid_before - %(overtime_after)s, 0) AS in_overtime_hours
+    FROM ordered o
+    WHERE o.in_period
+),
+weeks AS (
+    SELECT employee_id, week_start,
+           COUNT(*) FILTER (WHERE NOT missing_clock_out) AS shifts,
+           COUNT(*) FILTER (WHERE missing_clock_out) AS missing_clock_outs,
+           SUM(in_hours) AS shift_hours,
+           SUM(in_paid_break_hours) AS paid_break_hours,
+           SUM(in_unpaid_break_hours) AS unpaid_break_hours,
+           SUM(in_paid_hours - in_overtime_hours) AS regular_hours,
+           SUM(in_overtime_hours) AS overtime_hours,
+           SUM((in_paid_hours + in_overtime_hours * (%(overtime_multiplier)s - 1)) * rate) AS cost
+    FROM period_shifts
+    GROUP BY employee_id, week_start
+)
+SELECT w.employee_id, e.name, e.position, w.week_start,
+       w.shifts::int, w.missing_clock_outs::int,
+       round(w.shift_hours, 2) AS shift_hours,
+       round(w.paid_break_hours, 2) AS paid_break_hours,
+       round(w.unpaid_break_hours, 2) AS unpaid_break_hours,
+       round(w.regular_hours, 2) AS regular_hours,
+       round(w.overtime_hours, 2) AS overtime_hours,
+       round(w.cost, 2) AS cost
+FROM weeks w
+LEFT JOIN employees e ON e.id = w.employee_id
+ORDER BY e.name, w.employee_id, w.week_start;
+"""
+
+LABOR_FIELDS = (
+    'shifts', 'missing_clock_outs', 'shift_hours', 'paid_break_hours', 'unpaid_break_hours',
+    'regular_hours', 'overtime_hours', 'cost',
+)
+
+
+def labor_report(cur, params):
+    """
+    Hours, breaks, overtime and cost per employee, with a row per business
+    week (overtime is weekly). paid hours = shift hours - unpaid breaks.
+    Overtime hours are the week's paid hours past the threshold in clock
+    order; a row reports those falling inside the period, so splitting a
+    range into shorter ones adds up to the same totals.
+    """
+    cur.execute(LABOR_SQL, {
+        **params,
+        'max_shift': MAX_SHIFT_HOURS,
+        'paid_break': PAID_BREAK_MAX_MINUTES,
+        'overtime_after': OVERTIME_WEEKLY_HOURS,
+        'overtime_multiplier': OVERTIME_MULTIPLIER,
+    })
+    employees = {}
+    totals = dict.fromkeys(LABOR_FIELDS, 0)
+    for row in cur.fetchall():
+        employee = employees.get(row['employee_id'])
+        if employee is None:
+            employee = employees[row['employee_id']] = {
+                'employee_id': row['employee_id'],
+                'name': row['name'],
+                'position': row['position'],
+                'weeks': [],
+                **dict.fromkeys(LABOR_FIELDS, 0),
+            }
+        week = {'week_start': row['week_start'].isoformat()}
+        for field in LABOR_FIELDS:
+            week[field] = row[field]
+            employee[field] += row[field]
+            totals[field] += row[field]
+        employee['weeks'].append(week)
+    return {
+        **report_header(params),
+        'overtime_weekly_hours': OVERTIME_WEEKLY_HOURS,
+        'overtime_multiplier': OVERTIME_MULTIPLIER,
+        'employees': list(employees.values()),
+        'totals': totals,
+    }